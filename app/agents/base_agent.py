@@ -2,7 +2,10 @@ from abc import ABC, abstractmethod
 from typing import Dict, Any, List
 from app.models.schemas import AgentResponse, AgentType, ToolCall
 from app.core.llm_client import LLMClient
+from app.core.config import settings
+from app.core.context import get_request_context
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +17,7 @@ class BaseAgent(ABC):
         self.llm_client = llm_client
         self.tools = {}
         self.system_prompt = ""
+        self.use_llm_cache = name.lower() in settings.LLM_CACHE_AGENTS
 
     @abstractmethod
     async def process(self, message: str, context: Dict[str, Any] = None) -> AgentResponse:
@@ -26,12 +30,28 @@ class BaseAgent(ABC):
         if tool_name not in self.tools:
             raise ValueError(f"Tool {tool_name} not found")
 
+        request_context = get_request_context()
+        started = time.perf_counter()
         try:
             result = await self.tools[tool_name](**kwargs)
+            if request_context is not None:
+                request_context.record_event(
+                    "tool_call", agent=self.name, tool=tool_name,
+                    duration_ms=round((time.perf_counter() - started) * 1000, 2)
+                )
             return result
         except Exception as e:
             logger.error(f"Error calling tool {tool_name}: {str(e)}")
+            if request_context is not None:
+                request_context.record_event("tool_error", agent=self.name, tool=tool_name, error=str(e))
             raise
 
-    def get_system_prompt(self) -> str:
-        return self.system_prompt
\ No newline at end of file
+    def get_system_prompt(self, context: Dict[str, Any] = None) -> str:
+        guidelines = context.get("personality_guidelines") if context else None
+        if not guidelines:
+            return self.system_prompt
+
+        return f"""{self.system_prompt}
+Your answer goes straight to the customer, so write it in a friendly, human voice.
+
+{guidelines}"""
\ No newline at end of file
@@ -1,8 +1,10 @@
 from app.agents.base_agent import BaseAgent
 from app.models.schemas import AgentResponse, AgentType, ToolCall
+from app.core.config import settings
 from app.core.llm_client import LLMClient
 from app.tools.vector_store import VectorStore
 from app.tools.web_search import WebSearchTool
+from app.utils.context_builder import BuiltContext, ContextBuilder, token_budget
 from typing import Dict, Any, List
 import logging
 import json
@@ -50,14 +52,15 @@ Always prioritize accuracy and provide structured, detailed responses for pricin
             response_parts = []
 
             query_analysis = self._analyze_query(message)
+            system_prompt = self.get_system_prompt(context)
 
             try:
-                search_type = "pricing" if query_analysis["is_pricing_query"] else "all"
-                rag_results = await self.vector_store.search_enhanced(
-                    message,
-                    k=5,
-                    search_type=search_type
-                )
+                retrieval = context.get("prefetched_retrieval") if context else None
+                if retrieval is None:
+                    retrieval = await self.retrieve(message, query_analysis)
+
+                search_type = retrieval["search_type"]
+                rag_results = retrieval["results"]
 
                 if rag_results:
                     pricing_insights = self.vector_store.extract_pricing_insights(message, rag_results)
@@ -77,14 +80,16 @@ Always prioritize accuracy and provide structured, detailed responses for pricin
                         tool_output={
                             "results_count": len(rag_results),
                             "top_similarity": rag_results[0]['similarity'] if rag_results else 0,
+                            "top_rerank_score": rag_results[0].get('rerank_score'),
                             "has_pricing_data": pricing_insights["has_pricing_data"],
                             "payment_methods_found": list(pricing_insights["payment_methods"]),
-                            "rate_ranges": pricing_insights["rate_ranges"]
+                            "rate_ranges": pricing_insights["rate_ranges"],
+                            "context_tokens": enhanced_context.to_tool_output()
                         }
                     ))
 
                     enhanced_response = await self._generate_enhanced_response(
-                        message, enhanced_context, pricing_insights, query_analysis
+                        message, enhanced_context.text, pricing_insights, query_analysis, system_prompt
                     )
                     response_parts.append(enhanced_response)
 
@@ -97,7 +102,7 @@ Always prioritize accuracy and provide structured, detailed responses for pricin
 
                     if search_results and not search_results[0].get("error"):
                         web_response = await self._generate_web_search_response(
-                            message, search_results
+                            message, search_results, system_prompt
                         )
                         response_parts.append(web_response)
 
@@ -142,6 +147,18 @@ Always prioritize accuracy and provide structured, detailed responses for pricin
                 metadata={"error": str(e)}
             )
 
+    async def retrieve(self, message: str, query_analysis: Dict[str, Any] = None) -> Dict[str, Any]:
+        if query_analysis is None:
+            query_analysis = self._analyze_query(message)
+
+        search_type = "pricing" if query_analysis["is_pricing_query"] else "all"
+        results = await self.vector_store.search_enhanced(
+            message,
+            k=5,
+            search_type=search_type
+        )
+        return {"search_type": search_type, "results": results}
+
     def _analyze_query(self, message: str) -> Dict[str, Any]:
         message_lower = message.lower()
 
@@ -182,7 +199,8 @@ Always prioritize accuracy and provide structured, detailed responses for pricin
                         is_pricing_query and is_comparison_query) else "medium" if is_pricing_query else "low"
         }
 
-    def _build_enhanced_context(self, rag_results: List[Dict], pricing_insights: Dict, query_analysis: Dict) -> str:
+    def _build_enhanced_context(self, rag_results: List[Dict], pricing_insights: Dict,
+                                query_analysis: Dict) -> BuiltContext:
         context_parts = []
 
         if pricing_insights["has_pricing_data"]:
@@ -207,19 +225,11 @@ Always prioritize accuracy and provide structured, detailed responses for pricin
             if pricing_insights["volume_tiers"]:
                 context_parts.append(f"\nVolume Tiers Available: {', '.join(pricing_insights['volume_tiers'])}")
 
-        context_parts.append("\n=== RETRIEVED CONTENT ===")
-        for i, result in enumerate(rag_results[:3]):
-            context_parts.append(f"\nSource {i + 1} (Similarity: {result['similarity']:.2f}):")
-            context_parts.append(f"URL: {result['metadata']['url']}")
-            context_parts.append(f"Content: {result['document'][:400]}...")
-
-            if result.get("chunk_type"):
-                context_parts.append(f"Content Type: {result['chunk_type']}")
-
-        return "\n".join(context_parts)
+        builder = ContextBuilder(settings.LLM_MODEL, token_budget(settings.LLM_MODEL, settings.CONTEXT_TOKEN_BUDGETS))
+        return builder.build(rag_results, context_parts)
 
     async def _generate_enhanced_response(self, query: str, enhanced_context: str, pricing_insights: Dict,
-                                          query_analysis: Dict) -> str:
+                                          query_analysis: Dict, system_prompt: str = None) -> str:
 
         if query_analysis["is_pricing_query"]:
             prompt_template = """
@@ -256,11 +266,13 @@ Provide a helpful, accurate answer based on the retrieved content. Include speci
         )
 
         return await self.llm_client.generate_response_with_system_prompt(
-            self.system_prompt,
-            formatted_prompt
+            system_prompt or self.system_prompt,
+            formatted_prompt,
+            use_cache=self.use_llm_cache
         )
 
-    async def _generate_web_search_response(self, query: str, search_results: List[Dict]) -> str:
+    async def _generate_web_search_response(self, query: str, search_results: List[Dict],
+                                            system_prompt: str = None) -> str:
         search_context = []
         for result in search_results:
             search_context.append(f"""
@@ -283,6 +295,7 @@ Provide a helpful answer based on the search results.
 """
 
         return await self.llm_client.generate_response_with_system_prompt(
-            self.system_prompt,
-            web_prompt
+            system_prompt or self.system_prompt,
+            web_prompt,
+            use_cache=self.use_llm_cache
         )
\ No newline at end of file
@@ -1,27 +1,12 @@
 from app.agents.base_agent import BaseAgent
 from app.models.schemas import AgentResponse, AgentType, ToolCall
 from app.core.llm_client import LLMClient
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator
 import logging
 
 logger = logging.getLogger(__name__)
 
-
-class PersonalityAgent(BaseAgent):
-    def __init__(self, llm_client: LLMClient):
-        super().__init__("Personality", AgentType.PERSONALITY, llm_client)
-
-        self.system_prompt = """
-You are a Personality Agent that adds a human-like, friendly touch to responses from other agents.
-
-Your role:
-1. Take the technical/formal response from other agents
-2. Make it more conversational and human-like
-3. Add appropriate empathy and warmth
-4. Maintain all the factual information
-5. Match the language of the original query (Portuguese or English)
-
-Personality traits to embody:
+PERSONALITY_GUIDELINES = """Personality traits to embody:
 - Friendly and approachable
 - Helpful and solution-oriented  
 - Empathetic to customer concerns
@@ -43,6 +28,23 @@ Do NOT:
 - Use excessive enthusiasm that seems fake
 """
 
+
+class PersonalityAgent(BaseAgent):
+    def __init__(self, llm_client: LLMClient):
+        super().__init__("Personality", AgentType.PERSONALITY, llm_client)
+
+        self.system_prompt = """
+You are a Personality Agent that adds a human-like, friendly touch to responses from other agents.
+
+Your role:
+1. Take the technical/formal response from other agents
+2. Make it more conversational and human-like
+3. Add appropriate empathy and warmth
+4. Maintain all the factual information
+5. Match the language of the original query (Portuguese or English)
+
+""" + PERSONALITY_GUIDELINES
+
     async def process(self, message: str, context: Dict[str, Any] = None) -> AgentResponse:
         """Add personality layer to agent responses"""
         try:
@@ -61,43 +63,14 @@ Do NOT:
                     metadata={"error": "No source response provided"}
                 )
 
-            personality_prompt = f"""
-Original user query: {original_query}
-
-Source agent response from {source_agent} agent:
-{source_response}
-
-Transform this response to be more human-like and friendly while keeping all the factual information exactly the same. Make it conversational and warm.
-"""
-
             enhanced_response = await self.llm_client.generate_response_with_system_prompt(
                 self.system_prompt,
-                personality_prompt,
-                temperature=0.8
+                self._build_personality_prompt(original_query, source_agent, source_response),
+                temperature=0.8,
+                use_cache=self.use_llm_cache
             )
 
-            tool_call = ToolCall(
-                tool_name="personality_enhancement",
-                tool_input={
-                    "original_response": source_response[:100] + "..." if len(
-                        source_response) > 100 else source_response,
-                    "source_agent": source_agent
-                },
-                tool_output={"enhancement_applied": True, "response_length": len(enhanced_response)}
-            )
-
-            return AgentResponse(
-                agent_name=self.name,
-                agent_type=self.agent_type,
-                response=enhanced_response,
-                tool_calls=[tool_call],
-                confidence=0.9,
-                metadata={
-                    "source_agent": source_agent,
-                    "original_length": len(source_response),
-                    "enhanced_length": len(enhanced_response)
-                }
-            )
+            return self.build_response(source_response, source_agent, enhanced_response)
 
         except Exception as e:
             logger.error(f"Error in personality agent: {str(e)}")
@@ -111,4 +84,89 @@ Transform this response to be more human-like and friendly while keeping all the
                 tool_calls=[],
                 confidence=0.0,
                 metadata={"error": str(e), "fallback_used": True}
-            )
\ No newline at end of file
+            )
+
+    async def process_stream(self, message: str, context: Dict[str, Any] = None) -> AsyncIterator[str]:
+        """Stream the personality rewrite token by token; pair with build_response for the final result"""
+        source_response = context.get("source_response", "") if context else ""
+        original_query = context.get("original_query", "") if context else ""
+        source_agent = context.get("source_agent", "Unknown") if context else ""
+
+        if not source_response:
+            logger.warning("No source response provided to personality agent")
+            yield "I'm here to help! How can I assist you today?"
+            return
+
+        streamed_any = False
+        try:
+            async for token in self.llm_client.stream_response_with_system_prompt(
+                    self.system_prompt,
+                    self._build_personality_prompt(original_query, source_agent, source_response),
+                    temperature=0.8,
+                    use_cache=self.use_llm_cache
+            ):
+                streamed_any = True
+                yield token
+        except Exception as e:
+            logger.error(f"Error streaming personality response: {str(e)}")
+            if not streamed_any:
+                yield source_response
+
+    def build_response(self, source_response: str, source_agent: str, enhanced_response: str) -> AgentResponse:
+        tool_call = ToolCall(
+            tool_name="personality_enhancement",
+            tool_input={
+                "original_response": source_response[:100] + "..." if len(
+                    source_response) > 100 else source_response,
+                "source_agent": source_agent
+            },
+            tool_output={"enhancement_applied": True, "response_length": len(enhanced_response)}
+        )
+
+        return AgentResponse(
+            agent_name=self.name,
+            agent_type=self.agent_type,
+            response=enhanced_response,
+            tool_calls=[tool_call],
+            confidence=0.9,
+            metadata={
+                "source_agent": source_agent,
+                "original_length": len(source_response),
+                "enhanced_length": len(enhanced_response)
+            }
+        )
+
+    def build_single_pass_response(self, source_response: str, source_agent: str) -> AgentResponse:
+        """Record the personality step when its guidelines were folded into the source agent's prompt"""
+        tool_call = ToolCall(
+            tool_name="personality_enhancement",
+            tool_input={
+                "original_response": source_response[:100] + "..." if len(
+                    source_response) > 100 else source_response,
+                "source_agent": source_agent
+            },
+            tool_output={
+                "enhancement_applied": True,
+                "mode": "single_pass",
+                "response_length": len(source_response)
+            }
+        )
+
+        return AgentResponse(
+            agent_name=self.name,
+            agent_type=self.agent_type,
+            response=source_response,
+            tool_calls=[tool_call],
+            confidence=0.9,
+            metadata={"source_agent": source_agent, "single_pass": True}
+        )
+
+    def _build_personality_prompt(self, original_query: str, source_agent: str, source_response: str) -> str:
+        return f"""
+Original user query: {original_query}
+
+Source agent response from {source_agent} agent:
+{source_response}
+
+Transform this response to be more human-like and friendly while keeping all the factual information exactly the same. Make it conversational and warm.
+"""
@@ -1,16 +1,34 @@
 from app.agents.base_agent import BaseAgent
 from app.models.schemas import AgentResponse, AgentType, ToolCall
 from app.core.llm_client import LLMClient
-from typing import Dict, Any
+from app.core.config import settings
+from app.utils.keyword_router import KeywordRouter, RoutingDecision
+from app.utils.keywords import ROUTER_EXAMPLES
+from app.utils.embedding_router import EmbeddingRouter
+from typing import Dict, Any, Optional, Callable, Awaitable
+from datetime import datetime
+import numpy as np
 import logging
 import json
+import os
 
 logger = logging.getLogger(__name__)
 
 
 class RouterAgent(BaseAgent):
-    def __init__(self, llm_client: LLMClient):
+    def __init__(self, llm_client: LLMClient, embedder: Optional[Callable[[str], Awaitable[np.ndarray]]] = None):
         super().__init__("Router", AgentType.ROUTER, llm_client)
+        self.keyword_router = KeywordRouter()
+        self.fast_path_enabled = settings.ROUTER_FAST_PATH_ENABLED
+        self.fast_path_threshold = settings.ROUTER_FAST_PATH_THRESHOLD
+        self.path_counts = {"keyword": 0, "embedding": 0, "llm": 0, "fallback": 0}
+
+        self.embedder = embedder
+        self.embedding_router: Optional[EmbeddingRouter] = None
+        self.embedding_threshold = settings.ROUTER_EMBEDDING_THRESHOLD
+        self.index_path = settings.ROUTER_INDEX_PATH
+        self._index_mtime: Optional[float] = None
+        self.decision_log_path = settings.ROUTER_DECISION_LOG_PATH
         self.system_prompt = """
 You are a Router Agent responsible for analyzing user messages and determining which specialized agent should handle the request.
 
@@ -30,21 +48,32 @@ Analyze the user message and respond with a JSON object containing:
 }
 
 Examples:
-- "What are the fees for Maquininha Smart?" -> KNOWLEDGE (product pricing info)
-- "How can I use my phone as a card machine?" -> KNOWLEDGE (product features)
-- "I can't sign in to my account" -> SUPPORT (account access issue)
-- "Why can't I make transfers?" -> SUPPORT (account functionality issue)
-- "What is PIX?" -> KNOWLEDGE (product/service information)
+{examples}
 
 Always respond with valid JSON only.
-"""
+""".replace("{examples}", "\n".join(
+            f'- "{example}" -> {agent} ({reason})' for example, agent, reason in ROUTER_EXAMPLES
+        ))
 
     async def process(self, message: str, context: Dict[str, Any] = None) -> AgentResponse:
         try:
+            local_decision = self.keyword_router.classify(message)
+            if self.fast_path_enabled and local_decision.confidence >= self.fast_path_threshold:
+                self.path_counts["keyword"] += 1
+                return self._build_response(message, local_decision.to_metadata("keyword"), local_decision.confidence)
+
+            embedding_decision = await self._classify_by_embedding(message)
+            if embedding_decision is not None and embedding_decision.confidence >= self.embedding_threshold:
+                self.path_counts["embedding"] += 1
+                return self._build_response(
+                    message, embedding_decision.to_metadata("embedding"), embedding_decision.confidence
+                )
+
             response_text = await self.llm_client.generate_response_with_system_prompt(
                 self.system_prompt,
                 f"User message: {message}",
-                temperature=0.1
+                temperature=0.1,
+                use_cache=self.use_llm_cache
             )
 
             try:
@@ -58,28 +87,101 @@ Always respond with valid JSON only.
                     "context": {"user_intent": "unknown", "query_type": "general"}
                 }
 
-            tool_call = ToolCall(
-                tool_name="route_analysis",
-                tool_input={"message": message},
-                tool_output=routing_decision
-            )
+            routing_decision["routing_path"] = "llm"
+            routing_decision["local_confidence"] = round(local_decision.confidence, 3)
+            if embedding_decision is not None:
+                routing_decision["embedding_confidence"] = round(embedding_decision.confidence, 3)
+            self.path_counts["llm"] += 1
+            self._log_decision(message, routing_decision)
 
-            return AgentResponse(
-                agent_name=self.name,
-                agent_type=self.agent_type,
-                response=f"Routing to {routing_decision['agent']} agent: {routing_decision['reasoning']}",
-                tool_calls=[tool_call],
-                confidence=0.9,
-                metadata=routing_decision
-            )
+            return self._build_response(message, routing_decision, 0.9)
 
         except Exception as e:
             logger.error(f"Error in router agent: {str(e)}")
+            self.path_counts["fallback"] += 1
             return AgentResponse(
                 agent_name=self.name,
                 agent_type=self.agent_type,
                 response="Routing to KNOWLEDGE agent (fallback)",
                 tool_calls=[],
                 confidence=0.5,
-                metadata={"agent": "KNOWLEDGE", "reasoning": "Error fallback"}
-            )
\ No newline at end of file
+                metadata={"agent": "KNOWLEDGE", "reasoning": "Error fallback", "routing_path": "fallback"}
+            )
+
+    async def _classify_by_embedding(self, message: str) -> Optional[RoutingDecision]:
+        if self.embedder is None:
+            return None
+
+        self.reload_embedding_router()
+        if self.embedding_router is None:
+            return None
+
+        try:
+            return self.embedding_router.classify(await self.embedder(message))
+        except Exception as e:
+            logger.error(f"Error in embedding router: {str(e)}")
+            return None
+
+    def reload_embedding_router(self, force: bool = False) -> bool:
+        try:
+            mtime = os.path.getmtime(self.index_path)
+        except OSError:
+            return False
+
+        if not force and mtime == self._index_mtime:
+            return False
+
+        try:
+            self.embedding_router = EmbeddingRouter.load(self.index_path)
+            self._index_mtime = mtime
+            logger.info(f"Loaded embedding router from {self.index_path}: {self.embedding_router.get_info()}")
+            return True
+        except Exception as e:
+            logger.error(f"Error loading embedding router from {self.index_path}: {str(e)}")
+            return False
+
+    def _log_decision(self, message: str, routing_decision: Dict[str, Any]):
+        if not self.decision_log_path:
+            return
+
+        entry = {
+            "message": message,
+            "agent": routing_decision.get("agent"),
+            "routing_path": routing_decision.get("routing_path"),
+            "timestamp": datetime.now().isoformat()
+        }
+        try:
+            directory = os.path.dirname(self.decision_log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.decision_log_path, "a", encoding="utf-8") as log_file:
+                log_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.error(f"Error writing routing decision log: {str(e)}")
+
+    def _build_response(self, message: str, routing_decision: Dict[str, Any], confidence: float) -> AgentResponse:
+        tool_call = ToolCall(
+            tool_name="route_analysis",
+            tool_input={"message": message},
+            tool_output=routing_decision
+        )
+
+        return AgentResponse(
+            agent_name=self.name,
+            agent_type=self.agent_type,
+            response=f"Routing to {routing_decision['agent']} agent: {routing_decision['reasoning']}",
+            tool_calls=[tool_call],
+            confidence=confidence,
+            metadata=routing_decision
+        )
+
+    def get_routing_stats(self) -> Dict[str, Any]:
+        total = sum(self.path_counts.values())
+        return {
+            "paths": dict(self.path_counts),
+            "total": total,
+            "llm_calls_saved_ratio": (self.path_counts["keyword"] + self.path_counts["embedding"]) / total if total else 0.0,
+            "fast_path_threshold": self.fast_path_threshold,
+            "embedding_threshold": self.embedding_threshold,
+            "embedding_router": self.embedding_router.get_info() if self.embedding_router else None
+        }
\ No newline at end of file
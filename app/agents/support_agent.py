@@ -45,6 +45,9 @@ Instructions:
 Be helpful, understanding, and solution-focused.
 """
 
+    async def prefetch_customer_info(self, user_id: str) -> Dict[str, Any]:
+        return await self.call_tool("get_customer_info", user_id=user_id)
+
     async def process(self, message: str, context: Dict[str, Any] = None) -> AgentResponse:
         try:
             tool_calls = []
@@ -57,7 +60,9 @@ Be helpful, understanding, and solution-focused.
 
             if user_id:
                 try:
-                    customer_info = await self.call_tool("get_customer_info", user_id=user_id)
+                    customer_info = context.get("prefetched_customer_info")
+                    if customer_info is None:
+                        customer_info = await self.call_tool("get_customer_info", user_id=user_id)
                     tool_calls.append(ToolCall(
                         tool_name="get_customer_info",
                         tool_input={"user_id": user_id},
@@ -127,8 +132,9 @@ Offer concrete solutions and next steps.
 """
 
             support_response = await self.llm_client.generate_response_with_system_prompt(
-                self.system_prompt,
-                support_prompt
+                self.get_system_prompt(context),
+                support_prompt,
+                use_cache=self.use_llm_cache
             )
 
             return AgentResponse(
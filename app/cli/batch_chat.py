@@ -0,0 +1,65 @@
+"""Run a JSONL file of chat requests through the agent swarm, writing NDJSON results as they complete.
+
+Usage:
+    python -m app.cli.batch_chat tickets.jsonl --output results.jsonl --concurrency 8
+"""
+from typing import AsyncIterator
+from app.core.config import settings
+from app.core.batch import BatchProcessor, iter_ndjson
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+
+async def read_chunks(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as input_file:
+        for line in input_file:
+            yield line
+
+
+async def run_batch(args) -> dict:
+    from app.main import orchestrator
+
+    await orchestrator.initialize()
+
+    processor = BatchProcessor(
+        orchestrator,
+        concurrency=args.concurrency,
+        response_mode=args.mode,
+        shared_retrieval_entries=settings.BATCH_SHARED_RETRIEVAL_ENTRIES
+    )
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        async for result in processor.run(iter_ndjson(read_chunks(args.input))):
+            output.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    return processor.get_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process a JSONL file of chat requests")
+    parser.add_argument("input", help="JSONL file with one {\"message\", \"user_id\"} object per line")
+    parser.add_argument("--output", help="Write NDJSON results here instead of stdout")
+    parser.add_argument("--concurrency", type=int, default=settings.BATCH_CONCURRENCY)
+    parser.add_argument("--mode", choices=["two_pass", "single_pass"], default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    started = time.perf_counter()
+    stats = asyncio.run(run_batch(args))
+    logger.info(f"Batch finished in {time.perf_counter() - started:.1f}s: {stats}")
+
+
+if __name__ == "__main__":
+    main()
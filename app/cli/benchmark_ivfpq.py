@@ -0,0 +1,227 @@
+"""Recall, latency and memory of an IvfPqCollection against brute force on a synthetic large corpus.
+
+The corpus is generated chunk by chunk into a memory-mapped float32 file, so a million 384-dim vectors
+never need to fit in memory at once. Ground truth is computed in this process. Loading the corpus into
+an IvfPqCollection (with documents and metadata) and training it runs in one child process. Serving the
+queries from the reopened collection, with its files evicted from the page cache, runs in another. Each
+phase reports its peak RSS (VmHWM) and its peak anonymous RSS. Peak RSS also counts pages of the
+memory-mapped vector files, which the kernel can reclaim. Anonymous RSS is the heap the process needs.
+
+Usage:
+    python -m app.cli.benchmark_ivfpq [--rows 1000000] [--dim 384] [--queries 200] [--k 10]
+        [--nprobe 4 8 16 32 64] [--rescore-factor 50] [--nlist 0] [--subquantizers 48]
+"""
+from typing import Dict, List
+from app.tools.vector_backends.ivfpq_backend import IvfPqCollection
+from app.tools.vector_backends.numpy_backend import _top_k
+import argparse
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+GENERATE_BLOCK_ROWS = 65536
+BRUTE_FORCE_BLOCK_ROWS = 131072
+# Single-query brute force is slow at a million rows, so only this many queries are timed
+BRUTE_FORCE_TIMED_QUERIES = 20
+LOAD_BATCH_ROWS = 65536
+
+
+def generate_corpus(path: str, rows: int, dim: int, seed: int) -> np.ndarray:
+    """Normalised vectors around rows / 1000 random topics, standing in for a multi-site corpus."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, rows // 1000), dim)).astype(np.float32)
+    vectors = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(rows, dim))
+
+    for start in range(0, rows, GENERATE_BLOCK_ROWS):
+        count = min(GENERATE_BLOCK_ROWS, rows - start)
+        block = centers[rng.integers(0, len(centers), count)] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+        vectors[start:start + count] = block / np.linalg.norm(block, axis=1, keepdims=True)
+
+    vectors.flush()
+    return np.load(path, mmap_mode="r")
+
+
+def brute_force(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Exact top-k for all queries at once, scanning the corpus in blocks."""
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), k), dtype=np.int64)
+
+    for start in range(0, len(vectors), BRUTE_FORCE_BLOCK_ROWS):
+        scores = queries @ np.asarray(vectors[start:start + BRUTE_FORCE_BLOCK_ROWS]).T
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        block_rows = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+        merged_rows = np.concatenate([best_rows, block_rows], axis=1)
+        top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(merged_scores, top, axis=1)
+        best_rows = np.take_along_axis(merged_rows, top, axis=1)
+
+    return best_rows
+
+
+def brute_force_latencies(vectors: np.ndarray, queries: np.ndarray, k: int) -> list:
+    """One query at a time, as the flat backends serve them."""
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        _top_k(vectors, np.arange(len(vectors)), query, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def memory_usage() -> Dict[str, float]:
+    """Peak and current resident set of this process in MB, from /proc/self/status (Linux)."""
+    usage = {}
+    with open("/proc/self/status") as status:
+        for line in status:
+            key, _, value = line.partition(":")
+            if key in ("VmHWM", "VmRSS", "RssAnon", "RssFile"):
+                usage[key] = int(value.split()[0]) / 1024
+    return usage
+
+
+class AnonymousRssSampler:
+    """Polls RssAnon on a thread while in use; the kernel only keeps the peak of the total RSS (VmHWM)."""
+
+    def __init__(self, interval_s: float = 0.05):
+        self.interval_s = interval_s
+        self.peak_mb = 0.0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stopped.set()
+        self._thread.join()
+
+    def _sample(self):
+        while True:
+            self.peak_mb = max(self.peak_mb, memory_usage()["RssAnon"])
+            if self._stopped.wait(self.interval_s):
+                return
+
+
+def build_collection(corpus_path: str, directory: str, nlist: int, subquantizers: int) -> Dict:
+    """Loads the corpus into a new IvfPqCollection in batches, like incremental indexing would, then trains it."""
+    logging.basicConfig(level=logging.INFO)
+    vectors = np.load(corpus_path, mmap_mode="r")
+    with AnonymousRssSampler() as sampler:
+        collection = IvfPqCollection("bench", directory, nlist=nlist, subquantizers=subquantizers,
+                                     min_train_rows=0, background_training=False)
+
+        started = time.perf_counter()
+        for start in range(0, len(vectors), LOAD_BATCH_ROWS):
+            end = min(start + LOAD_BATCH_ROWS, len(vectors))
+            collection.upsert(
+                ids=[f"chunk-{i}" for i in range(start, end)],
+                documents=[f"synthetic chunk {i}" for i in range(start, end)],
+                metadatas=[{"chunk_type": "text", "collection_type": "text", "url": f"https://example.com/{i % 1000}"}
+                           for i in range(start, end)],
+                embeddings=np.asarray(vectors[start:end])
+            )
+        loaded = time.perf_counter()
+        collection.build_index(force_train=True)
+        built = time.perf_counter()
+        collection.close()
+
+    return {"load_s": loaded - started, "build_s": built - loaded, "peak_anon_mb": sampler.peak_mb, **memory_usage()}
+
+
+def serve_queries(directory: str, queries: np.ndarray, truth: np.ndarray, k: int, nprobes: List[int],
+                  rescore_factor: int) -> Dict:
+    """Opens the collection from disk, as a restarted pod would, and times single-query searches."""
+    logging.basicConfig(level=logging.INFO)
+    # The build just wrote these files, so drop them from the page cache to serve from a cold start
+    for filename in os.listdir(directory):
+        descriptor = os.open(os.path.join(directory, filename), os.O_RDONLY)
+        try:
+            os.posix_fadvise(descriptor, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(descriptor)
+
+    with AnonymousRssSampler() as sampler:
+        started = time.perf_counter()
+        collection = IvfPqCollection("bench", directory, rescore_factor=rescore_factor, background_training=False)
+        opened = time.perf_counter() - started
+
+        runs = []
+        for nprobe in nprobes:
+            collection.nprobe = nprobe
+            latencies = []
+            hits = 0
+            for query, expected in zip(queries, truth):
+                query_started = time.perf_counter()
+                found = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])["ids"][0]
+                latencies.append((time.perf_counter() - query_started) * 1000)
+                hits += len({int(doc_id.split("-")[1]) for doc_id in found} & set(expected.tolist()))
+            runs.append({"nprobe": nprobe, "p50_ms": np.percentile(latencies, 50),
+                         "p95_ms": np.percentile(latencies, 95), "recall": hits / (len(queries) * k)})
+
+        stats = collection.get_stats()
+        collection.close()
+    return {"open_s": opened, "runs": runs, "resident_bytes": stats["resident_bytes"],
+            "peak_anon_mb": sampler.peak_mb, **memory_usage()}
+
+
+def run_isolated(function, *args):
+    # A fresh interpreter per phase, so each reports its own peak RSS rather than this process's
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(function, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark IVF-PQ recall and latency against brute force")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    parser.add_argument("--rescore-factor", type=int, default=50)
+    parser.add_argument("--nlist", type=int, default=0, help="Coarse lists (0 = sqrt(rows))")
+    parser.add_argument("--subquantizers", type=int, default=48)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workdir", help="Where to write the corpus (a temporary directory by default)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    with tempfile.TemporaryDirectory(prefix="bench-ivfpq-", dir=args.workdir) as directory:
+        started = time.perf_counter()
+        vectors = generate_corpus(os.path.join(directory, "vectors.npy"), args.rows, args.dim, args.seed)
+        logger.info(f"Generated {args.rows} x {args.dim} vectors in {time.perf_counter() - started:.1f}s")
+
+        rng = np.random.default_rng(args.seed + 1)
+        queries = np.asarray(vectors[np.sort(rng.choice(args.rows, args.queries, replace=False))], dtype=np.float32)
+        queries += 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        truth = brute_force(vectors, queries, args.k)
+        latencies = brute_force_latencies(vectors, queries[:BRUTE_FORCE_TIMED_QUERIES], args.k)
+        logger.info(f"Brute force: p50_ms={np.percentile(latencies, 50):.2f} p95_ms={np.percentile(latencies, 95):.2f} "
+                    f"over {vectors.nbytes / 2 ** 20:.0f} MB of float32")
+
+        collection_path = os.path.join(directory, "collection")
+        built = run_isolated(build_collection, os.path.join(directory, "vectors.npy"), collection_path,
+                             args.nlist, args.subquantizers)
+        logger.info(f"Loaded in {built['load_s']:.1f}s, trained and encoded in {built['build_s']:.1f}s; "
+                    f"peak RSS {built['VmHWM']:.0f} MB, peak anonymous RSS {built['peak_anon_mb']:.0f} MB")
+
+        served = run_isolated(serve_queries, collection_path, queries, truth, args.k, args.nprobe, args.rescore_factor)
+        for run in served["runs"]:
+            logger.info(f"nprobe={run['nprobe']} p50_ms={run['p50_ms']:.2f} p95_ms={run['p95_ms']:.2f} "
+                        f"recall@{args.k}={run['recall']:.4f}")
+        logger.info(f"Serving: opened in {served['open_s']:.1f}s, peak RSS {served['VmHWM']:.0f} MB, "
+                    f"peak anonymous RSS {served['peak_anon_mb']:.0f} MB, resident arrays {served['resident_bytes'] / 2 ** 20:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
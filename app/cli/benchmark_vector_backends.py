@@ -0,0 +1,135 @@
+"""Run the same query set against every vector backend and report latency and recall@k.
+
+Each backend is loaded into its own temporary directory from a synthetic dataset, or from a
+snapshot written by `VectorIndex.snapshot`. Recall is measured against exact cosine search.
+`--quantization` adds one NumPy run per storage mode (float16, int8).
+
+Usage:
+    python -m app.cli.benchmark_vector_backends [--backends chroma numpy faiss] [--snapshot PATH]
+        [--quantization float16 int8] [--rows 20000] [--dim 384] [--queries 200] [--k 10]
+"""
+from typing import Callable, List, Tuple
+from app.tools.vector_backends.base import VectorBackend, load_snapshot
+from app.tools.vector_backends.numpy_backend import NumpyClient
+from app.tools.vector_backends.registry import available_backends, create_backend
+import argparse
+import logging
+import tempfile
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LOAD_BATCH_SIZE = 1000
+
+
+def synthetic_dataset(rows: int, dim: int, seed: int):
+    """Clustered vectors, so nearest neighbours are meaningful rather than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, rows // 100), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), rows)] + 0.3 * rng.standard_normal((rows, dim)).astype(np.float32)
+    ids = [f"chunk-{i}" for i in range(rows)]
+    documents = [f"synthetic chunk {i}" for i in range(rows)]
+    metadatas = [{"chunk_type": "text", "collection_type": "text", "url": f"https://example.com/{i % 50}"}
+                 for i in range(rows)]
+    return ids, documents, metadatas, vectors
+
+
+def sample_queries(vectors: np.ndarray, count: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    picked = np.asarray(vectors[rng.integers(0, len(vectors), count)], dtype=np.float32)
+    return picked + 0.1 * rng.standard_normal(picked.shape).astype(np.float32)
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    normalized = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarities = queries @ normalized.T
+    return np.argsort(-similarities, axis=1, kind="stable")[:, :k]
+
+
+def benchmark_targets(backends: List[str], quantization: List[str]) -> List[Tuple[str, Callable[[str], VectorBackend]]]:
+    targets = [(name, lambda directory, name=name: create_backend(name, directory)) for name in backends]
+    for mode in quantization:
+        targets.append((f"numpy-{mode}", lambda directory, mode=mode: NumpyClient(directory, quantization=mode)))
+    return targets
+
+
+def benchmark_backend(name: str, factory: Callable[[str], VectorBackend], dataset, queries: np.ndarray,
+                      truth: np.ndarray, k: int) -> dict:
+    ids, documents, metadatas, vectors = dataset
+
+    with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as directory:
+        backend = factory(directory)
+        collection = backend.get_or_create_collection("benchmark", metadata={"hnsw:space": "cosine"})
+
+        load_started = time.perf_counter()
+        for start in range(0, len(ids), LOAD_BATCH_SIZE):
+            end = start + LOAD_BATCH_SIZE
+            collection.upsert(
+                ids=ids[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end],
+                embeddings=np.asarray(vectors[start:end], dtype=np.float32).tolist()
+            )
+        load_seconds = time.perf_counter() - load_started
+
+        row_of = {chunk_id: row for row, chunk_id in enumerate(ids)}
+        latencies = []
+        hits = 0
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            results = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += len({row_of[chunk_id] for chunk_id in results["ids"][0]} & set(expected.tolist()))
+
+        report = {
+            "backend": name,
+            "load_seconds": round(load_seconds, 2),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            f"recall@{k}": round(hits / (len(queries) * k), 4)
+        }
+        if hasattr(collection, "get_stats"):
+            report["resident_vector_mb"] = round(collection.get_stats()["resident_vector_bytes"] / 2 ** 20, 1)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vector backends on one query set")
+    parser.add_argument("--backends", nargs="+", default=available_backends())
+    parser.add_argument("--snapshot", help="Directory written by VectorIndex.snapshot; synthetic data otherwise")
+    parser.add_argument("--quantization", nargs="*", default=[], choices=["float16", "int8"],
+                        help="Also run the NumPy backend with these quantized storage modes")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.snapshot:
+        dataset = load_snapshot(args.snapshot, mmap=False)
+    else:
+        dataset = synthetic_dataset(args.rows, args.dim, args.seed)
+
+    vectors = dataset[3]
+    queries = sample_queries(vectors, args.queries, args.seed)
+    queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    truth = exact_neighbours(vectors, queries, args.k)
+    logger.info(f"Dataset: {len(dataset[0])} rows x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    for name, factory in benchmark_targets(args.backends, args.quantization):
+        try:
+            report = benchmark_backend(name, factory, dataset, queries, truth, args.k)
+        except ImportError as e:
+            logger.warning(f"Skipping {name}: {str(e)}")
+            continue
+        logger.info(" ".join(f"{key}={value}" for key, value in report.items()))
+
+
+if __name__ == "__main__":
+    main()
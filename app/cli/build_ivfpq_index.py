@@ -0,0 +1,85 @@
+"""Train and encode the IVF-PQ index of the ivfpq vector backend.
+
+By default every collection under VECTOR_STORE_PATH/ivfpq is compacted (dropping the rows that deletes
+and changed vectors left behind) and retrained in place. `--from-numpy` first copies the collections of
+the numpy backend, and `--snapshot` imports one `VectorIndex.snapshot` directory as `--collection`. Both
+share the vectors.npy + metadata.json layout, so nothing is re-embedded. Set VECTOR_BACKEND=ivfpq afterwards.
+
+Usage:
+    python -m app.cli.build_ivfpq_index [--from-numpy | --snapshot PATH --collection NAME]
+        [--nlist 0] [--subquantizers 48]
+"""
+from app.core.config import settings
+from app.tools.vector_backends.ivfpq_backend import IvfPqCollection, ROWS_DB_FILE
+import argparse
+import logging
+import os
+import shutil
+import time
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILES = ("vectors.npy", "metadata.json")
+
+
+def import_collection(source: str, target: str):
+    os.makedirs(target, exist_ok=True)
+    for filename in SNAPSHOT_FILES:
+        # Copy to a temp name first so an interrupted import never leaves a half-written collection
+        shutil.copyfile(os.path.join(source, filename), os.path.join(target, f"{filename}.importing"))
+    # IvfPqCollection imports these files into its own storage (and drops any old index) when opened
+    for filename in SNAPSHOT_FILES:
+        os.replace(os.path.join(target, f"{filename}.importing"), os.path.join(target, filename))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the IVF-PQ index for the ivfpq vector backend")
+    parser.add_argument("--path", default=settings.VECTOR_STORE_PATH)
+    parser.add_argument("--from-numpy", action="store_true", help="Import the numpy backend's collections first")
+    parser.add_argument("--snapshot", help="Import a VectorIndex.snapshot directory first")
+    parser.add_argument("--collection", help="Collection name for --snapshot")
+    parser.add_argument("--nlist", type=int, default=settings.IVFPQ_NLIST, help="Coarse lists (0 = sqrt(rows))")
+    parser.add_argument("--subquantizers", type=int, default=settings.IVFPQ_SUBQUANTIZERS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    ivfpq_path = os.path.join(args.path, "ivfpq")
+    if args.snapshot:
+        if not args.collection:
+            parser.error("--snapshot needs --collection")
+        import_collection(args.snapshot, os.path.join(ivfpq_path, args.collection))
+    elif args.from_numpy:
+        numpy_path = os.path.join(args.path, "numpy")
+        for name in sorted(os.listdir(numpy_path)):
+            if os.path.exists(os.path.join(numpy_path, name, "metadata.json")):
+                import_collection(os.path.join(numpy_path, name), os.path.join(ivfpq_path, name))
+                logger.info(f"Imported {name} from the numpy backend")
+
+    names = sorted(
+        name for name in os.listdir(ivfpq_path)
+        if any(os.path.exists(os.path.join(ivfpq_path, name, filename)) for filename in ("metadata.json", ROWS_DB_FILE))
+    ) if os.path.isdir(ivfpq_path) else []
+    if not names:
+        logger.warning(f"No collections found under {ivfpq_path}")
+        return
+
+    for name in names:
+        collection = IvfPqCollection(name, os.path.join(ivfpq_path, name), nlist=args.nlist,
+                                     subquantizers=args.subquantizers, background_training=False)
+        if not collection.count():
+            collection.close()
+            continue
+
+        started = time.perf_counter()
+        reclaimed = collection.compact()
+        collection.build_index(force_train=True)
+        stats = collection.get_stats()
+        logger.info(f"Built {name}: {stats['rows']} rows ({reclaimed} dead rows reclaimed), "
+                    f"{stats['ivfpq']['lists']} lists, {stats['resident_bytes'] / 2 ** 20:.1f} MB of resident arrays, "
+                    f"{time.perf_counter() - started:.1f}s")
+        collection.close()
+
+
+if __name__ == "__main__":
+    main()
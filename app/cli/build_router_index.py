@@ -0,0 +1,78 @@
+"""Rebuild the embedding router index from the router's few-shot examples and a routing decision log.
+
+Usage:
+    python -m app.cli.build_router_index --log ./data/router_decisions.jsonl
+"""
+from typing import List, Tuple
+from app.core.config import settings
+from app.utils.embedding_router import EmbeddingRouter
+from app.utils.keywords import ROUTER_EXAMPLES
+import argparse
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def load_decisions(log_path: str, include_paths: List[str]) -> List[Tuple[str, str]]:
+    decisions = {}
+    with open(log_path, encoding="utf-8") as log_file:
+        for line_number, line in enumerate(log_file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping malformed decision log line {line_number}")
+                continue
+
+            agent = str(entry.get("agent", "")).upper()
+            if agent not in ("KNOWLEDGE", "SUPPORT") or not entry.get("message"):
+                continue
+            if include_paths and entry.get("routing_path") not in include_paths:
+                continue
+
+            # Later decisions win so relabelled messages don't vote for both classes
+            decisions[entry["message"].strip()] = agent
+
+    return list(decisions.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the embedding router index")
+    parser.add_argument("--log", action="append", default=[], help="Routing decision JSONL log (repeatable)")
+    parser.add_argument("--output", default=settings.ROUTER_INDEX_PATH)
+    parser.add_argument("--mode", choices=["centroid", "knn"], default="centroid")
+    parser.add_argument("--k", type=int, default=7)
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--include-paths", nargs="*", default=["llm"],
+                        help="Only train on decisions taken by these routing paths (empty = all)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    examples = [(message, agent) for message, agent, _ in ROUTER_EXAMPLES]
+    for log_path in args.log:
+        examples.extend(load_decisions(log_path, args.include_paths))
+
+    messages = [message for message, _ in examples]
+    labels = [agent for _, agent in examples]
+
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(args.model)
+    started = time.perf_counter()
+    embeddings = model.encode(messages, normalize_embeddings=True, show_progress_bar=False)
+    logger.info(f"Embedded {len(messages)} examples in {time.perf_counter() - started:.1f}s")
+
+    router = EmbeddingRouter.build(embeddings, labels, mode=args.mode, k=args.k)
+    router.save(args.output)
+
+    counts = {label: labels.count(label) for label in sorted(set(labels))}
+    logger.info(f"Wrote {args.mode} router index to {args.output}: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Copy the text/pricing/structured Chroma collections into the single unified collection.
+
+Stored embeddings are reused, so nothing is re-encoded. Set VECTOR_STORE_LAYOUT=unified afterwards.
+
+Usage:
+    python -m app.cli.migrate_vector_store [--drop-old]
+"""
+from app.core.config import settings
+from app.tools.vector_store import VectorStore
+import argparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate the vector store to the unified collection layout")
+    parser.add_argument("--path", default=settings.VECTOR_STORE_PATH)
+    parser.add_argument("--drop-old", action="store_true", help="Empty the split collections after copying")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    vector_store = VectorStore(persist_directory=args.path, embedding_model=settings.EMBEDDING_MODEL)
+    migrated = vector_store.migrate_to_unified(drop_old=args.drop_old)
+    vector_store.close()
+
+    logger.info(f"Migrated {sum(migrated.values())} chunks: {migrated}")
+    if settings.VECTOR_STORE_LAYOUT != "unified":
+        logger.info("Set VECTOR_STORE_LAYOUT=unified to serve searches from the unified collection")
+
+
+if __name__ == "__main__":
+    main()
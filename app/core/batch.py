@@ -0,0 +1,189 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, AsyncIterable, AsyncIterator, Iterable, Optional
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchItem:
+    index: int
+    message: Optional[str] = None
+    user_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+def parse_batch_entry(index: int, entry: Any) -> BatchItem:
+    if not isinstance(entry, dict):
+        return BatchItem(index=index, error="Each batch entry must be a JSON object")
+
+    message = entry.get("message")
+    user_id = entry.get("user_id")
+    if not isinstance(message, str) or not message.strip():
+        return BatchItem(index=index, error="Field 'message' is required")
+    if not isinstance(user_id, str) or not user_id.strip():
+        return BatchItem(index=index, error="Field 'user_id' is required")
+
+    return BatchItem(index=index, message=message, user_id=user_id)
+
+
+async def iter_json_array(entries: Iterable[Any]) -> AsyncIterator[BatchItem]:
+    for index, entry in enumerate(entries):
+        yield parse_batch_entry(index, entry)
+
+
+async def iter_ndjson(chunks: AsyncIterable[bytes]) -> AsyncIterator[BatchItem]:
+    # Lines are parsed as they arrive, so work starts before a large upload has finished
+    index = 0
+    buffer = b""
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            item = _parse_ndjson_line(index, line)
+            if item is not None:
+                index += 1
+                yield item
+
+    item = _parse_ndjson_line(index, buffer)
+    if item is not None:
+        yield item
+
+
+def iter_ndjson_body(body: bytes) -> AsyncIterator[BatchItem]:
+    async def single_chunk():
+        yield body
+
+    return iter_ndjson(single_chunk())
+
+
+def _parse_ndjson_line(index: int, line: bytes) -> Optional[BatchItem]:
+    line = line.strip()
+    if not line:
+        return None
+
+    try:
+        return parse_batch_entry(index, json.loads(line))
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        return BatchItem(index=index, error=f"Invalid JSON: {str(e)}")
+
+
+def _consume_exception(task: asyncio.Future):
+    # Failures are reported to whichever request awaits the task; this only keeps asyncio quiet
+    if not task.cancelled():
+        task.exception()
+
+
+def normalize_message(message: str) -> str:
+    return " ".join(message.lower().split())
+
+
+class BatchProcessor:
+    """Runs batch entries through the orchestrator with bounded concurrency, yielding results as they finish."""
+
+    def __init__(self, orchestrator, concurrency: int = 8, response_mode: Optional[str] = None,
+                 shared_retrieval_entries: int = 1024):
+        self.orchestrator = orchestrator
+        self.concurrency = max(1, concurrency)
+        self.response_mode = response_mode
+        self.shared_retrieval_entries = shared_retrieval_entries
+        self._shared_retrievals: "OrderedDict[str, asyncio.Future]" = OrderedDict()
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "invalid": 0,
+            "shared_retrievals": 0
+        }
+
+    async def run(self, items: AsyncIterable[BatchItem]) -> AsyncIterator[Dict[str, Any]]:
+        results: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending = set()
+
+        async def worker(item: BatchItem):
+            try:
+                result = await self._process_item(item)
+            finally:
+                semaphore.release()
+            await results.put(result)
+
+        async def feed():
+            try:
+                async for item in items:
+                    # Acquiring before spawning also stops the reader from running ahead of the workers
+                    await semaphore.acquire()
+                    self.stats["submitted"] += 1
+                    task = asyncio.ensure_future(worker(item))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+
+                if pending:
+                    await asyncio.gather(*pending)
+            finally:
+                results.put_nowait(None)
+
+        feeder = asyncio.ensure_future(feed())
+        try:
+            while True:
+                result = await results.get()
+                if result is None:
+                    break
+                yield result
+        finally:
+            for task in [feeder, *pending, *self._shared_retrievals.values()]:
+                if not task.done():
+                    task.cancel()
+            self._shared_retrievals.clear()
+
+        if not feeder.cancelled() and feeder.exception() is not None:
+            raise feeder.exception()
+
+    async def _process_item(self, item: BatchItem) -> Dict[str, Any]:
+        if item.error is not None:
+            self.stats["invalid"] += 1
+            return {"index": item.index, "error": item.error}
+
+        started = time.perf_counter()
+        try:
+            response = await self.orchestrator.process_message(
+                item.message,
+                item.user_id,
+                response_mode=self.response_mode,
+                shared_retrieval=lambda: self._shared_retrieval(item.message)
+            )
+            self.stats["completed"] += 1
+            return {
+                "index": item.index,
+                "user_id": item.user_id,
+                "response": response.model_dump() if hasattr(response, "model_dump") else response,
+                "processing_time_ms": round((time.perf_counter() - started) * 1000, 2)
+            }
+        except Exception as e:
+            logger.error(f"Error processing batch entry {item.index}: {str(e)}")
+            self.stats["failed"] += 1
+            return {"index": item.index, "user_id": item.user_id, "error": str(e)}
+
+    def _shared_retrieval(self, message: str) -> asyncio.Future:
+        # Duplicate messages in a batch await the same retrieval (and so the same query embedding)
+        key = normalize_message(message)
+        task = self._shared_retrievals.get(key)
+        if task is not None:
+            self._shared_retrievals.move_to_end(key)
+            self.stats["shared_retrievals"] += 1
+            return task
+
+        task = asyncio.ensure_future(self.orchestrator.knowledge_agent.retrieve(message))
+        task.add_done_callback(_consume_exception)
+        self._shared_retrievals[key] = task
+        while len(self._shared_retrievals) > self.shared_retrieval_entries:
+            self._shared_retrievals.popitem(last=False)
+        return task
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"concurrency": self.concurrency, **self.stats}
@@ -0,0 +1,188 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + optional SQLite) cache for LLM completions.
+
+    `aget`/`aset` are the event-loop entry points: disk reads run on a dedicated thread and disk writes are
+    queued behind the in-memory update, so SQLite never blocks the loop.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path or None
+
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_executor: Optional[ThreadPoolExecutor] = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_path:
+            self._init_disk()
+
+    def _init_disk(self):
+        directory = os.path.dirname(self.disk_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._db = sqlite3.connect(self.disk_path, check_same_thread=False)
+        # One thread, so queued writes land in order
+        self._disk_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache-disk")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], temperature: Optional[float],
+                 max_tokens: Optional[int]) -> str:
+        payload = json.dumps(
+            {
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens
+            },
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._get_from_memory(key)
+        if value is None and self._db is not None:
+            value = self._get_from_disk(key)
+        return self._record_lookup(value)
+
+    async def aget(self, key: str) -> Optional[str]:
+        value = self._get_from_memory(key)
+        if value is None and self._db is not None:
+            value = await asyncio.get_running_loop().run_in_executor(self._disk_executor, self._get_from_disk, key)
+        return self._record_lookup(value)
+
+    def set(self, key: str, value: str):
+        created_at = time.time()
+        with self._lock:
+            self._store_in_memory(key, value, created_at)
+        if self._db is not None:
+            self._write_to_disk(key, value, created_at)
+
+    async def aset(self, key: str, value: str):
+        created_at = time.time()
+        with self._lock:
+            self._store_in_memory(key, value, created_at)
+        if self._db is not None:
+            # Write-behind: the entry is already served from memory, so nobody waits on the disk
+            self._disk_executor.submit(self._write_to_disk, key, value, created_at)
+
+    def _get_from_memory(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, value = entry
+            if not self._is_expired(created_at):
+                self._entries.move_to_end(key)
+                return value
+            del self._entries[key]
+            return None
+
+    def _get_from_disk(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if not self._is_expired(created_at):
+                self._store_in_memory(key, value, created_at)
+                self.disk_hits += 1
+                return value
+            self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+
+    def _record_lookup(self, value: Optional[str]) -> Optional[str]:
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def _write_to_disk(self, key: str, value: str, created_at: float):
+        with self._lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, value, created_at)
+                )
+                if self.ttl_seconds > 0:
+                    self._db.execute(
+                        "DELETE FROM llm_cache WHERE created_at < ?",
+                        (created_at - self.ttl_seconds,)
+                    )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error writing LLM cache entry to disk: {str(e)}")
+
+    def _store_in_memory(self, key: str, value: str, created_at: float):
+        self._entries[key] = (created_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def close(self):
+        """Waits for queued disk writes, then closes the database."""
+        if self._disk_executor is not None:
+            self._disk_executor.shutdown(wait=True)
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+            self._db = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "disk_enabled": self._db is not None
+            }
+            if self._db is not None:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            return stats
@@ -1,6 +1,5 @@
 from typing import Dict, List, Any
-from datetime import datetime
-import asyncio
+from app.core.context import get_request_context
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,8 +9,6 @@ class AgentCommunicationHub:
 
     def __init__(self):
         self.agents: Dict[str, Any] = {}
-        self.message_history: List[Dict[str, Any]] = []
-        self.workflow_log: List[Dict[str, Any]] = []
 
     def register_agent(self, agent_name: str, agent_instance):
         self.agents[agent_name] = agent_instance
@@ -21,27 +18,20 @@ class AgentCommunicationHub:
         if to_agent not in self.agents:
             raise ValueError(f"Agent {to_agent} not found")
 
-        comm_log = {
-            "from_agent": from_agent,
-            "to_agent": to_agent,
-            "message": message,
-            "context": context or {},
-            "timestamp": datetime.now().isoformat()
-        }
-        self.message_history.append(comm_log)
+        request_context = get_request_context()
+        if request_context is not None:
+            request_context.record_message(from_agent, to_agent, message, context)
 
         response = await self.agents[to_agent].process(message, context)
 
-        workflow_step = {
-            "agent_name": to_agent,
-            "tool_calls": {tc.tool_name: tc.tool_output for tc in response.tool_calls}
-        }
-        self.workflow_log.append(workflow_step)
+        if request_context is not None:
+            request_context.record_step(
+                to_agent,
+                {tc.tool_name: tc.tool_output for tc in response.tool_calls}
+            )
 
         return response
 
     def get_workflow_log(self) -> List[Dict[str, Any]]:
-        return self.workflow_log.copy()
-
-    def reset_workflow(self):
-        self.workflow_log.clear()
\ No newline at end of file
+        request_context = get_request_context()
+        return request_context.get_workflow_log() if request_context is not None else []
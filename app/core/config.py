@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import List, Dict, Optional
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
@@ -13,9 +13,85 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     LLM_MODEL: str = "gpt-3.5-turbo"
     LLM_TEMPERATURE: float = 0.7
+    # Tokens of retrieved context per knowledge prompt, by LLM_MODEL ("default" for unlisted models)
+    CONTEXT_TOKEN_BUDGETS: Dict[str, int] = {"default": 500}
+
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MAX_ENTRIES: int = 1024
+    LLM_CACHE_TTL_SECONDS: int = 3600
+    LLM_CACHE_DISK_PATH: str = ""
+    LLM_CACHE_AGENTS: List[str] = ["router", "knowledge", "personality"]
+
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 2000
+    SEMANTIC_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    SEMANTIC_CACHE_USER_SCOPED_TTL_SECONDS: int = 60
+
+    ROUTER_FAST_PATH_ENABLED: bool = True
+    ROUTER_FAST_PATH_THRESHOLD: float = 0.8
+    ROUTER_EMBEDDING_THRESHOLD: float = 0.85
+    ROUTER_INDEX_PATH: str = "./data/router_index.npz"
+    ROUTER_DECISION_LOG_PATH: str = ""
+
+    SPECULATIVE_EXECUTION_ENABLED: bool = True
+    SPECULATIVE_CANCEL_POLICY: str = "cancel"
+
+    RESPONSE_MODE: str = "two_pass"
+
+    BATCH_CONCURRENCY: int = 8
+    BATCH_MAX_CONCURRENCY: int = 32
+    BATCH_SHARED_RETRIEVAL_ENTRIES: int = 1024
 
     VECTOR_STORE_PATH: str = "./data/vector_store"
+    VECTOR_STORE_LAYOUT: str = "split"
+    VECTOR_BACKEND: str = "chroma"
+    VECTOR_QUANTIZATION: str = "none"
+    VECTOR_RESCORE_FACTOR: int = 4
+    IVFPQ_NLIST: int = 0
+    IVFPQ_SUBQUANTIZERS: int = 48
+    IVFPQ_NPROBE: int = 16
+    IVFPQ_RESCORE_FACTOR: int = 50
+    IVFPQ_MIN_TRAIN_ROWS: int = 20000
+    IVFPQ_BACKGROUND_TRAINING: bool = True
+    VECTOR_STORE_UNIFIED_OVERFETCH: int = 3
+    VECTOR_QUERY_WORKERS: int = 4
+    VECTOR_QUERY_TIMEOUT_MS: float = 0
+    INCREMENTAL_INDEXING: bool = True
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_MAX_BATCH_SIZE: int = 32
+    EMBEDDING_MAX_WAIT_MS: float = 5.0
+    EMBEDDING_WORKERS: int = 1
+
+    QUERY_EMBEDDING_CACHE_ENABLED: bool = True
+    QUERY_EMBEDDING_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    QUERY_EMBEDDING_CACHE_PATH: str = ""
+
+    CHUNK_EMBEDDING_CACHE_PATH: str = "./data/chunk_embeddings.sqlite"
+    CHUNK_EMBEDDING_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_LEXICAL_CANDIDATES: int = 20
+    HYBRID_RRF_K: int = 60
+
+    RERANKER_ENABLED: bool = False
+    RERANKER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANKER_CANDIDATES: int = 20
+    RERANKER_BATCH_SIZE: int = 16
+    RERANKER_MAX_LENGTH: int = 256
+    RERANKER_CACHE_ENTRIES: int = 4096
+    RERANKER_MIN_SCORE: Optional[float] = None
+
+    SCRAPER_MAX_CONCURRENCY: int = 16
+    SCRAPER_PER_HOST_CONCURRENCY: int = 4
+    SCRAPER_MAX_KEEPALIVE_CONNECTIONS: int = 8
+    SCRAPER_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    SCRAPER_HTTP2: bool = True
+    SCRAPER_TIMEOUT_SECONDS: float = 30.0
+    SCRAPER_RETRIES: int = 3
+    SCRAPER_BACKOFF_BASE_MS: float = 500
+    SCRAPER_BACKOFF_MAX_MS: float = 10000
+    SCRAPER_HTTP_CACHE_PATH: str = "./data/http_cache.sqlite"
 
     INFINITEPAY_URLS: List[str] = [
         "https://www.infinitepay.io",
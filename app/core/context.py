@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterator
+import time
+import uuid
+
+
+@dataclass
+class RequestContext:
+    """Workflow log, message history and trace for a single chat request."""
+
+    request_id: str
+    user_id: Optional[str] = None
+    started_at: float = field(default_factory=time.perf_counter)
+    workflow_log: List[Dict[str, Any]] = field(default_factory=list)
+    message_history: List[Dict[str, Any]] = field(default_factory=list)
+    trace: List[Dict[str, Any]] = field(default_factory=list)
+    llm_usage: Dict[str, int] = field(default_factory=lambda: {
+        "calls": 0, "shared_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0
+    })
+
+    def record_step(self, agent_name: str, tool_calls: Dict[str, Any]):
+        self.workflow_log.append({"agent_name": agent_name, "tool_calls": tool_calls})
+
+    def record_message(self, from_agent: str, to_agent: str, message: str, context: Dict[str, Any] = None):
+        self.message_history.append({
+            "from_agent": from_agent,
+            "to_agent": to_agent,
+            "message": message,
+            "context": context or {},
+            "timestamp": datetime.now().isoformat()
+        })
+
+    def record_event(self, event: str, **details):
+        self.trace.append({
+            "event": event,
+            "elapsed_ms": round(self.elapsed_ms(), 2),
+            **details
+        })
+
+    def record_llm_usage(self, usage, shared: bool = False):
+        """Counts one LLM call; `shared` marks a call deduplicated onto another request's identical completion."""
+        self.llm_usage["calls"] += 1
+        if shared:
+            self.llm_usage["shared_calls"] += 1
+        if usage is not None:
+            self.llm_usage["prompt_tokens"] += usage.prompt_tokens or 0
+            self.llm_usage["completion_tokens"] += usage.completion_tokens or 0
+            self.llm_usage["total_tokens"] += usage.total_tokens or 0
+
+    def get_workflow_log(self) -> List[Dict[str, Any]]:
+        return list(self.workflow_log)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started_at) * 1000
+
+
+_current_request: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+
+def get_request_context() -> Optional[RequestContext]:
+    return _current_request.get()
+
+
+@contextmanager
+def request_scope(user_id: Optional[str] = None, request_id: Optional[str] = None) -> Iterator[RequestContext]:
+    request_context = RequestContext(request_id=request_id or uuid.uuid4().hex, user_id=user_id)
+    token = _current_request.set(request_context)
+    try:
+        yield request_context
+    finally:
+        _current_request.reset(token)
@@ -1,31 +1,72 @@
 import openai
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 from app.core.config import settings
+from app.core.cache import ResponseCache
+from app.core.singleflight import SingleFlight
+from app.core.context import get_request_context
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class LLMClient:
-    def __init__(self):
+    def __init__(self, cache: Optional[ResponseCache] = None):
         self.client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         self.model = settings.LLM_MODEL
         self.temperature = settings.LLM_TEMPERATURE
 
+        if cache is None and settings.LLM_CACHE_ENABLED:
+            cache = ResponseCache(
+                max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+                disk_path=settings.LLM_CACHE_DISK_PATH
+            )
+        self.cache = cache
+        self.singleflight = SingleFlight("llm")
+
     async def generate_response(
             self,
             messages: List[Dict[str, str]],
             temperature: Optional[float] = None,
-            max_tokens: Optional[int] = None
+            max_tokens: Optional[int] = None,
+            use_cache: bool = True
     ) -> str:
+        temperature = temperature or self.temperature
+        cache_key = ResponseCache.make_key(self.model, messages, temperature, max_tokens)
+
+        if self.cache is not None and use_cache:
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                return cached
+
+        (content, usage), shared = await self.singleflight.do_shared(
+            cache_key,
+            lambda: self._create_completion(messages, temperature, max_tokens)
+        )
+        # Recorded by every caller, not inside the shared task, so each request's context sees the tokens it used
+        request_context = get_request_context()
+        if request_context is not None:
+            request_context.record_llm_usage(usage, shared=shared)
+
+        if self.cache is not None and use_cache and content:
+            await self.cache.aset(cache_key, content)
+
+        return content
+
+    async def _create_completion(
+            self,
+            messages: List[Dict[str, str]],
+            temperature: float,
+            max_tokens: Optional[int]
+    ) -> Tuple[str, Any]:
         try:
             response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
-                temperature=temperature or self.temperature,
+                temperature=temperature,
                 max_tokens=max_tokens
             )
-            return response.choices[0].message.content
+            return response.choices[0].message.content, getattr(response, "usage", None)
         except Exception as e:
             logger.error(f"Error generating LLM response: {str(e)}")
             raise
@@ -34,10 +75,77 @@ class LLMClient:
             self,
             system_prompt: str,
             user_message: str,
-            temperature: Optional[float] = None
+            temperature: Optional[float] = None,
+            use_cache: bool = True
     ) -> str:
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_message}
         ]
-        return await self.generate_response(messages, temperature)
\ No newline at end of file
+        return await self.generate_response(messages, temperature, use_cache=use_cache)
+
+    async def generate_response_stream(
+            self,
+            messages: List[Dict[str, str]],
+            temperature: Optional[float] = None,
+            max_tokens: Optional[int] = None,
+            use_cache: bool = True
+    ) -> AsyncIterator[str]:
+        temperature = temperature or self.temperature
+
+        cache_key = None
+        if self.cache is not None and use_cache:
+            cache_key = ResponseCache.make_key(self.model, messages, temperature, max_tokens)
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        chunks = []
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    chunks.append(token)
+                    yield token
+        except Exception as e:
+            logger.error(f"Error streaming LLM response: {str(e)}")
+            raise
+
+        if cache_key is not None and chunks:
+            await self.cache.aset(cache_key, "".join(chunks))
+
+    async def stream_response_with_system_prompt(
+            self,
+            system_prompt: str,
+            user_message: str,
+            temperature: Optional[float] = None,
+            use_cache: bool = True
+    ) -> AsyncIterator[str]:
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ]
+        async for token in self.generate_response_stream(messages, temperature, use_cache=use_cache):
+            yield token
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.get_stats()}
+
+    def get_singleflight_stats(self) -> Dict[str, Any]:
+        return self.singleflight.get_stats()
@@ -0,0 +1,182 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple
+import itertools
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+USER_SCOPED_AGENTS = {"support"}
+
+
+@dataclass
+class SemanticCacheEntry:
+    embedding: np.ndarray
+    response: Any
+    agent: str
+    user_id: Optional[str]
+    nbytes: int
+    response_mode: Optional[str] = None
+    expires_at: Optional[float] = None
+
+
+class SemanticCache:
+    """Reuses prior answers for messages whose embedding is close enough to one already answered.
+
+    Answers of user-scoped agents describe live account state, so they are only served to the same user and
+    expire after `user_scoped_ttl_seconds` (0 keeps them out of the cache).
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, max_entries: int = 2000,
+                 max_bytes: int = 64 * 1024 * 1024, user_scoped_ttl_seconds: float = 60):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.user_scoped_ttl_seconds = user_scoped_ttl_seconds
+
+        self._entries: "OrderedDict[int, SemanticCacheEntry]" = OrderedDict()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_ids: Tuple[int, ...] = ()
+        self._bytes = 0
+        self.index_version: Optional[int] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expirations = 0
+
+    def lookup(self, embedding: np.ndarray, user_id: Optional[str], index_version: int,
+               response_mode: Optional[str] = None) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            self._check_version(index_version)
+
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            matrix, entry_ids = self._get_matrix()
+            similarities = matrix @ embedding
+            now = time.monotonic()
+            expired = []
+
+            found = None
+            for position in np.argsort(-similarities):
+                similarity = float(similarities[position])
+                if similarity < self.similarity_threshold:
+                    break
+
+                entry_id = entry_ids[position]
+                entry = self._entries[entry_id]
+                if entry.expires_at is not None and entry.expires_at <= now:
+                    expired.append(entry_id)
+                    continue
+                if entry.agent in USER_SCOPED_AGENTS and entry.user_id != user_id:
+                    continue
+                # single_pass and two_pass answers differ in shape and workflow, so they are never swapped
+                if entry.response_mode != response_mode:
+                    continue
+
+                self._entries.move_to_end(entry_id)
+                found = (entry.response, similarity)
+                break
+
+            for entry_id in expired:
+                self._bytes -= self._entries.pop(entry_id).nbytes
+                self._matrix = None
+                self.expirations += 1
+
+            if found is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return found
+
+    def store(self, embedding: np.ndarray, response: Any, agent: str, user_id: Optional[str], index_version: int,
+              response_mode: Optional[str] = None):
+        agent = agent.lower()
+        expires_at = None
+        if agent in USER_SCOPED_AGENTS:
+            if self.user_scoped_ttl_seconds <= 0:
+                return
+            expires_at = time.monotonic() + self.user_scoped_ttl_seconds
+
+        with self._lock:
+            self._check_version(index_version)
+
+            entry = SemanticCacheEntry(
+                embedding=np.asarray(embedding, dtype=np.float32),
+                response=response,
+                agent=agent,
+                user_id=user_id,
+                nbytes=embedding.nbytes + self._estimate_response_size(response),
+                response_mode=response_mode,
+                expires_at=expires_at
+            )
+            if entry.nbytes > self.max_bytes:
+                return
+
+            self._entries[next(self._ids)] = entry
+            self._bytes += entry.nbytes
+            self._matrix = None
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self._matrix = None
+        self._matrix_ids = ()
+        self._bytes = 0
+
+    def _check_version(self, index_version: int):
+        if self.index_version != index_version:
+            if self._entries:
+                logger.info(f"Index version changed to {index_version}, dropping {len(self._entries)} cached answers")
+                self.invalidations += 1
+            self._clear()
+            self.index_version = index_version
+
+    def _get_matrix(self) -> Tuple[np.ndarray, Tuple[int, ...]]:
+        if self._matrix is None:
+            self._matrix_ids = tuple(self._entries.keys())
+            self._matrix = np.stack([self._entries[i].embedding for i in self._matrix_ids])
+        return self._matrix, self._matrix_ids
+
+    @staticmethod
+    def _estimate_response_size(response: Any) -> int:
+        if hasattr(response, "model_dump"):
+            response = response.model_dump()
+        return len(json.dumps(response, default=str).encode("utf-8"))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "expirations": self.expirations,
+                "user_scoped_ttl_seconds": self.user_scoped_ttl_seconds,
+                "similarity_threshold": self.similarity_threshold,
+                "index_version": self.index_version
+            }
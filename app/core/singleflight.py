@@ -0,0 +1,68 @@
+from typing import Dict, Any, Awaitable, Callable, Hashable, Tuple, TypeVar
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesces concurrent calls sharing a key onto one in-flight task.
+
+    The shared task outlives a cancelled caller while others still wait on it, and is cancelled once its
+    last waiter leaves.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.calls = 0
+        self.deduplicated = 0
+        self.cancelled = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        result, _ = await self.do_shared(key, fn)
+        return result
+
+    async def do_shared(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Like `do`, also returning whether this caller joined a call already in flight instead of starting it."""
+        self.calls += 1
+
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self.deduplicated += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+
+        self._waiters[key] += 1
+        try:
+            # Shield so one caller's cancellation doesn't fail everyone waiting on the shared task
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            if self._inflight.get(key) is task:
+                self._waiters[key] -= 1
+                if self._waiters[key] == 0 and not task.done():
+                    task.cancel()
+                    self.cancelled += 1
+            raise
+
+    def _forget(self, key: Hashable, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            del self._waiters[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Single-flight call '{self.name}' failed: {task.exception()}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "deduplicated": self.deduplicated,
+            "cancelled": self.cancelled,
+            "in_flight": len(self._inflight)
+        }
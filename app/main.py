@@ -1,22 +1,35 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.models.schemas import MessageRequest, MessageResponse
+from fastapi.responses import StreamingResponse
+from app.models.schemas import MessageRequest, MessageResponse, AgentResponse
 from app.core.config import settings
 from app.core.communication import AgentCommunicationHub
 from app.core.llm_client import LLMClient
+from app.core.context import request_scope, get_request_context
+from app.core.semantic_cache import SemanticCache
+from app.core.batch import BatchProcessor, iter_json_array, iter_ndjson_body
 from app.agents.router_agent import RouterAgent
 from app.agents.knowledge_agent import KnowledgeAgent
 from app.agents.support_agent import SupportAgent
-from app.agents.personality_agent import PersonalityAgent
+from app.agents.personality_agent import PersonalityAgent, PERSONALITY_GUIDELINES
 from app.tools.vector_store import VectorStore
 from app.tools.web_scraper import WebScraper
 from contextlib import asynccontextmanager
+from typing import Dict, Any, List, AsyncIterator, Awaitable, Callable, Optional, Tuple
 import logging
 import asyncio
+import json
+import time
+import numpy as np
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+RESPONSE_MODES = ("two_pass", "single_pass")
+# Streaming always rewrites the answer with a second, streamed personality call
+STREAM_RESPONSE_MODE = "two_pass"
+SPECULATIVE_CANCEL_POLICIES = ("cancel", "discard")
+
 
 class AgentSwarmOrchestrator:
 
@@ -28,7 +41,7 @@ class AgentSwarmOrchestrator:
         )
         self.communication_hub = AgentCommunicationHub()
 
-        self.router_agent = RouterAgent(self.llm_client)
+        self.router_agent = RouterAgent(self.llm_client, embedder=self.vector_store.embed_query)
         self.knowledge_agent = KnowledgeAgent(self.llm_client, self.vector_store)
         self.support_agent = SupportAgent(self.llm_client)
         self.personality_agent = PersonalityAgent(self.llm_client)
@@ -38,6 +51,41 @@ class AgentSwarmOrchestrator:
         self.communication_hub.register_agent("support", self.support_agent)
         self.communication_hub.register_agent("personality", self.personality_agent)
 
+        self.semantic_cache = None
+        if settings.SEMANTIC_CACHE_ENABLED:
+            self.semantic_cache = SemanticCache(
+                similarity_threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+                max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+                max_bytes=settings.SEMANTIC_CACHE_MAX_BYTES,
+                user_scoped_ttl_seconds=settings.SEMANTIC_CACHE_USER_SCOPED_TTL_SECONDS
+            )
+
+        self.speculative_execution = settings.SPECULATIVE_EXECUTION_ENABLED
+        if settings.SPECULATIVE_CANCEL_POLICY not in SPECULATIVE_CANCEL_POLICIES:
+            raise ValueError(
+                f"Unknown speculative cancel policy '{settings.SPECULATIVE_CANCEL_POLICY}', "
+                f"expected one of {SPECULATIVE_CANCEL_POLICIES}"
+            )
+        self.speculative_cancel_policy = settings.SPECULATIVE_CANCEL_POLICY
+        self.speculation_stats = {
+            "launched": 0,
+            "used": 0,
+            "cancelled": 0,
+            "discarded": 0,
+            "failed": 0,
+            "wasted_ms": 0.0
+        }
+
+        self.response_mode = settings.RESPONSE_MODE if settings.RESPONSE_MODE in RESPONSE_MODES else "two_pass"
+        self.mode_stats = {
+            mode: {"requests": 0, "latency_ms": 0.0, "llm_calls": 0, "shared_llm_calls": 0, "prompt_tokens": 0,
+                   "completion_tokens": 0}
+            for mode in RESPONSE_MODES
+        }
+
+        self.last_index_report = None
+        self.last_scrape_report = None
+
         self.is_initialized = False
 
     async def initialize(self):
@@ -45,14 +93,13 @@ class AgentSwarmOrchestrator:
             return
 
         try:
-            collection_info = self.vector_store.get_collection_info()
+            document_count = self.vector_store.document_count()
 
-            # Use the correct key name that matches VectorStore.get_collection_info()
-            if collection_info["document_count"] == 0:
+            if document_count == 0:
                 logger.info("Vector store is empty, scraping InfinitePay website...")
                 await self._scrape_and_index_content()
             else:
-                logger.info(f"Vector store already contains {collection_info['document_count']} documents")
+                logger.info(f"Vector store already contains {document_count} documents")
 
             self.is_initialized = True
             logger.info("Agent swarm orchestrator initialized successfully")
@@ -62,85 +109,391 @@ class AgentSwarmOrchestrator:
             raise
 
     async def _scrape_and_index_content(self):
+        scraper = WebScraper()
         try:
-            scraper = WebScraper()
-            documents = await scraper.scrape_multiple_urls(settings.INFINITEPAY_URLS)
-
-            if documents:
+            # Pages the server reports as not modified are only skipped when the index already holds them
+            skip_unchanged = (settings.INCREMENTAL_INDEXING
+                              and self.vector_store.document_count() > 0)
+            documents = await scraper.scrape_multiple_urls(settings.INFINITEPAY_URLS, skip_unchanged=skip_unchanged)
+            self.last_scrape_report = scraper.get_stats()
+
+            if (documents or scraper.unchanged_pages) and settings.INCREMENTAL_INDEXING:
+                started = time.perf_counter()
+                counts = await self.vector_store.add_documents_incremental(
+                    documents,
+                    known_urls=settings.INFINITEPAY_URLS
+                )
+                self.last_index_report = {
+                    "documents": len(documents),
+                    "unchanged_urls": scraper.unchanged_pages,
+                    **counts,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+                }
+                logger.info(f"Successfully indexed {len(documents)} documents: {counts}")
+            elif documents:
                 # Use the correct method name from VectorStore
                 await self.vector_store.add_documents_enhanced(documents)
                 logger.info(f"Successfully indexed {len(documents)} documents")
             else:
                 logger.warning("No documents were scraped")
 
+            # Validators are only stored once the pages are indexed, or the next rebuild would skip them on a 304
+            await scraper.commit_cached_pages()
+            self.last_scrape_report = scraper.get_stats()
+
         except Exception as e:
             logger.error(f"Error scraping and indexing content: {str(e)}")
 
-    async def process_message(self, message: str, user_id: str) -> MessageResponse:
-        try:
-            self.communication_hub.reset_workflow()
+    async def process_message(self, message: str, user_id: str, response_mode: Optional[str] = None,
+                              shared_retrieval: Optional[Callable[[], Awaitable[Dict[str, Any]]]] = None) -> MessageResponse:
+        with request_scope(user_id) as request_context:
+            try:
+                response_mode = self._resolve_response_mode(response_mode)
+
+                logger.info(
+                    f"[{request_context.request_id}] Processing message for user {user_id} "
+                    f"({response_mode}): {message[:50]}..."
+                )
+
+                query_embedding, cached_response = await self._lookup_semantic_cache(message, user_id, response_mode)
+                if cached_response is not None:
+                    return cached_response
+
+                started = time.perf_counter()
+                routing_response, extra_context = await self._route(message, user_id, shared_retrieval)
+                self._record_step(routing_response)
+
+                if response_mode == "single_pass":
+                    extra_context["personality_guidelines"] = PERSONALITY_GUIDELINES
+
+                agent_response = await self._run_source_agent(message, user_id, routing_response, extra_context)
+                self._record_step(agent_response)
+
+                if response_mode == "single_pass":
+                    personality_response = self.personality_agent.build_single_pass_response(
+                        agent_response.response,
+                        agent_response.agent_name
+                    )
+                else:
+                    personality_response = await self.personality_agent.process(
+                        message,
+                        self._build_personality_context(message, agent_response)
+                    )
+                self._record_step(personality_response)
+                self._record_mode_stats(response_mode, started, request_context.llm_usage)
+
+                response = MessageResponse(
+                    response=personality_response.response,
+                    source_agent_response=agent_response.response,
+                    agent_workflow=request_context.get_workflow_log()
+                )
+                self._store_semantic_cache(query_embedding, response, user_id, response_mode,
+                                           [routing_response, agent_response, personality_response])
+
+                logger.info(f"[{request_context.request_id}] Finished in {request_context.elapsed_ms():.0f}ms")
+                return response
+
+            except Exception as e:
+                logger.error(f"[{request_context.request_id}] Error processing message: {str(e)}")
+                return self._error_response(e)
+
+    async def process_message_stream(self, message: str, user_id: str) -> AsyncIterator[Dict[str, Any]]:
+        # The pipeline runs in its own task (and so its own request context); events are handed
+        # over through a queue, and a client disconnect cancels the remaining work.
+        events: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.ensure_future(self._produce_stream_events(message, user_id, events))
 
-            logger.info(f"Processing message for user {user_id}: {message[:50]}...")
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            if not producer.done():
+                producer.cancel()
+
+    async def _produce_stream_events(self, message: str, user_id: str, events: asyncio.Queue):
+        try:
+            await self._run_stream_pipeline(message, user_id, events)
+        finally:
+            events.put_nowait(None)
+
+    async def _run_stream_pipeline(self, message: str, user_id: str, events: asyncio.Queue):
+        with request_scope(user_id) as request_context:
+            try:
+                logger.info(f"[{request_context.request_id}] Streaming message for user {user_id}: {message[:50]}...")
+
+                query_embedding, cached_response = await self._lookup_semantic_cache(
+                    message, user_id, STREAM_RESPONSE_MODE
+                )
+                if cached_response is not None:
+                    await events.put({"event": "token", "data": {"token": cached_response.response}})
+                    await events.put({"event": "complete", "data": cached_response.model_dump()})
+                    return
+
+                routing_response, extra_context = await self._route(message, user_id)
+                await events.put({"event": "routing", "data": self._record_step(routing_response)})
+
+                agent_response = await self._run_source_agent(message, user_id, routing_response, extra_context)
+                await events.put({"event": "retrieval", "data": self._record_step(agent_response)})
+
+                tokens = []
+                async for token in self.personality_agent.process_stream(
+                        message,
+                        self._build_personality_context(message, agent_response)
+                ):
+                    tokens.append(token)
+                    await events.put({"event": "token", "data": {"token": token}})
+
+                personality_response = self.personality_agent.build_response(
+                    agent_response.response,
+                    agent_response.agent_name,
+                    "".join(tokens)
+                )
+                self._record_step(personality_response)
+
+                final_response = MessageResponse(
+                    response=personality_response.response,
+                    source_agent_response=agent_response.response,
+                    agent_workflow=request_context.get_workflow_log()
+                )
+                self._store_semantic_cache(query_embedding, final_response, user_id, STREAM_RESPONSE_MODE,
+                                           [routing_response, agent_response, personality_response])
+
+            except Exception as e:
+                logger.error(f"[{request_context.request_id}] Error streaming message: {str(e)}")
+                await events.put({"event": "error", "data": {"error": str(e)}})
+                final_response = self._error_response(e)
+
+            await events.put({"event": "complete", "data": final_response.model_dump()})
+
+    async def _lookup_semantic_cache(self, message: str, user_id: str,
+                                     response_mode: str) -> Tuple[Optional[np.ndarray], Optional[MessageResponse]]:
+        if self.semantic_cache is None:
+            return None, None
 
-            routing_response = await self.router_agent.process(message)
-            target_agent = routing_response.metadata.get("agent", "KNOWLEDGE").lower()
+        try:
+            query_embedding = await self.vector_store.embed_query(message)
+        except Exception as e:
+            logger.error(f"Error embedding message for semantic cache: {str(e)}")
+            return None, None
+
+        cached = self.semantic_cache.lookup(query_embedding, user_id, self.vector_store.index_version, response_mode)
+        if cached is None:
+            return query_embedding, None
+
+        cached_response, similarity = cached
+        logger.info(f"Semantic cache hit (similarity {similarity:.3f}) for user {user_id}")
+
+        cache_step = {
+            "agent_name": "semantic_cache",
+            "tool_calls": {"semantic_cache_lookup": {"hit": True, "similarity": round(similarity, 4)}}
+        }
+        return query_embedding, cached_response.model_copy(
+            update={"agent_workflow": [cache_step] + list(cached_response.agent_workflow)}
+        )
 
-            context = {
-                "user_id": user_id,
-                "routing_info": routing_response.metadata
-            }
+    def _store_semantic_cache(self, query_embedding: Optional[np.ndarray], response: MessageResponse, user_id: str,
+                              response_mode: str, agent_responses: List[AgentResponse]):
+        if self.semantic_cache is None or query_embedding is None:
+            return
 
-            if target_agent == "knowledge":
-                agent_response = await self.knowledge_agent.process(message, context)
-            elif target_agent == "support":
-                agent_response = await self.support_agent.process(message, context)
-            else:
-                agent_response = await self.knowledge_agent.process(message, context)
+        # A fallback caused by a transient failure would otherwise be replayed to every similar question
+        if not all(self._is_cacheable(agent_response) for agent_response in agent_responses):
+            logger.info("Not caching a response produced by a failed or zero-confidence agent step")
+            return
 
-            personality_context = {
-                "source_response": agent_response.response,
-                "original_query": message,
-                "source_agent": agent_response.agent_name
-            }
+        self.semantic_cache.store(
+            query_embedding,
+            response,
+            agent_responses[0].metadata.get("agent", "KNOWLEDGE"),
+            user_id,
+            self.vector_store.index_version,
+            response_mode
+        )
 
-            personality_response = await self.personality_agent.process(
-                message,
-                personality_context
-            )
+    @staticmethod
+    def _is_cacheable(agent_response: AgentResponse) -> bool:
+        return agent_response.confidence > 0 and not (agent_response.metadata or {}).get("error")
 
-            workflow = self.communication_hub.get_workflow_log()
+    async def _route(self, message: str, user_id: str,
+                     shared_retrieval: Optional[Callable[[], Awaitable[Dict[str, Any]]]] = None
+                     ) -> Tuple[AgentResponse, Dict[str, Any]]:
+        if not self.speculative_execution:
+            routing_response = await self.router_agent.process(message)
+            prefetched = {}
+            if shared_retrieval is not None and self._target_agent(routing_response) == "knowledge":
+                prefetched = await self._await_shared_retrieval(shared_retrieval())
+            return routing_response, prefetched
+
+        # Retrieval and the customer lookup don't depend on the routing decision, so start
+        # both alongside the router and keep only the branch it picks.
+        started = time.perf_counter()
+        branches = {}
+        shared = shared_retrieval() if shared_retrieval is not None else None
+        if shared is None:
+            branches["knowledge"] = asyncio.ensure_future(self.knowledge_agent.retrieve(message))
+        if user_id:
+            branches["support"] = asyncio.ensure_future(self.support_agent.prefetch_customer_info(user_id))
+        self.speculation_stats["launched"] += len(branches)
 
-            workflow.insert(0, {
-                "agent_name": routing_response.agent_name,
-                "tool_calls": {tc.tool_name: tc.tool_output for tc in routing_response.tool_calls}
-            })
+        try:
+            routing_response = await self.router_agent.process(message)
+        except BaseException:
+            for task in branches.values():
+                task.cancel()
+            raise
 
-            workflow.append({
-                "agent_name": agent_response.agent_name,
-                "tool_calls": {tc.tool_name: tc.tool_output for tc in agent_response.tool_calls}
-            })
+        target_agent = self._target_agent(routing_response)
+        if shared is not None and target_agent == "knowledge":
+            # Shared retrievals belong to the caller (e.g. a batch), so they are never cancelled here
+            for task in branches.values():
+                self._discard_speculative_branch(task, started)
+            return routing_response, await self._await_shared_retrieval(shared)
+
+        kept = branches.pop(target_agent, None)
+        for task in branches.values():
+            self._discard_speculative_branch(task, started)
+
+        prefetched = {}
+        if kept is not None:
+            try:
+                prefetch_key = "prefetched_customer_info" if target_agent == "support" else "prefetched_retrieval"
+                prefetched[prefetch_key] = await kept
+                self.speculation_stats["used"] += 1
+            except Exception as e:
+                logger.error(f"Speculative branch failed, falling back to sequential execution: {str(e)}")
+                self.speculation_stats["failed"] += 1
+
+        return routing_response, prefetched
+
+    async def _await_shared_retrieval(self, shared: Awaitable[Dict[str, Any]]) -> Dict[str, Any]:
+        try:
+            return {"prefetched_retrieval": await asyncio.shield(shared)}
+        except Exception as e:
+            logger.error(f"Shared retrieval failed, retrieving for this request only: {str(e)}")
+            return {}
+
+    def _discard_speculative_branch(self, task: asyncio.Future, started: float):
+        if self.speculative_cancel_policy == "cancel" and not task.done():
+            task.cancel()
+            self.speculation_stats["cancelled"] += 1
+            self.speculation_stats["wasted_ms"] += (time.perf_counter() - started) * 1000
+            return
 
-            workflow.append({
-                "agent_name": personality_response.agent_name,
-                "tool_calls": {tc.tool_name: tc.tool_output for tc in personality_response.tool_calls}
-            })
+        self.speculation_stats["discarded"] += 1
+        task.add_done_callback(lambda done: self._record_discarded_branch(done, started))
+
+    def _record_discarded_branch(self, task: asyncio.Future, started: float):
+        self.speculation_stats["wasted_ms"] += (time.perf_counter() - started) * 1000
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Discarded speculative branch failed: {task.exception()}")
+
+    def _target_agent(self, routing_response: AgentResponse) -> str:
+        target_agent = routing_response.metadata.get("agent", "KNOWLEDGE").lower()
+        return "support" if target_agent == "support" else "knowledge"
+
+    async def _run_source_agent(self, message: str, user_id: str, routing_response: AgentResponse,
+                                extra_context: Dict[str, Any] = None) -> AgentResponse:
+        context = {
+            "user_id": user_id,
+            "routing_info": routing_response.metadata,
+            **(extra_context or {})
+        }
+
+        if self._target_agent(routing_response) == "support":
+            return await self.support_agent.process(message, context)
+        return await self.knowledge_agent.process(message, context)
+
+    def _resolve_response_mode(self, response_mode: Optional[str]) -> str:
+        if response_mode is None:
+            return self.response_mode
+        if response_mode not in RESPONSE_MODES:
+            logger.warning(f"Unknown response mode '{response_mode}', using {self.response_mode}")
+            return self.response_mode
+        return response_mode
+
+    def _record_mode_stats(self, response_mode: str, started: float, llm_usage: Dict[str, int]):
+        totals = self.mode_stats[response_mode]
+        totals["requests"] += 1
+        totals["latency_ms"] += (time.perf_counter() - started) * 1000
+        totals["llm_calls"] += llm_usage["calls"]
+        totals["shared_llm_calls"] += llm_usage["shared_calls"]
+        totals["prompt_tokens"] += llm_usage["prompt_tokens"]
+        totals["completion_tokens"] += llm_usage["completion_tokens"]
+
+    def _get_mode_stats(self) -> Dict[str, Any]:
+        summary = {"default": self.response_mode}
+        for mode, totals in self.mode_stats.items():
+            requests = totals["requests"]
+            summary[mode] = {"requests": requests}
+            for key in ("latency_ms", "llm_calls", "shared_llm_calls", "prompt_tokens", "completion_tokens"):
+                summary[mode][f"avg_{key}"] = totals[key] / requests if requests else 0.0
+
+        if self.mode_stats["single_pass"]["requests"] and self.mode_stats["two_pass"]["requests"]:
+            summary["single_pass_delta"] = {
+                key: summary["single_pass"][key] - summary["two_pass"][key]
+                for key in summary["single_pass"] if key.startswith("avg_")
+            }
 
-            return MessageResponse(
-                response=personality_response.response,
-                source_agent_response=agent_response.response,
-                agent_workflow=workflow
-            )
+        return summary
+
+    def _build_personality_context(self, message: str, agent_response: AgentResponse) -> Dict[str, Any]:
+        return {
+            "source_response": agent_response.response,
+            "original_query": message,
+            "source_agent": agent_response.agent_name
+        }
+
+    def _record_step(self, agent_response: AgentResponse) -> Dict[str, Any]:
+        step = {
+            "agent_name": agent_response.agent_name,
+            "tool_calls": {tc.tool_name: tc.tool_output for tc in agent_response.tool_calls}
+        }
+
+        request_context = get_request_context()
+        if request_context is not None:
+            request_context.record_step(step["agent_name"], step["tool_calls"])
+
+        return step
+
+    def _error_response(self, error: Exception) -> MessageResponse:
+        return MessageResponse(
+            response="I apologize, but I encountered an error while processing your request. Please try again later.",
+            source_agent_response="Error occurred during processing",
+            agent_workflow=[{
+                "agent_name": "error_handler",
+                "tool_calls": {"error": str(error)}
+            }]
+        )
 
-        except Exception as e:
-            logger.error(f"Error processing message: {str(e)}")
-            return MessageResponse(
-                response="I apologize, but I encountered an error while processing your request. Please try again later.",
-                source_agent_response="Error occurred during processing",
-                agent_workflow=[{
-                    "agent_name": "error_handler",
-                    "tool_calls": {"error": str(e)}
-                }]
-            )
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "llm_cache": self.llm_client.get_cache_stats(),
+            "semantic_cache": self.semantic_cache.get_stats() if self.semantic_cache else {"enabled": False},
+            "response_modes": self._get_mode_stats(),
+            "router": self.router_agent.get_routing_stats(),
+            "speculation": {
+                "enabled": self.speculative_execution,
+                "cancel_policy": self.speculative_cancel_policy,
+                **self.speculation_stats
+            },
+            "embedding": self.vector_store.get_embedding_stats(),
+            "vector_queries": self.vector_store.get_query_stats(),
+            "hybrid_search": self.vector_store.get_hybrid_stats(),
+            "reranker": self.vector_store.get_reranker_stats(),
+            "indexing": {
+                "incremental": settings.INCREMENTAL_INDEXING,
+                "index_version": self.vector_store.index_version,
+                "last_rebuild": self.last_index_report,
+                "last_scrape": self.last_scrape_report
+            },
+            "singleflight": {
+                "llm": self.llm_client.get_singleflight_stats(),
+                **self.vector_store.get_singleflight_stats()
+            }
+        }
 
 orchestrator = AgentSwarmOrchestrator()
 
@@ -151,6 +504,8 @@ async def lifespan(app: FastAPI):
     await orchestrator.initialize()
     yield
     logger.info("Shutting down Agent Swarm API...")
+    await orchestrator.vector_store.aclose()
+    orchestrator.llm_client.close()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -182,12 +537,12 @@ async def health_check():
 
 
 @app.post(f"{settings.API_V1_STR}/chat", response_model=MessageResponse)
-async def chat(request: MessageRequest):
+async def chat(request: MessageRequest, mode: Optional[str] = Query(None, pattern="^(two_pass|single_pass)$")):
     try:
         if not orchestrator.is_initialized:
             await orchestrator.initialize()
 
-        response = await orchestrator.process_message(request.message, request.user_id)
+        response = await orchestrator.process_message(request.message, request.user_id, response_mode=mode)
         return response
 
     except Exception as e:
@@ -195,6 +550,84 @@ async def chat(request: MessageRequest):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@app.post(f"{settings.API_V1_STR}/chat/stream")
+async def chat_stream(request: MessageRequest):
+    try:
+        if not orchestrator.is_initialized:
+            await orchestrator.initialize()
+    except Exception as e:
+        logger.error(f"Error in chat stream endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    async def event_generator():
+        async for event in orchestrator.process_message_stream(request.message, request.user_id):
+            yield format_sse(event["event"], event["data"])
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post(f"{settings.API_V1_STR}/chat/batch")
+async def chat_batch(request: Request,
+                     concurrency: Optional[int] = Query(None, ge=1, le=settings.BATCH_MAX_CONCURRENCY),
+                     mode: Optional[str] = Query(None, pattern="^(two_pass|single_pass)$")):
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        # The body is read up front: StreamingResponse listens for disconnects on the same
+        # receive channel, so it can't be consumed while results are being sent
+        items = iter_ndjson_body(await request.body())
+    else:
+        try:
+            entries = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(entries, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        items = iter_json_array(entries)
+
+    try:
+        if not orchestrator.is_initialized:
+            await orchestrator.initialize()
+    except Exception as e:
+        logger.error(f"Error in chat batch endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    processor = BatchProcessor(
+        orchestrator,
+        concurrency=concurrency or settings.BATCH_CONCURRENCY,
+        response_mode=mode,
+        shared_retrieval_entries=settings.BATCH_SHARED_RETRIEVAL_ENTRIES
+    )
+
+    async def result_generator():
+        async for result in processor.run(items):
+            yield json.dumps(result, ensure_ascii=False, default=str) + "\n"
+        logger.info(f"Batch finished: {processor.get_stats()}")
+
+    return StreamingResponse(result_generator(), media_type="application/x-ndjson")
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@app.post(f"{settings.API_V1_STR}/router/reload")
+async def reload_router():
+    reloaded = orchestrator.router_agent.reload_embedding_router(force=True)
+    return {
+        "reloaded": reloaded,
+        "embedding_router": orchestrator.router_agent.get_routing_stats()["embedding_router"]
+    }
+
+
+@app.get(f"{settings.API_V1_STR}/stats")
+async def stats():
+    return orchestrator.get_stats()
+
+
 @app.post(f"{settings.API_V1_STR}/rebuild-index")
 async def rebuild_index(background_tasks: BackgroundTasks):
     try:
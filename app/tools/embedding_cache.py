@@ -0,0 +1,303 @@
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry overhead of the dict slot, key tuple and array header on top of the vector itself
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+class QueryEmbeddingCache:
+    """Byte-bounded LRU of float32 query embeddings keyed by (model, normalised text), optionally saved to .npz."""
+
+    def __init__(self, model_name: str, max_bytes: int = 32 * 1024 * 1024, persist_path: Optional[str] = None,
+                 save_every: int = 200):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.persist_path = persist_path or None
+        self.save_every = save_every
+
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._saver: Optional[threading.Thread] = None
+        self.bytes = 0
+        self.unsaved = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.persist_path and os.path.exists(self.persist_path):
+            self.load()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = (self.model_name, normalize_query(text))
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def set(self, text: str, embedding: np.ndarray):
+        with self._lock:
+            self._insert(normalize_query(text), embedding)
+            self.unsaved += 1
+            should_save = self.persist_path and self.unsaved >= self.save_every
+
+        if should_save:
+            self._save_in_background()
+
+    def _save_in_background(self):
+        # set() is called from the event loop, so the periodic .npz write runs on its own thread
+        with self._lock:
+            if self._saver is not None and self._saver.is_alive():
+                return
+            self._saver = threading.Thread(target=self.save, name="query-embedding-cache-save", daemon=True)
+            self._saver.start()
+
+    def _insert(self, text: str, embedding: np.ndarray):
+        key = (self.model_name, text)
+        embedding = np.array(embedding, dtype=np.float32).ravel()
+        # Callers get the cached array itself, so keep it from being modified in place
+        embedding.flags.writeable = False
+
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= self._entry_bytes(previous)
+
+        self._entries[key] = embedding
+        self.bytes += self._entry_bytes(embedding)
+
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= self._entry_bytes(evicted)
+            self.evictions += 1
+
+    def _entry_bytes(self, embedding: np.ndarray) -> int:
+        return embedding.nbytes + ENTRY_OVERHEAD_BYTES
+
+    def save(self):
+        if not self.persist_path:
+            return
+
+        # Serialises the periodic background save with the one on shutdown, which share the temp file
+        with self._save_lock:
+            self._save()
+
+    def _save(self):
+        with self._lock:
+            entries = [(text, embedding) for (_, text), embedding in self._entries.items()]
+            self.unsaved = 0
+
+        if not entries:
+            return
+
+        try:
+            directory = os.path.dirname(self.persist_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            # np.savez appends .npz to names without it, so the temp file keeps the suffix
+            temp_path = f"{self.persist_path}.tmp.npz"
+            np.savez(
+                temp_path,
+                model=np.array(self.model_name),
+                texts=np.array([text for text, _ in entries]),
+                vectors=np.stack([embedding for _, embedding in entries])
+            )
+            os.replace(temp_path, self.persist_path)
+            logger.info(f"Saved {len(entries)} query embeddings to {self.persist_path}")
+        except Exception as e:
+            logger.error(f"Error saving query embedding cache: {str(e)}")
+
+    def load(self):
+        try:
+            with np.load(self.persist_path, allow_pickle=False) as data:
+                if str(data["model"]) != self.model_name:
+                    logger.info(f"Ignoring query embedding cache built with {data['model']}")
+                    return
+                texts = data["texts"].tolist()
+                vectors = data["vectors"].astype(np.float32)
+        except Exception as e:
+            logger.error(f"Error loading query embedding cache: {str(e)}")
+            return
+
+        # Saved oldest-first, so replaying keeps the LRU order
+        with self._lock:
+            for text, embedding in zip(texts, vectors):
+                self._insert(text, embedding)
+        logger.info(f"Loaded {len(self._entries)} query embeddings from {self.persist_path}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "persistent": self.persist_path is not None
+        }
+
+
+class ChunkEmbeddingCache:
+    """SQLite store of chunk embeddings keyed by (model, sha256 of text), evicting least recently used rows past max_bytes."""
+
+    def __init__(self, path: str, model_name: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_embeddings ("
+            "model TEXT NOT NULL, content_hash TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (model, content_hash))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS chunk_embeddings_last_used ON chunk_embeddings (last_used)")
+        self._db.commit()
+        # Kept up to date on every insert and delete, so only opening the cache scans the table
+        self.total_bytes, self.entries = self._count_rows()
+
+    def _count_rows(self) -> Tuple[int, int]:
+        return self._db.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0), COUNT(*) FROM chunk_embeddings"
+        ).fetchone()
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        hashes = [self.content_hash(text) for text in texts]
+        found = {}
+
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT content_hash, vector FROM chunk_embeddings "
+                    f"WHERE model = ? AND content_hash IN ({placeholders})",
+                    [self.model_name, *batch]
+                ).fetchall()
+                found.update((content_hash, np.frombuffer(vector, dtype=np.float32)) for content_hash, vector in rows)
+
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE chunk_embeddings SET last_used = ? WHERE model = ? AND content_hash = ?",
+                    [(now, self.model_name, content_hash) for content_hash in found]
+                )
+                self._db.commit()
+
+            embeddings = [found.get(content_hash) for content_hash in hashes]
+            hits = sum(embedding is not None for embedding in embeddings)
+            self.hits += hits
+            self.misses += len(embeddings) - hits
+
+        return embeddings
+
+    def set_many(self, texts: List[str], embeddings: np.ndarray):
+        now = time.time()
+        rows = {}
+        for text, embedding in zip(texts, embeddings):
+            content_hash = self.content_hash(text)
+            rows[content_hash] = (self.model_name, content_hash, np.asarray(embedding, dtype=np.float32).tobytes(), now)
+
+        with self._lock:
+            try:
+                replaced = self._stored_sizes(list(rows))
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO chunk_embeddings (model, content_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                    list(rows.values())
+                )
+                self.total_bytes += sum(len(row[2]) for row in rows.values()) - sum(replaced.values())
+                self.entries += len(rows) - len(replaced)
+                self._evict()
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error writing chunk embeddings to cache: {str(e)}")
+                self._db.rollback()
+                self.total_bytes, self.entries = self._count_rows()
+
+    def _stored_sizes(self, hashes: List[str]) -> Dict[str, int]:
+        sizes = {}
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            sizes.update(self._db.execute(
+                f"SELECT content_hash, LENGTH(vector) FROM chunk_embeddings "
+                f"WHERE model = ? AND content_hash IN ({placeholders})",
+                [self.model_name, *batch]
+            ).fetchall())
+        return sizes
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes or not self.entries:
+            return
+
+        # Rows are roughly equal in size, so drop enough of the oldest to get back under the limit
+        excess_rows = -(-(self.total_bytes - self.max_bytes) * self.entries // self.total_bytes)
+        oldest = "SELECT rowid, vector FROM chunk_embeddings ORDER BY last_used ASC LIMIT ?"
+        evicted_bytes, evicted_rows = self._db.execute(
+            f"SELECT COALESCE(SUM(LENGTH(vector)), 0), COUNT(*) FROM ({oldest})", (excess_rows,)
+        ).fetchone()
+        self._db.execute(
+            "DELETE FROM chunk_embeddings WHERE rowid IN "
+            "(SELECT rowid FROM chunk_embeddings ORDER BY last_used ASC LIMIT ?)",
+            (excess_rows,)
+        )
+        self.total_bytes -= evicted_bytes
+        self.entries -= evicted_rows
+        self.evictions += evicted_rows
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self.entries,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,160 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from app.utils.metrics import Histogram
+import asyncio
+import contextlib
+import logging
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingService:
+    """Runs encoding on worker threads, coalescing concurrent single-text requests into micro-batches."""
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, workers: int = 1):
+        self.encode = encode
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+        self.workers = max(1, workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embedding")
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._running = set()
+
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64])
+        self.queue_wait_ms = Histogram([0.5, 1, 2, 5, 10, 25, 50, 100])
+        self.encode_ms = Histogram([5, 10, 25, 50, 100, 250, 500, 1000])
+        self.bulk_calls = 0
+
+    async def embed(self, text: str) -> np.ndarray:
+        self._ensure_batcher()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> np.ndarray:
+        # Document batches are already large, so they go straight to a worker thread
+        self.bulk_calls += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._encode, list(texts))
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.encode(texts), dtype=np.float32)
+
+    def _ensure_batcher(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._batcher is not None and not self._batcher.done():
+            return
+
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._batcher = loop.create_task(self._run_batcher())
+
+    async def _run_batcher(self):
+        while True:
+            # Waiting for a free worker first lets requests pile up into bigger batches under load
+            await self._slots.acquire()
+            batch = []
+            try:
+                await self._collect_batch(batch)
+            except BaseException:
+                self._slots.release()
+                # Requests already taken off the queue would otherwise never be answered
+                self._fail(batch)
+                raise
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _collect_batch(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        batch.append(await self._queue.get())
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        try:
+            dispatched = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.queue_wait_ms.observe((dispatched - enqueued) * 1000)
+            self.batch_sizes.observe(len(batch))
+
+            texts = [text for text, _, _ in batch]
+            try:
+                embeddings = await asyncio.get_running_loop().run_in_executor(self.executor, self._encode, texts)
+            except Exception as e:
+                logger.error(f"Error encoding batch of {len(texts)} texts: {str(e)}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            self.encode_ms.observe((time.perf_counter() - dispatched) * 1000)
+            for (_, future, _), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+        finally:
+            self._slots.release()
+
+    async def aclose(self):
+        """Stops the batcher, waiting for it to exit, fails queries still queued and shuts the workers down."""
+        batcher = self._batcher
+        if batcher is not None and not batcher.done():
+            batcher.cancel()
+            if self._loop is asyncio.get_running_loop():
+                with contextlib.suppress(asyncio.CancelledError):
+                    await batcher
+        self._fail_queued()
+        self.executor.shutdown(wait=False)
+
+    def close(self):
+        """For callers without a running loop; `aclose` also waits for the batcher to exit."""
+        if self._batcher is not None and not self._batcher.done():
+            self._batcher.cancel()
+        self._fail_queued()
+        self.executor.shutdown(wait=False)
+
+    def _fail_queued(self):
+        queued = []
+        while self._queue is not None and not self._queue.empty():
+            queued.append(self._queue.get_nowait())
+        self._fail(queued)
+
+    @staticmethod
+    def _fail(batch: List[Tuple[str, asyncio.Future, float]]):
+        for _, future, _ in batch:
+            if not future.done():
+                future.set_exception(RuntimeError("Embedding service closed"))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "bulk_calls": self.bulk_calls,
+            "batch_size": self.batch_sizes.get_stats(),
+            "queue_wait_ms": self.queue_wait_ms.get_stats(),
+            "encode_ms": self.encode_ms.get_stats()
+        }
@@ -0,0 +1,113 @@
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+BODY_COMPRESSION_LEVEL = 6
+
+
+@dataclass
+class CachedPage:
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: bytes
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """SQLite store of scraped pages: ETag/Last-Modified validators plus the zlib-compressed body, keyed by URL."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS http_cache ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB NOT NULL, "
+            "body_bytes INTEGER NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, body FROM http_cache WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        etag, last_modified, body = row
+        try:
+            return CachedPage(url, etag, last_modified, zlib.decompress(body))
+        except zlib.error as e:
+            logger.error(f"Dropping corrupt HTTP cache entry for {url}: {str(e)}")
+            self.delete([url])
+            return None
+
+    def set(self, url: str, etag: Optional[str], last_modified: Optional[str], body: bytes):
+        self.set_many([CachedPage(url, etag, last_modified, body)])
+
+    def set_many(self, pages: List[CachedPage]):
+        """Stores all pages in one transaction; bodies are compressed before the lock is taken."""
+        stored_at = time.time()
+        rows = [
+            (page.url, page.etag, page.last_modified, zlib.compress(page.body, BODY_COMPRESSION_LEVEL),
+             len(page.body), stored_at)
+            for page in pages
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO http_cache (url, etag, last_modified, body, body_bytes, stored_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                self._db.rollback()
+                logger.error(f"Error writing {len(rows)} pages to HTTP cache: {str(e)}")
+
+    def delete(self, urls: List[str]):
+        with self._lock:
+            try:
+                self._db.executemany("DELETE FROM http_cache WHERE url = ?", [(url,) for url in urls])
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error deleting pages from HTTP cache: {str(e)}")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, stored_bytes, body_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0), COALESCE(SUM(body_bytes), 0) FROM http_cache"
+            ).fetchone()
+        return {
+            "entries": entries,
+            "stored_bytes": stored_bytes,
+            "body_bytes": body_bytes
+        }
@@ -0,0 +1,286 @@
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Numbers keep their decimal part and percent sign, so "2,69%" stays one token
+TOKEN_PATTERN = re.compile(r"\d+(?:[.,]\d+)*%?|[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a ao aos as com da das de do dos e em na nas no nos o os ou para pela pelas pelo pelos por
+qual quais que se sem seu sua um uma uns umas eu voce meu minha
+an and are as at be by for from how i in is it my of on or the this to what which with you your
+""".split())
+
+# Portuguese plural endings folded onto their singular, checked before the bare "s" strip
+PLURAL_SUFFIXES = (("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"))
+
+MAX_TERM_FREQUENCY = np.iinfo(np.uint16).max
+
+
+def fold_accents(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, accent-folded PT/EN tokens with stopwords dropped and a light plural strip."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(fold_accents(text).lower()):
+        if token[0].isdigit():
+            number = token.rstrip("%").replace(",", ".")
+            tokens.append(number)
+            if token.endswith("%"):
+                tokens.append(f"{number}%")
+        elif token not in STOPWORDS:
+            tokens.append(_strip_plural(token))
+    return tokens
+
+
+def _strip_plural(token: str) -> str:
+    if len(token) <= 4 or not token.endswith("s") or token.endswith("ss"):
+        return token
+    for suffix, singular in PLURAL_SUFFIXES:
+        if token.endswith(suffix):
+            return token[:-len(suffix)] + singular
+    return token[:-1]
+
+
+class BM25Index:
+    """BM25 over chunk texts, with postings stored as one (rows int32, term frequencies uint16) array pair per term.
+
+    Replaced or removed chunks are tombstoned and dropped from the arrays once they outnumber the live ones.
+    """
+
+    def __init__(self, persist_path: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.persist_path = persist_path or None
+        self.k1 = k1
+        self.b = b
+
+        self.doc_ids: List[str] = []
+        self.collection_types = np.zeros(0, dtype="<U16")
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.row_of: Dict[str, int] = {}
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+        self._lock = threading.Lock()
+        self.dirty = False
+        self.searches = 0
+        self.compactions = 0
+
+        if self.persist_path and os.path.exists(self.persist_path):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self.row_of)
+
+    def upsert(self, ids: List[str], texts: List[str], collection_types: List[str]):
+        # Last write wins for IDs repeated within one call
+        rows = {chunk_id: (text, collection_type) for chunk_id, text, collection_type in zip(ids, texts, collection_types)}
+
+        with self._lock:
+            pending: Dict[str, Tuple[List[int], List[int]]] = {}
+            lengths = []
+            new_types = []
+            for chunk_id, (text, collection_type) in rows.items():
+                self._tombstone(chunk_id)
+
+                row = len(self.doc_ids)
+                self.doc_ids.append(chunk_id)
+                self.row_of[chunk_id] = row
+                new_types.append(collection_type)
+
+                frequencies = Counter(tokenize(text))
+                lengths.append(sum(frequencies.values()))
+                for term, frequency in frequencies.items():
+                    term_rows, term_frequencies = pending.setdefault(term, ([], []))
+                    term_rows.append(row)
+                    term_frequencies.append(min(frequency, MAX_TERM_FREQUENCY))
+
+            self.collection_types = np.concatenate([self.collection_types, np.array(new_types, dtype="<U16")])
+            self.doc_lengths = np.concatenate([self.doc_lengths, np.array(lengths, dtype=np.float32)])
+            self.alive = np.concatenate([self.alive, np.ones(len(lengths), dtype=bool)])
+
+            for term, (term_rows, term_frequencies) in pending.items():
+                new_rows = np.array(term_rows, dtype=np.int32)
+                new_frequencies = np.array(term_frequencies, dtype=np.uint16)
+                existing = self.postings.get(term)
+                if existing is not None:
+                    new_rows = np.concatenate([existing[0], new_rows])
+                    new_frequencies = np.concatenate([existing[1], new_frequencies])
+                self.postings[term] = (new_rows, new_frequencies)
+
+            self._maybe_compact()
+            self.dirty = True
+
+    def remove(self, ids: List[str]):
+        with self._lock:
+            for chunk_id in ids:
+                self._tombstone(chunk_id)
+            self._maybe_compact()
+            self.dirty = True
+
+    def clear(self):
+        with self._lock:
+            self.doc_ids = []
+            self.collection_types = np.zeros(0, dtype="<U16")
+            self.doc_lengths = np.zeros(0, dtype=np.float32)
+            self.alive = np.zeros(0, dtype=bool)
+            self.row_of = {}
+            self.postings = {}
+            self.dirty = True
+
+    def _tombstone(self, chunk_id: str):
+        row = self.row_of.pop(chunk_id, None)
+        if row is not None:
+            self.alive[row] = False
+
+    def _maybe_compact(self):
+        dead = len(self.doc_ids) - len(self.row_of)
+        if dead and dead >= len(self.row_of):
+            self._compact()
+
+    def _compact(self):
+        keep = self.alive
+        new_row = np.cumsum(keep, dtype=np.int64) - 1
+
+        postings = {}
+        for term, (rows, frequencies) in self.postings.items():
+            live = keep[rows]
+            if live.any():
+                postings[term] = (new_row[rows[live]].astype(np.int32), frequencies[live])
+
+        self.postings = postings
+        self.doc_ids = [chunk_id for chunk_id, live in zip(self.doc_ids, keep) if live]
+        self.collection_types = self.collection_types[keep]
+        self.doc_lengths = self.doc_lengths[keep]
+        self.alive = np.ones(len(self.doc_ids), dtype=bool)
+        self.row_of = {chunk_id: row for row, chunk_id in enumerate(self.doc_ids)}
+        self.compactions += 1
+
+    def search(self, query: str, k: int = 10,
+               collection_types: Optional[List[str]] = None) -> List[Tuple[str, str, float]]:
+        """Returns up to k (chunk_id, collection_type, score) tuples, best first."""
+        terms = set(tokenize(query))
+
+        with self._lock:
+            self.searches += 1
+            live_count = len(self.row_of)
+            if not terms or not live_count or k <= 0:
+                return []
+
+            average_length = float(self.doc_lengths[self.alive].mean()) or 1.0
+            scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+
+            for term in terms:
+                posting = self.postings.get(term)
+                if posting is None:
+                    continue
+                rows, frequencies = posting
+                live = self.alive[rows]
+                rows = rows[live]
+                if not len(rows):
+                    continue
+
+                frequencies = frequencies[live].astype(np.float32)
+                idf = math.log(1 + (live_count - len(rows) + 0.5) / (len(rows) + 0.5))
+                norms = self.k1 * (1 - self.b + self.b * self.doc_lengths[rows] / average_length)
+                # Each row appears once per term, so fancy-index += is safe here
+                scores[rows] += idf * frequencies * (self.k1 + 1) / (frequencies + norms)
+
+            candidates = np.flatnonzero(scores > 0)
+            if collection_types is not None:
+                candidates = candidates[np.isin(self.collection_types[candidates], collection_types)]
+            if not len(candidates):
+                return []
+
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+
+            return [(self.doc_ids[row], str(self.collection_types[row]), float(scores[row])) for row in candidates]
+
+    def save(self):
+        if not self.persist_path:
+            return
+
+        with self._lock:
+            if self._needs_compaction():
+                self._compact()
+            terms = sorted(self.postings)
+            lengths = [len(self.postings[term][0]) for term in terms]
+            arrays = {
+                "doc_ids": np.array(self.doc_ids, dtype=str),
+                "collection_types": self.collection_types,
+                "doc_lengths": self.doc_lengths,
+                "terms": np.array(terms, dtype=str),
+                "offsets": np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]),
+                "rows": np.concatenate([self.postings[term][0] for term in terms]) if terms else np.zeros(0, dtype=np.int32),
+                "frequencies": (np.concatenate([self.postings[term][1] for term in terms])
+                                if terms else np.zeros(0, dtype=np.uint16))
+            }
+            self.dirty = False
+
+        try:
+            directory = os.path.dirname(self.persist_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            # np.savez appends .npz to names without it, so the temp file keeps the suffix
+            temp_path = f"{self.persist_path}.tmp.npz"
+            np.savez(temp_path, **arrays)
+            os.replace(temp_path, self.persist_path)
+            logger.info(f"Saved BM25 index with {len(arrays['doc_ids'])} chunks to {self.persist_path}")
+        except Exception as e:
+            logger.error(f"Error saving BM25 index: {str(e)}")
+
+    def _needs_compaction(self) -> bool:
+        return len(self.doc_ids) != len(self.row_of)
+
+    def load(self):
+        try:
+            with np.load(self.persist_path, allow_pickle=False) as data:
+                doc_ids = data["doc_ids"].tolist()
+                collection_types = data["collection_types"].astype("<U16")
+                doc_lengths = data["doc_lengths"].astype(np.float32)
+                terms = data["terms"].tolist()
+                offsets = data["offsets"]
+                rows = data["rows"].astype(np.int32)
+                frequencies = data["frequencies"].astype(np.uint16)
+        except Exception as e:
+            logger.error(f"Error loading BM25 index: {str(e)}")
+            return
+
+        with self._lock:
+            self.doc_ids = doc_ids
+            self.collection_types = collection_types
+            self.doc_lengths = doc_lengths
+            self.alive = np.ones(len(doc_ids), dtype=bool)
+            self.row_of = {chunk_id: row for row, chunk_id in enumerate(doc_ids)}
+            self.postings = {
+                term: (rows[offsets[i]:offsets[i + 1]], frequencies[offsets[i]:offsets[i + 1]])
+                for i, term in enumerate(terms)
+            }
+        logger.info(f"Loaded BM25 index with {len(doc_ids)} chunks from {self.persist_path}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            postings_bytes = sum(rows.nbytes + frequencies.nbytes for rows, frequencies in self.postings.values())
+            return {
+                "chunks": len(self.row_of),
+                "tombstoned": len(self.doc_ids) - len(self.row_of),
+                "terms": len(self.postings),
+                "postings_bytes": postings_bytes,
+                "searches": self.searches,
+                "compactions": self.compactions,
+                "persistent": self.persist_path is not None
+            }
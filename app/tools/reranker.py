@@ -0,0 +1,166 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from app.tools.embedding_cache import normalize_query
+from app.utils.metrics import Histogram
+import asyncio
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """Rescores a retrieval candidate pool with a cross-encoder, caching scores per (normalised query, chunk ID).
+
+    `score` takes (query, document) pairs and returns one relevance score per pair. Only uncached pairs are
+    scored, in batches of `batch_size`, on a dedicated worker thread. Chunk IDs are content-addressed, so
+    cached scores stay valid across index rebuilds.
+    """
+
+    def __init__(self, score: Callable[[List[Tuple[str, str]]], np.ndarray], candidates: int = 20,
+                 batch_size: int = 16, cache_entries: int = 4096, min_score: Optional[float] = None):
+        self.score = score
+        self.candidates = max(1, candidates)
+        self.batch_size = max(1, batch_size)
+        self.cache_entries = cache_entries
+        self.min_score = min_score
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+
+        self._scores: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.reranks = 0
+        self.errors = 0
+        self.batches = 0
+        self.pairs_scored = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.below_min_score = 0
+        self.score_ms = Histogram([5, 10, 25, 50, 100, 250, 500, 1000, 2500])
+
+    async def rerank(self, query: str, results: List[Dict[str, Any]], k: int,
+                     reserved: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+        """Returns the best k results by cross-encoder score, each with a `rerank_score`.
+
+        `reserved` maps a collection type to how many of the k slots go to its best-scored results, when
+        there are that many candidates of the type. Results under `min_score` are dropped, but the best one
+        is always kept. On scoring errors the incoming order is kept.
+        """
+        candidates = results[:self.candidates]
+        if not candidates or k <= 0:
+            return []
+
+        self.reranks += 1
+        normalized = normalize_query(query)
+        keys = [(normalized, self._chunk_key(result)) for result in candidates]
+        scores = self._cached_scores(keys)
+
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            try:
+                pairs = [(query, candidates[i]["document"]) for i in missing]
+                computed = await asyncio.get_running_loop().run_in_executor(self.executor, self._score_pairs, pairs)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error reranking results: {str(e)}")
+                return candidates[:k]
+
+            self._store_scores([keys[i] for i in missing], computed)
+            for i, score in zip(missing, computed):
+                scores[i] = score
+
+        order = sorted(range(len(candidates)), key=lambda i: -scores[i])
+        reranked = self._select([{**candidates[i], "rerank_score": scores[i]} for i in order], k, reserved or {})
+
+        if self.min_score is not None:
+            kept = reranked[:1] + [result for result in reranked[1:] if result["rerank_score"] >= self.min_score]
+            self.below_min_score += len(reranked) - len(kept)
+            reranked = kept
+
+        return reranked
+
+    @staticmethod
+    def _select(ranked: List[Dict[str, Any]], k: int, reserved: Dict[str, int]) -> List[Dict[str, Any]]:
+        pending = {
+            collection_type: min(count, sum(result.get("collection_type") == collection_type for result in ranked))
+            for collection_type, count in reserved.items()
+        }
+        selected = []
+        for result in ranked:
+            if len(selected) == k:
+                break
+            collection_type = result.get("collection_type")
+            if pending.get(collection_type, 0) > 0:
+                pending[collection_type] -= 1
+            elif len(selected) + sum(pending.values()) >= k:
+                # The remaining slots are held for reserved types
+                continue
+            selected.append(result)
+        return selected
+
+    @staticmethod
+    def _chunk_key(result: Dict[str, Any]) -> str:
+        return result.get("id") or result["document"]
+
+    def _cached_scores(self, keys: List[Tuple[str, str]]) -> List[Optional[float]]:
+        scores = []
+        with self._lock:
+            for key in keys:
+                score = self._scores.get(key)
+                if score is None:
+                    self.cache_misses += 1
+                else:
+                    self._scores.move_to_end(key)
+                    self.cache_hits += 1
+                scores.append(score)
+        return scores
+
+    def _store_scores(self, keys: List[Tuple[str, str]], scores: List[float]):
+        if self.cache_entries <= 0:
+            return
+
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._scores[key] = score
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.cache_entries:
+                self._scores.popitem(last=False)
+
+    def _score_pairs(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        scores = []
+        for start in range(0, len(pairs), self.batch_size):
+            started = time.perf_counter()
+            batch = pairs[start:start + self.batch_size]
+            scores.extend(float(score) for score in np.asarray(self.score(batch), dtype=np.float32).ravel())
+            self.score_ms.observe((time.perf_counter() - started) * 1000)
+            self.batches += 1
+            self.pairs_scored += len(batch)
+        return scores
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "enabled": True,
+            "candidates": self.candidates,
+            "min_score": self.min_score,
+            "reranks": self.reranks,
+            "errors": self.errors,
+            "batches": self.batches,
+            "pairs_scored": self.pairs_scored,
+            "below_min_score": self.below_min_score,
+            "batch_ms": self.score_ms.get_stats(),
+            "cache": {
+                "entries": len(self._scores),
+                "max_entries": self.cache_entries,
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "hit_rate": self.cache_hits / lookups if lookups else 0.0
+            }
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False)
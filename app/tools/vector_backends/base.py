@@ -0,0 +1,144 @@
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Tuple
+import json
+import os
+
+import numpy as np
+
+SNAPSHOT_PAGE_SIZE = 1000
+
+
+class VectorIndex(ABC):
+    """One named collection of (id, document, metadata, embedding) rows, with the Chroma collection call shapes.
+
+    `query` returns cosine distances (1 - similarity). `where` supports equality, `$eq`, `$ne`, `$in`,
+    `$and` and `$or`.
+    """
+
+    name: str
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]],
+            embeddings: List[List[float]]):
+        """Inserts new rows; IDs that already exist are left untouched."""
+
+    @abstractmethod
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]],
+               embeddings: List[List[float]]):
+        ...
+
+    @abstractmethod
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        ...
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        ...
+
+    @abstractmethod
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            include: Optional[List[str]] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None, include: Optional[List[str]] = None) -> Dict[str, Any]:
+        ...
+
+    def snapshot(self, path: str) -> int:
+        """Writes every row to `path` as vectors.npy plus metadata.json, the format `load_snapshot` reads."""
+        ids, documents, metadatas, embeddings = [], [], [], []
+        offset = 0
+        while True:
+            page = self.get(include=["documents", "metadatas", "embeddings"], limit=SNAPSHOT_PAGE_SIZE, offset=offset)
+            if not page["ids"]:
+                break
+            ids.extend(page["ids"])
+            documents.extend(page["documents"])
+            metadatas.extend(page["metadatas"])
+            embeddings.extend(page["embeddings"])
+            offset += len(page["ids"])
+
+        write_snapshot(path, ids, documents, metadatas, np.asarray(embeddings, dtype=np.float32))
+        return len(ids)
+
+
+class VectorBackend(ABC):
+    """Creates and drops named VectorIndex collections, like chromadb.PersistentClient."""
+
+    @abstractmethod
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> VectorIndex:
+        ...
+
+    @abstractmethod
+    def delete_collection(self, name: str):
+        ...
+
+
+def write_snapshot(path: str, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]],
+                   vectors: np.ndarray):
+    write_vectors(path, vectors)
+    write_metadata(path, ids, documents, metadatas)
+
+
+def write_vectors(path: str, vectors: np.ndarray):
+    os.makedirs(path, exist_ok=True)
+    temp_vectors = os.path.join(path, "vectors.tmp.npy")
+    np.save(temp_vectors, np.ascontiguousarray(vectors, dtype=np.float32))
+    os.replace(temp_vectors, os.path.join(path, "vectors.npy"))
+
+
+def append_vectors(path: str, vectors: np.ndarray, rows: int) -> bool:
+    """Appends `vectors` to the `rows`-row vectors.npy in `path` in place, rewriting only its header.
+
+    The rows are written before the header, so an interrupted append leaves trailing bytes the old header
+    ignores. Returns False, having written nothing, when the file doesn't hold exactly `rows` float32 rows of
+    the same width or the new header doesn't fit in the old one's padding.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    with open(os.path.join(path, "vectors.npy"), "r+b") as vector_file:
+        version = np.lib.format.read_magic(vector_file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(vector_file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(vector_file)
+        data_offset = vector_file.tell()
+
+        if fortran_order or dtype != np.float32 or shape != (rows, vectors.shape[1]) \
+                or os.fstat(vector_file.fileno()).st_size != data_offset + rows * vectors.shape[1] * 4:
+            return False
+
+        # Magic string, version, then a 2-byte (version 1) or 4-byte header length
+        header_start = 10 if version == (1, 0) else 12
+        header = repr({"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False,
+                       "shape": (rows + len(vectors), vectors.shape[1])})
+        if len(header) + 1 > data_offset - header_start:
+            return False
+
+        vector_file.seek(0, os.SEEK_END)
+        vector_file.write(vectors.tobytes())
+        vector_file.flush()
+        vector_file.seek(header_start)
+        vector_file.write((header.ljust(data_offset - header_start - 1) + "\n").encode("latin1"))
+    return True
+
+
+def write_metadata(path: str, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+    os.makedirs(path, exist_ok=True)
+    temp_metadata = os.path.join(path, "metadata.json.tmp")
+    with open(temp_metadata, "w", encoding="utf-8") as sidecar:
+        json.dump({"ids": ids, "documents": documents, "metadatas": metadatas}, sidecar, ensure_ascii=False)
+    os.replace(temp_metadata, os.path.join(path, "metadata.json"))
+
+
+def load_snapshot(path: str, mmap: bool = True) -> Tuple[List[str], List[str], List[Dict[str, Any]], np.ndarray]:
+    with open(os.path.join(path, "metadata.json"), encoding="utf-8") as sidecar:
+        data = json.load(sidecar)
+
+    vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r" if mmap else None)
+    return data["ids"], data["documents"], data["metadatas"], vectors
@@ -0,0 +1,66 @@
+from typing import List, Dict, Any, Optional
+from app.tools.vector_backends.base import VectorIndex, VectorBackend
+import chromadb
+from chromadb.config import Settings as ChromaSettings
+
+
+class ChromaIndex(VectorIndex):
+    """Thin pass-through to a chromadb Collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]],
+            embeddings: List[List[float]]):
+        self.collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]],
+               embeddings: List[List[float]]):
+        self.collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    def delete(self, ids: List[str]):
+        self.collection.delete(ids=ids)
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            include: Optional[List[str]] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None) -> Dict[str, Any]:
+        return self.collection.get(
+            ids=ids,
+            where=where,
+            include=["documents", "metadatas"] if include is None else include,
+            limit=limit,
+            offset=offset
+        )
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None, include: Optional[List[str]] = None) -> Dict[str, Any]:
+        return self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where,
+            include=["documents", "metadatas", "distances"] if include is None else include
+        )
+
+
+class ChromaBackend(VectorBackend):
+    def __init__(self, path: str):
+        self.client = chromadb.PersistentClient(
+            path=path,
+            settings=ChromaSettings(anonymized_telemetry=False)
+        )
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> ChromaIndex:
+        return ChromaIndex(self.client.get_or_create_collection(
+            name=name,
+            metadata=metadata or {"hnsw:space": "cosine"}
+        ))
+
+    def delete_collection(self, name: str):
+        self.client.delete_collection(name)
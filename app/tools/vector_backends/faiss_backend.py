@@ -0,0 +1,95 @@
+from typing import Dict, Any, List, Optional, Tuple
+from app.tools.vector_backends.numpy_backend import NumpyCollection, NumpyClient
+import os
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+
+class FaissCollection(NumpyCollection):
+    """NumpyCollection storage, searched through a FAISS inner-product index maintained at write time.
+
+    Each write builds the next index beside the live one, reusing it up to the first changed row and adding
+    only the rows after it, then swaps it in. Queries never build or lock the index.
+    """
+
+    def __init__(self, name: str, directory: str):
+        self._indexed: Tuple[Optional[np.ndarray], Optional[Any]] = (None, None)
+        super().__init__(name, directory)
+
+    def _load(self):
+        super()._load()
+        if self.ids:
+            self._indexed = (self.vectors, self._extend_index(None, self.vectors, 0))
+
+    def _replace(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]], vectors: np.ndarray,
+                 unchanged_rows: int = 0):
+        _, previous_index = self._indexed
+        super()._replace(ids, documents, metadatas, vectors, unchanged_rows)
+        self._indexed = (self.vectors, self._extend_index(previous_index, self.vectors, unchanged_rows))
+
+    def _append(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]], new_vectors: np.ndarray):
+        _, previous_index = self._indexed
+        unchanged_rows = len(self.ids)
+        super()._append(ids, documents, metadatas, new_vectors)
+        self._indexed = (self.vectors, self._extend_index(previous_index, self.vectors, unchanged_rows))
+
+    @staticmethod
+    def _extend_index(previous_index, vectors: np.ndarray, unchanged_rows: int):
+        if previous_index is not None and 0 < unchanged_rows <= previous_index.ntotal:
+            # Queries may still be searching the live index, so the extension goes into a copy
+            index = faiss.clone_index(previous_index)
+            if unchanged_rows < index.ntotal:
+                index.remove_ids(faiss.IDSelectorRange(unchanged_rows, index.ntotal))
+        else:
+            index = faiss.IndexFlatIP(vectors.shape[1])
+            unchanged_rows = 0
+
+        if unchanged_rows < len(vectors):
+            index.add(np.ascontiguousarray(vectors[unchanged_rows:], dtype=np.float32))
+        return index
+
+    def _search(self, vectors: np.ndarray, candidates: np.ndarray, queries: np.ndarray,
+                k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        if not len(candidates) or k <= 0:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in queries]
+
+        indexed_vectors, index = self._indexed
+        if index is None or indexed_vectors is not vectors:
+            # A write swapped the index after this query took its snapshot; search that snapshot exactly
+            return super()._search(vectors, candidates, queries, k)
+
+        k = min(k, len(candidates))
+        params = None
+        if len(candidates) < len(vectors):
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(candidates.astype(np.int64)))
+
+        similarities, rows = index.search(np.ascontiguousarray(queries, dtype=np.float32), k, params=params)
+
+        results = []
+        for query_rows, query_similarities in zip(rows, similarities):
+            found = query_rows >= 0
+            results.append((query_rows[found], query_similarities[found]))
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        _, index = self._indexed
+        stats = super().get_stats()
+        stats["faiss_rows"] = index.ntotal if index is not None else 0
+        return stats
+
+
+class FaissClient(NumpyClient):
+    def __init__(self, path: str):
+        if faiss is None:
+            raise ImportError("The faiss vector backend needs the faiss-cpu package: pip install faiss-cpu")
+        super().__init__(path)
+
+    def get_or_create_collection(self, name: str, metadata=None) -> FaissCollection:
+        if name not in self._collections:
+            self._collections[name] = FaissCollection(name, os.path.join(self.path, name))
+        return self._collections[name]
@@ -0,0 +1,851 @@
+from dataclasses import dataclass, replace
+from typing import List, Dict, Any, Optional, Tuple
+from app.tools.vector_backends.base import VectorIndex, VectorBackend, load_snapshot, write_snapshot
+from app.tools.vector_backends.numpy_backend import MASKED_FIELDS, where_mask, _normalize, _top_k
+import json
+import logging
+import math
+import mmap
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows processed per chunk when assigning or encoding, bounding the (rows x centroids) distance matrix
+ENCODE_BLOCK_ROWS = 16384
+PQ_CENTROIDS = 256
+TRAINING_POINTS_PER_CENTROID = 64
+# Rows read per block by exact search and by imports, compactions and snapshots
+EXACT_BLOCK_ROWS = 16384
+IMPORT_BLOCK_ROWS = 65536
+# Stays under SQLite's default limit of 999 bound parameters per statement
+SQL_BATCH_SIZE = 500
+ROWS_DB_FILE = "rows.sqlite"
+VECTORS_FILE = "vectors.f32"
+
+
+def kmeans(data: np.ndarray, k: int, iterations: int = 15, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means with squared L2; empty clusters are reseeded from random points."""
+    rng = np.random.default_rng(seed)
+    data = np.ascontiguousarray(data, dtype=np.float32)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = nearest_centroids(data, centroids)
+        counts = np.bincount(assignments, minlength=k)
+        empty = counts == 0
+
+        # Summing each cluster's contiguous slice after a sort is much faster than np.add.at
+        order = np.argsort(assignments, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[~empty]
+        centroids[~empty] = np.add.reduceat(data[order], starts, axis=0) / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+
+    return centroids
+
+
+def nearest_centroids(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    assignments = np.empty(len(data), dtype=np.int32)
+    for start in range(0, len(data), ENCODE_BLOCK_ROWS):
+        block = np.asarray(data[start:start + ENCODE_BLOCK_ROWS], dtype=np.float32)
+        # ||x - c||^2 without the ||x||^2 term, which doesn't change the argmin
+        distances = centroid_norms - 2 * block @ centroids.T
+        assignments[start:start + len(block)] = distances.argmin(axis=1)
+    return assignments
+
+
+class IvfPqIndex:
+    """Inverted-file index over coarse k-means lists, with residuals product-quantized to one uint8 per subspace.
+
+    Scores are approximate inner products, q.c + sum_j q_j.codebook_j[code_j]; callers rescore the shortlist exactly.
+    """
+
+    def __init__(self, nlist: int = 0, subquantizers: int = 48, seed: int = 0):
+        self.nlist = nlist
+        self.subquantizers = subquantizers
+        self.seed = seed
+
+        self.centroids: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.codes = np.zeros((0, 0), dtype=np.uint8)
+        self.list_rows = np.zeros(0, dtype=np.int32)
+        self.list_offsets = np.zeros(1, dtype=np.int64)
+        self.trained_rows = 0
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.assignments, self.codes, self.list_rows, self.list_offsets]
+        if self.trained:
+            arrays += [self.centroids, self.codebooks]
+        return sum(array.nbytes for array in arrays)
+
+    def train(self, vectors: np.ndarray, sample_size: int = 0):
+        rows, dimensions = vectors.shape
+        nlist = self.nlist or max(1, int(math.sqrt(rows)))
+        subquantizers = _largest_divisor_at_most(dimensions, self.subquantizers)
+        sample_size = sample_size or max(nlist, PQ_CENTROIDS) * TRAINING_POINTS_PER_CENTROID
+
+        rng = np.random.default_rng(self.seed)
+        sample_rows = np.sort(rng.choice(rows, min(rows, sample_size), replace=False))
+        sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+
+        centroids = kmeans(sample, nlist, seed=self.seed)
+        residuals = sample - centroids[nearest_centroids(sample, centroids)]
+
+        width = dimensions // subquantizers
+        codebooks = np.zeros((subquantizers, PQ_CENTROIDS, width), dtype=np.float32)
+        for j in range(subquantizers):
+            trained = kmeans(residuals[:, j * width:(j + 1) * width], PQ_CENTROIDS, seed=self.seed + j + 1)
+            codebooks[j, :len(trained)] = trained
+
+        self.centroids, self.codebooks = centroids, codebooks
+        self.trained_rows = rows
+        logger.info(f"Trained IVF-PQ on {len(sample)} of {rows} vectors: {len(centroids)} lists, "
+                    f"{subquantizers} x {PQ_CENTROIDS} codebooks")
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        subquantizers, _, width = self.codebooks.shape
+        assignments = nearest_centroids(vectors, self.centroids)
+        codes = np.empty((len(vectors), subquantizers), dtype=np.uint8)
+
+        for start in range(0, len(vectors), ENCODE_BLOCK_ROWS):
+            end = start + ENCODE_BLOCK_ROWS
+            residuals = np.asarray(vectors[start:end], dtype=np.float32) - self.centroids[assignments[start:end]]
+            for j in range(subquantizers):
+                codes[start:end, j] = nearest_centroids(residuals[:, j * width:(j + 1) * width], self.codebooks[j])
+
+        return assignments, codes
+
+    def set_codes(self, assignments: np.ndarray, codes: np.ndarray):
+        # Rows grouped by list, so probing a list reads one contiguous slice of list_rows
+        self.assignments, self.codes = assignments, codes
+        self.list_rows = np.argsort(assignments, kind="stable").astype(np.int32)
+        counts = np.bincount(assignments, minlength=len(self.centroids))
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def search(self, query: np.ndarray, nprobe: int, shortlist: int,
+               allowed: Optional[np.ndarray] = None) -> np.ndarray:
+        """Returns up to `shortlist` row numbers with the best approximate scores in the `nprobe` nearest lists."""
+        coarse = self.centroids @ query
+        nprobe = min(nprobe, len(coarse))
+        probed = np.argpartition(-coarse, nprobe - 1)[:nprobe]
+
+        rows = np.concatenate([self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in probed])
+        if allowed is not None:
+            rows = rows[allowed[rows]]
+        if not len(rows):
+            return rows
+
+        subquantizers, _, width = self.codebooks.shape
+        # One lookup table per query: the inner product of each query subvector with every codeword
+        lookup = np.einsum("jcw,jw->jc", self.codebooks, query.reshape(subquantizers, width))
+        scores = coarse[self.assignments[rows]] + lookup[np.arange(subquantizers), self.codes[rows]].sum(axis=1)
+
+        if len(rows) > shortlist:
+            rows = rows[np.argpartition(-scores, shortlist - 1)[:shortlist]]
+        return rows
+
+    def save(self, path: str):
+        temp_path = f"{path}.tmp.npz"
+        np.savez(temp_path, centroids=self.centroids, codebooks=self.codebooks, assignments=self.assignments,
+                 codes=self.codes, trained_rows=np.array(self.trained_rows))
+        os.replace(temp_path, path)
+
+    def load(self, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            self.centroids = data["centroids"]
+            self.codebooks = data["codebooks"]
+            self.trained_rows = int(data["trained_rows"])
+            self.set_codes(data["assignments"], data["codes"])
+
+
+@dataclass(frozen=True)
+class _RowState:
+    """One published view of a collection. Writers build the next one instead of mutating this one."""
+
+    rows: int
+    alive_rows: int
+    vectors: np.ndarray
+    alive: np.ndarray
+    fields: Dict[str, np.ndarray]
+    index: Optional[IvfPqIndex]
+
+
+class IvfPqCollection(VectorIndex):
+    """Append-only collection searched through an IVF-PQ index, with only compact per-row arrays resident.
+
+    - Vectors are appended to a raw float32 file that stays memory-mapped for exact rescoring.
+    - IDs, documents and metadata live in SQLite and are read only for the rows a call returns.
+    - A liveness bit and one value code per MASKED_FIELDS field are kept in memory for filtering.
+    - Deletes and vector changes leave a dead row behind; `compact` (run by the build CLI) reclaims them.
+
+    Writes encode new rows with the existing codebooks and append their codes. They never train.
+    Below `min_train_rows` the collection is searched exactly. With `background_training`, a worker thread
+    trains the first index once the collection reaches that size, and retrains once it grows `retrain_growth`
+    times past its training size. The lock is only held to encode the rows written meanwhile and swap the
+    index in. Without it, the index is built by `python -m app.cli.build_ivfpq_index`.
+    """
+
+    def __init__(self, name: str, directory: str, nlist: int = 0, subquantizers: int = 48, nprobe: int = 16,
+                 rescore_factor: int = 50, min_train_rows: int = 20000, retrain_growth: float = 4.0,
+                 background_training: bool = True):
+        self.name = name
+        self.directory = directory
+        self.nlist = nlist
+        self.subquantizers = subquantizers
+        self.nprobe = nprobe
+        self.rescore_factor = max(1, rescore_factor)
+        self.min_train_rows = min_train_rows
+        self.retrain_growth = retrain_growth
+        self.background_training = background_training
+
+        self._lock = threading.RLock()
+        self._db_lock = threading.Lock()
+        self._training: Optional[threading.Thread] = None
+        self._tail_start = 0
+        self.dim = 0
+        self._field_values: Dict[str, Dict[str, int]] = {field: {} for field in MASKED_FIELDS}
+        self._state = _empty_state()
+
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        field_columns = "".join(f", {field} TEXT" for field in MASKED_FIELDS)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rows (row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, "
+            f"document TEXT NOT NULL, metadata TEXT NOT NULL{field_columns})"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._db.commit()
+
+        if os.path.exists(os.path.join(directory, "metadata.json")):
+            self._import_snapshot()
+        self._load()
+
+    @property
+    def db_path(self) -> str:
+        return os.path.join(self.directory, ROWS_DB_FILE)
+
+    @property
+    def vectors_path(self) -> str:
+        return os.path.join(self.directory, VECTORS_FILE)
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.directory, "ivfpq.npz")
+
+    def _tail_path(self, start: int) -> str:
+        return os.path.join(self.directory, f"ivfpq-tail-{start}.codes")
+
+    def _tail_dtype(self, subquantizers: int) -> np.dtype:
+        return np.dtype([("list", "<i4"), ("codes", "u1", (subquantizers,))])
+
+    def _map_vectors(self, rows: int) -> np.memmap:
+        vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        # Rescoring reads scattered rows, so readahead would only pull unused pages into the resident set
+        if hasattr(mmap, "MADV_RANDOM"):
+            vectors._mmap.madvise(mmap.MADV_RANDOM)
+        return vectors
+
+    def _load(self):
+        rows = self._setting("rows")
+        self.dim = self._setting("dim")
+        if not rows:
+            self._state = _empty_state()
+            return
+
+        # Rows appended after the last commit (an interrupted write) are not part of the collection
+        expected_bytes = rows * self.dim * 4
+        if os.path.getsize(self.vectors_path) > expected_bytes:
+            os.truncate(self.vectors_path, expected_bytes)
+        vectors = self._map_vectors(rows)
+
+        alive = np.zeros(rows, dtype=bool)
+        fields = {field: np.full(rows, -1, dtype=np.int32) for field in MASKED_FIELDS}
+        with self._db_lock:
+            cursor = self._db.execute(f"SELECT row, {', '.join(MASKED_FIELDS)} FROM rows")
+            for row, *values in cursor:
+                alive[row] = True
+                for field, value in zip(MASKED_FIELDS, values):
+                    fields[field][row] = self._value_code(field, value)
+
+        state = _RowState(rows, int(alive.sum()), vectors, alive, fields, None)
+        # Loading never trains, so startup stays fast; a missing or stale index means exact search
+        # until the background trainer or `python -m app.cli.build_ivfpq_index` rebuilds it
+        self._state = replace(state, index=self._load_index(state))
+
+    def _load_index(self, state: _RowState) -> Optional[IvfPqIndex]:
+        if not os.path.exists(self.index_path):
+            return None
+
+        index = IvfPqIndex(self.nlist, self.subquantizers)
+        try:
+            index.load(self.index_path)
+        except Exception as e:
+            logger.error(f"Error loading IVF-PQ index for {self.name}: {str(e)}")
+            return None
+
+        base_rows = len(index.assignments)
+        if base_rows > state.rows:
+            logger.warning(f"IVF-PQ index for {self.name} is stale; searching exactly until it is rebuilt")
+            return None
+
+        self._tail_start = base_rows
+        tail_path = self._tail_path(base_rows)
+        self._remove_tails(keep=tail_path)
+        assignments, codes = index.assignments, index.codes
+        if os.path.exists(tail_path):
+            dtype = self._tail_dtype(codes.shape[1])
+            tail = np.fromfile(tail_path, dtype=dtype)[:state.rows - base_rows]
+            # Codes appended for rows whose write never committed are dropped
+            os.truncate(tail_path, len(tail) * dtype.itemsize)
+            assignments = np.concatenate([assignments, tail["list"]])
+            codes = np.concatenate([codes, tail["codes"]])
+
+        if len(assignments) < state.rows:
+            # Rows committed without their codes (a crash before the tail write) are encoded again
+            missing_assignments, missing_codes = index.encode(state.vectors[len(assignments):])
+            self._write_tail(missing_assignments, missing_codes)
+            assignments = np.concatenate([assignments, missing_assignments])
+            codes = np.concatenate([codes, missing_codes])
+
+        index.set_codes(assignments, codes)
+        return index
+
+    def _import_snapshot(self):
+        """Replaces the collection with a vectors.npy + metadata.json snapshot copied into its directory."""
+        ids, documents, metadatas, vectors = load_snapshot(self.directory)
+        logger.info(f"Importing {len(ids)} rows into {self.name}")
+
+        with self._db_lock:
+            self._db.execute("DELETE FROM rows")
+            self._db.commit()
+        with open(self.vectors_path, "wb"):
+            pass
+        self._remove_index()
+
+        self.dim = vectors.shape[1] if len(ids) else 0
+        for start in range(0, len(ids), IMPORT_BLOCK_ROWS):
+            end = start + IMPORT_BLOCK_ROWS
+            self._append_vectors(_normalize(np.asarray(vectors[start:end], dtype=np.float32)))
+            with self._db_lock:
+                self._insert_rows(range(start, start + len(ids[start:end])), ids[start:end],
+                                  documents[start:end], metadatas[start:end])
+                self._set_setting("rows", start + len(ids[start:end]))
+                self._set_setting("dim", self.dim)
+                self._db.commit()
+
+        del vectors
+        for filename in ("vectors.npy", "metadata.json"):
+            os.remove(os.path.join(self.directory, filename))
+
+    def count(self) -> int:
+        return self._state.alive_rows
+
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]], embeddings: List[List[float]]):
+        with self._lock:
+            stored = self._stored_rows(ids)
+            new_rows = [i for i, doc_id in enumerate(ids) if doc_id not in stored]
+            if len(new_rows) < len(ids):
+                logger.warning(f"Skipping {len(ids) - len(new_rows)} existing IDs added to {self.name}")
+            if new_rows:
+                self.upsert(
+                    ids=[ids[i] for i in new_rows],
+                    documents=[documents[i] for i in new_rows],
+                    metadatas=[metadatas[i] for i in new_rows],
+                    embeddings=[embeddings[i] for i in new_rows]
+                )
+
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]],
+               embeddings: List[List[float]]):
+        new_vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+
+        with self._lock:
+            state = self._state
+            latest = {doc_id: i for i, doc_id in enumerate(ids)}
+            stored = self._stored_rows(list(latest))
+
+            # Only the rows being written are compared, by reading them back from the mapped file
+            existing = [(doc_id, stored[doc_id]) for doc_id in latest if doc_id in stored]
+            unchanged = set()
+            if existing:
+                old_rows = np.array([row for _, row in existing])
+                same = np.all(np.asarray(state.vectors[old_rows]) == new_vectors[[latest[d] for d, _ in existing]], axis=1)
+                unchanged = {doc_id for (doc_id, _), equal in zip(existing, same) if equal}
+
+            in_place = [(stored[doc_id], latest[doc_id]) for doc_id in unchanged]
+            appended = [i for doc_id, i in latest.items() if doc_id not in unchanged]
+            dead = [stored[ids[i]] for i in appended if ids[i] in stored]
+            new_rows = range(state.rows, state.rows + len(appended))
+
+            if not self.dim:
+                self.dim = new_vectors.shape[1]
+            if appended:
+                self._append_vectors(new_vectors[appended])
+
+            with self._db_lock:
+                self._delete_rows(dead)
+                self._insert_rows(new_rows, [ids[i] for i in appended], [documents[i] for i in appended],
+                                  [metadatas[i] for i in appended])
+                self._update_rows([row for row, _ in in_place], [metadatas[i] for _, i in in_place],
+                                  [documents[i] for _, i in in_place])
+                self._set_setting("rows", state.rows + len(appended))
+                self._set_setting("dim", self.dim)
+                self._db.commit()
+
+            alive = np.concatenate([state.alive, np.ones(len(appended), dtype=bool)])
+            alive[dead] = False
+            fields = {}
+            for field, codes in state.fields.items():
+                appended_codes = [self._value_code(field, str(metadatas[i].get(field))) for i in appended]
+                codes = np.concatenate([codes, np.array(appended_codes, dtype=np.int32)])
+                for row, i in in_place:
+                    codes[row] = self._value_code(field, str(metadatas[i].get(field)))
+                fields[field] = codes
+
+            rows = state.rows + len(appended)
+            vectors = self._map_vectors(rows) if rows else state.vectors
+            index = self._extend_index(state.index, new_vectors[appended]) if appended else state.index
+            self._state = _RowState(rows, state.alive_rows + len(appended) - len(dead), vectors, alive, fields, index)
+            self._maybe_start_training()
+
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        with self._lock:
+            state = self._state
+            stored = self._stored_rows(ids)
+            updates = [(stored[doc_id], metadata) for doc_id, metadata in zip(ids, metadatas) if doc_id in stored]
+            if not updates:
+                return
+
+            with self._db_lock:
+                self._update_rows([row for row, _ in updates], [metadata for _, metadata in updates])
+                self._db.commit()
+
+            fields = {}
+            for field, codes in state.fields.items():
+                codes = codes.copy()
+                for row, metadata in updates:
+                    codes[row] = self._value_code(field, str(metadata.get(field)))
+                fields[field] = codes
+            self._state = replace(state, fields=fields)
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            state = self._state
+            dead = list(self._stored_rows(ids).values())
+            if not dead:
+                return
+
+            with self._db_lock:
+                self._delete_rows(dead)
+                self._db.commit()
+
+            alive = state.alive.copy()
+            alive[dead] = False
+            self._state = replace(state, alive=alive, alive_rows=state.alive_rows - len(dead))
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            include: Optional[List[str]] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None) -> Dict[str, Any]:
+        include = ["documents", "metadatas"] if include is None else include
+        state = self._state
+
+        allowed = state.alive & self._where_mask(where, state)
+        if ids is not None:
+            rows = np.array(sorted(self._stored_rows(ids).values()), dtype=np.int64)
+            rows = rows[rows < state.rows]
+            rows = rows[allowed[rows]]
+        else:
+            rows = np.flatnonzero(allowed)
+
+        start = offset or 0
+        rows = rows[start:start + limit] if limit is not None else rows[start:]
+        records = self._fetch_rows(rows)
+        # A delete that raced this call removes its rows from the result rather than failing it
+        rows = np.array([row for row in rows.tolist() if row in records], dtype=np.int64)
+
+        return {
+            "ids": [records[row][0] for row in rows.tolist()],
+            "documents": [records[row][1] for row in rows.tolist()] if "documents" in include else None,
+            "metadatas": [records[row][2] for row in rows.tolist()] if "metadatas" in include else None,
+            "embeddings": np.asarray(state.vectors[rows]).tolist() if "embeddings" in include else None
+        }
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None, include: Optional[List[str]] = None) -> Dict[str, Any]:
+        include = ["documents", "metadatas", "distances"] if include is None else include
+        state = self._state
+
+        allowed = state.alive & self._where_mask(where, state)
+        candidates = np.flatnonzero(allowed)
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+        matches = [self._search(state, allowed, candidates, query, n_results) for query in queries]
+        records = self._fetch_rows(np.concatenate([rows for rows, _ in matches]) if matches else np.zeros(0))
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for top_rows, top_similarities in matches:
+            found = [i for i, row in enumerate(top_rows.tolist()) if row in records]
+            top_rows, top_similarities = top_rows[found], top_similarities[found]
+            results["ids"].append([records[row][0] for row in top_rows.tolist()])
+            results["documents"].append([records[row][1] for row in top_rows.tolist()])
+            results["metadatas"].append([records[row][2] for row in top_rows.tolist()])
+            # Same convention as Chroma's cosine space: distance = 1 - cosine similarity
+            results["distances"].append((1.0 - top_similarities).tolist())
+
+        for key in ("documents", "metadatas", "distances"):
+            if key not in include:
+                results[key] = None
+        return results
+
+    def _search(self, state: _RowState, allowed: np.ndarray, candidates: np.ndarray, query: np.ndarray,
+                k: int) -> Tuple[np.ndarray, np.ndarray]:
+        shortlist = max(k * self.rescore_factor, k)
+
+        # No index yet, or the filter leaves fewer rows than a shortlist: exact is cheaper
+        if state.index is None or len(candidates) <= shortlist:
+            return _exact_top_k(state.vectors, candidates, query, k)
+
+        rows = np.sort(state.index.search(query, self.nprobe, shortlist, allowed))
+        if len(rows) < k:
+            # A selective filter left too few rows in the probed lists
+            return _exact_top_k(state.vectors, candidates, query, k)
+
+        # Exact rescoring of the shortlist; sorted rows keep the memory-mapped reads sequential
+        top_rows, similarities = _top_k(np.asarray(state.vectors[rows], dtype=np.float32), np.arange(len(rows)), query, k)
+        return rows[top_rows], similarities
+
+    def snapshot(self, path: str) -> int:
+        """Writes the live rows as vectors.npy plus metadata.json, streaming the vectors in blocks."""
+        with self._lock:
+            state = self._state
+            rows = np.flatnonzero(state.alive)
+            if not len(rows):
+                write_snapshot(path, [], [], [], np.zeros((0, self.dim), dtype=np.float32))
+                return 0
+            records = self._fetch_rows(rows)
+
+            os.makedirs(path, exist_ok=True)
+            temp_vectors = os.path.join(path, "vectors.tmp.npy")
+            vectors = np.lib.format.open_memmap(temp_vectors, mode="w+", dtype=np.float32, shape=(len(rows), self.dim))
+            for start in range(0, len(rows), IMPORT_BLOCK_ROWS):
+                vectors[start:start + IMPORT_BLOCK_ROWS] = state.vectors[rows[start:start + IMPORT_BLOCK_ROWS]]
+            vectors.flush()
+            del vectors
+            os.replace(temp_vectors, os.path.join(path, "vectors.npy"))
+
+            temp_metadata = os.path.join(path, "metadata.json.tmp")
+            with open(temp_metadata, "w", encoding="utf-8") as sidecar:
+                json.dump({
+                    "ids": [records[row][0] for row in rows.tolist()],
+                    "documents": [records[row][1] for row in rows.tolist()],
+                    "metadatas": [records[row][2] for row in rows.tolist()]
+                }, sidecar, ensure_ascii=False)
+            os.replace(temp_metadata, os.path.join(path, "metadata.json"))
+            return len(rows)
+
+    def build_index(self, force_train: bool = False):
+        """Trains and encodes the whole collection in the calling thread; below min_train_rows this drops to exact search."""
+        self.wait_for_training()
+        with self._lock:
+            state = self._state
+            if state.alive_rows < self.min_train_rows and not force_train:
+                self._state = replace(state, index=None)
+                self._remove_index()
+                return
+
+            index = self._train(state.vectors)
+            self._install_index(index)
+
+    def wait_for_training(self):
+        training = self._training
+        if training is not None:
+            training.join()
+
+    def _maybe_start_training(self):
+        state = self._state
+        if not self.background_training or self._training is not None:
+            return
+        if state.index is None:
+            due = state.alive_rows >= self.min_train_rows
+        else:
+            due = state.rows > state.index.trained_rows * self.retrain_growth
+        if not due:
+            return
+
+        self._training = threading.Thread(target=self._train_in_background, args=(state.vectors,),
+                                          name=f"ivfpq-train-{self.name}", daemon=True)
+        self._training.start()
+
+    def _train_in_background(self, vectors: np.ndarray):
+        try:
+            # The vector file only grows, so this prefix stays valid while writers keep appending
+            index = self._train(vectors)
+            with self._lock:
+                self._install_index(index)
+        except Exception as e:
+            logger.error(f"Error training the IVF-PQ index for {self.name}: {str(e)}")
+        finally:
+            self._training = None
+
+    def _train(self, vectors: np.ndarray) -> IvfPqIndex:
+        started = time.perf_counter()
+        index = IvfPqIndex(self.nlist, self.subquantizers)
+        index.train(vectors)
+        index.set_codes(*index.encode(vectors))
+        logger.info(f"Built the IVF-PQ index of {self.name} over {len(vectors)} rows "
+                    f"in {time.perf_counter() - started:.1f}s")
+        return index
+
+    def _install_index(self, index: IvfPqIndex):
+        """Swaps in a freshly trained index, encoding the rows written while it was trained. Call under _lock."""
+        state = self._state
+        encoded = len(index.assignments)
+        if state.rows > encoded:
+            assignments, codes = index.encode(state.vectors[encoded:state.rows])
+            index.set_codes(np.concatenate([index.assignments, assignments]), np.concatenate([index.codes, codes]))
+
+        index.save(self.index_path)
+        self._tail_start = len(index.assignments)
+        self._remove_tails()
+        self._state = replace(state, index=index)
+
+    def _extend_index(self, index: Optional[IvfPqIndex], vectors: np.ndarray) -> Optional[IvfPqIndex]:
+        if index is None:
+            return None
+
+        assignments, codes = index.encode(vectors)
+        self._write_tail(assignments, codes)
+
+        extended = IvfPqIndex(index.nlist, index.subquantizers, index.seed)
+        extended.centroids, extended.codebooks = index.centroids, index.codebooks
+        extended.trained_rows = index.trained_rows
+        extended.set_codes(np.concatenate([index.assignments, assignments]), np.concatenate([index.codes, codes]))
+        return extended
+
+    def _write_tail(self, assignments: np.ndarray, codes: np.ndarray):
+        """Appends codes of new rows to the tail file that follows the saved index, so writes never rewrite it."""
+        records = np.empty(len(assignments), dtype=self._tail_dtype(codes.shape[1]))
+        records["list"], records["codes"] = assignments, codes
+        with open(self._tail_path(self._tail_start), "ab") as tail:
+            tail.write(records.tobytes())
+
+    def _tail_paths(self) -> List[str]:
+        return [
+            os.path.join(self.directory, filename) for filename in os.listdir(self.directory)
+            if filename.startswith("ivfpq-tail-")
+        ]
+
+    def _remove_tails(self, keep: Optional[str] = None):
+        for path in self._tail_paths():
+            if path != keep:
+                os.remove(path)
+
+    def _remove_index(self):
+        self._remove_tails()
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+
+    def compact(self) -> int:
+        """Rewrites the vector file without dead rows and renumbers the rest. Returns the rows reclaimed."""
+        self.wait_for_training()
+        with self._lock:
+            state = self._state
+            if state.alive_rows == state.rows:
+                return 0
+
+            rows = np.flatnonzero(state.alive)
+            temp_path = f"{self.vectors_path}.compacting"
+            with open(temp_path, "wb") as compacted:
+                for start in range(0, len(rows), IMPORT_BLOCK_ROWS):
+                    compacted.write(np.ascontiguousarray(state.vectors[rows[start:start + IMPORT_BLOCK_ROWS]]).tobytes())
+
+            with self._db_lock:
+                # Ascending order never moves a row onto one that hasn't been renumbered yet
+                self._db.executemany("UPDATE rows SET row = ? WHERE row = ?",
+                                     [(new, int(old)) for new, old in enumerate(rows) if new != old])
+                self._set_setting("rows", len(rows))
+                self._db.commit()
+            os.replace(temp_path, self.vectors_path)
+            self._remove_index()
+
+            self._tail_start = 0
+            self._field_values = {field: {} for field in MASKED_FIELDS}
+            self._load()
+            logger.info(f"Compacted {self.name}: reclaimed {state.rows - len(rows)} dead rows")
+            return state.rows - len(rows)
+
+    def close(self):
+        self.wait_for_training()
+        with self._db_lock:
+            self._db.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        state = self._state
+        index = state.index
+        resident = state.alive.nbytes + sum(codes.nbytes for codes in state.fields.values())
+        return {
+            "rows": state.alive_rows,
+            "dead_rows": state.rows - state.alive_rows,
+            "quantization": "ivfpq",
+            "resident_vector_bytes": index.nbytes if index is not None else 0,
+            "resident_bytes": resident + (index.nbytes if index is not None else 0),
+            "ivfpq": {
+                "trained": index is not None,
+                "training": self._training is not None,
+                "lists": len(index.centroids) if index is not None else 0,
+                "subquantizers": index.codebooks.shape[0] if index is not None else 0,
+                "nprobe": self.nprobe
+            }
+        }
+
+    def _where_mask(self, where: Optional[Dict[str, Any]], state: _RowState) -> np.ndarray:
+        def field_mask(field: str, value: Any) -> np.ndarray:
+            if field in MASKED_FIELDS:
+                code = self._field_values[field].get(str(value))
+                return state.fields[field] == code if code is not None else np.zeros(state.rows, dtype=bool)
+
+            mask = np.zeros(state.rows, dtype=bool)
+            with self._db_lock:
+                matched = [row for row, in self._db.execute(
+                    "SELECT row FROM rows WHERE json_extract(metadata, ?) = ?", (f'$."{field}"', value)
+                ) if row < state.rows]
+            mask[matched] = True
+            return mask
+
+        return where_mask(where, field_mask, state.rows)
+
+    def _value_code(self, field: str, value: str) -> int:
+        values = self._field_values[field]
+        if value not in values:
+            values[value] = len(values)
+        return values[value]
+
+    def _stored_rows(self, ids: List[str]) -> Dict[str, int]:
+        stored = {}
+        with self._db_lock:
+            for start in range(0, len(ids), SQL_BATCH_SIZE):
+                batch = ids[start:start + SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                stored.update(self._db.execute(f"SELECT id, row FROM rows WHERE id IN ({placeholders})", batch))
+        return stored
+
+    def _fetch_rows(self, rows: np.ndarray) -> Dict[int, Tuple[str, str, Dict[str, Any]]]:
+        records = {}
+        rows = [int(row) for row in rows]
+        with self._db_lock:
+            for start in range(0, len(rows), SQL_BATCH_SIZE):
+                batch = rows[start:start + SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                for row, doc_id, document, metadata in self._db.execute(
+                        f"SELECT row, id, document, metadata FROM rows WHERE row IN ({placeholders})", batch):
+                    records[row] = (doc_id, document, json.loads(metadata))
+        return records
+
+    def _append_vectors(self, vectors: np.ndarray):
+        with open(self.vectors_path, "ab") as vector_file:
+            vector_file.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+
+    def _insert_rows(self, rows, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        self._db.executemany(
+            f"INSERT INTO rows (row, id, document, metadata, {', '.join(MASKED_FIELDS)}) "
+            f"VALUES (?, ?, ?, ?{', ?' * len(MASKED_FIELDS)})",
+            [
+                (row, doc_id, document, json.dumps(metadata, ensure_ascii=False),
+                 *[str(metadata.get(field)) for field in MASKED_FIELDS])
+                for row, doc_id, document, metadata in zip(rows, ids, documents, metadatas)
+            ]
+        )
+
+    def _update_rows(self, rows: List[int], metadatas: List[Dict[str, Any]], documents: Optional[List[str]] = None):
+        assignments = ", ".join(f"{field} = ?" for field in MASKED_FIELDS)
+        self._db.executemany(
+            f"UPDATE rows SET metadata = ?, {assignments} WHERE row = ?",
+            [
+                (json.dumps(metadata, ensure_ascii=False), *[str(metadata.get(field)) for field in MASKED_FIELDS], row)
+                for row, metadata in zip(rows, metadatas)
+            ]
+        )
+        if documents is not None:
+            self._db.executemany("UPDATE rows SET document = ? WHERE row = ?", list(zip(documents, rows)))
+
+    def _delete_rows(self, rows: List[int]):
+        self._db.executemany("DELETE FROM rows WHERE row = ?", [(row,) for row in rows])
+
+    def _setting(self, key: str) -> int:
+        with self._db_lock:
+            row = self._db.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _set_setting(self, key: str, value: int):
+        self._db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+
+
+class IvfPqClient(VectorBackend):
+    def __init__(self, path: str, nlist: int = 0, subquantizers: int = 48, nprobe: int = 16,
+                 rescore_factor: int = 50, min_train_rows: int = 20000, background_training: bool = True):
+        self.path = path
+        self.nlist = nlist
+        self.subquantizers = subquantizers
+        self.nprobe = nprobe
+        self.rescore_factor = rescore_factor
+        self.min_train_rows = min_train_rows
+        self.background_training = background_training
+        self._collections: Dict[str, IvfPqCollection] = {}
+        os.makedirs(path, exist_ok=True)
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> IvfPqCollection:
+        if name not in self._collections:
+            self._collections[name] = IvfPqCollection(
+                name,
+                os.path.join(self.path, name),
+                nlist=self.nlist,
+                subquantizers=self.subquantizers,
+                nprobe=self.nprobe,
+                rescore_factor=self.rescore_factor,
+                min_train_rows=self.min_train_rows,
+                background_training=self.background_training
+            )
+        return self._collections[name]
+
+    def delete_collection(self, name: str):
+        collection = self._collections.pop(name, None)
+        if collection is not None:
+            collection.close()
+        shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+
+def _exact_top_k(vectors: np.ndarray, candidates: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact top-k over candidate rows of a memory-mapped matrix, reading EXACT_BLOCK_ROWS rows at a time."""
+    best_rows, best_similarities = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    for start in range(0, len(candidates), EXACT_BLOCK_ROWS):
+        block = candidates[start:start + EXACT_BLOCK_ROWS]
+        top, similarities = _top_k(np.asarray(vectors[block], dtype=np.float32), np.arange(len(block)), query, k)
+        best_rows = np.concatenate([best_rows, block[top]])
+        best_similarities = np.concatenate([best_similarities, similarities])
+
+    top = np.lexsort((best_rows, -best_similarities))[:k]
+    return best_rows[top], best_similarities[top]
+
+
+def _empty_state() -> _RowState:
+    return _RowState(0, 0, np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=bool),
+                     {field: np.zeros(0, dtype=np.int32) for field in MASKED_FIELDS}, None)
+
+
+def _largest_divisor_at_most(value: int, limit: int) -> int:
+    for candidate in range(min(value, max(1, limit)), 0, -1):
+        if value % candidate == 0:
+            return candidate
+    return 1
@@ -0,0 +1,512 @@
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from app.tools.vector_backends.base import (
+    VectorIndex, VectorBackend, write_snapshot, write_vectors, write_metadata, append_vectors, load_snapshot
+)
+import logging
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Metadata fields that get a boolean mask per distinct value as soon as the collection is loaded
+MASKED_FIELDS = ("chunk_type", "collection_type", "url")
+
+QUANTIZATION_MODES = ("none", "float16", "int8")
+# Quantized rows are upcast to float32 this many at a time; small blocks stay in cache and bound scratch memory
+QUANTIZED_BLOCK_ROWS = 4096
+# Appends write into spare rows of a buffer that grows by this factor when full, so n appends copy O(n) rows
+BUFFER_GROWTH = 1.5
+MIN_BUFFER_ROWS = 1024
+
+
+class NumpyCollection(VectorIndex):
+    """Exact cosine search over one contiguous float32 matrix, exposing the subset of the Chroma collection API VectorStore uses.
+
+    With `quantization` set to float16 or int8, search scans an in-memory quantized copy and rescores the
+    best `rescore_factor * k` rows against the float32 vectors, which then stay memory-mapped on disk.
+    """
+
+    def __init__(self, name: str, directory: str, quantization: str = "none", rescore_factor: int = 4):
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATION_MODES}")
+
+        self.name = name
+        self.directory = directory
+        self.quantization = quantization
+        self.rescore_factor = max(1, rescore_factor)
+        self._lock = threading.RLock()
+
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self._rows: Dict[str, int] = {}
+        self._masks: Dict[Tuple[str, Any], np.ndarray] = {}
+        # Spare capacity behind self.vectors and self.codes, which are always a prefix of them when set
+        self._vector_buffer: Optional[np.ndarray] = None
+        self._code_buffer: Optional[np.ndarray] = None
+
+        self._load()
+
+    @property
+    def memory_mapped(self) -> bool:
+        """Whether the float32 vectors are left on disk after writes, with only a compact index resident."""
+        return self.quantization != "none"
+
+    @property
+    def vectors_path(self) -> str:
+        return os.path.join(self.directory, "vectors.npy")
+
+    @property
+    def metadata_path(self) -> str:
+        return os.path.join(self.directory, "metadata.json")
+
+    @property
+    def codes_path(self) -> str:
+        return os.path.join(self.directory, f"vectors.{self.quantization}.npz")
+
+    def _load(self):
+        if not os.path.exists(self.metadata_path):
+            return
+
+        # Vectors stay a read-only mapping; the first write replaces them with an in-memory copy
+        self.ids, self.documents, self.metadatas, self.vectors = load_snapshot(self.directory)
+        self._reindex()
+
+        if self.quantization != "none":
+            self._load_codes()
+
+    def _load_codes(self):
+        try:
+            with np.load(self.codes_path, allow_pickle=False) as data:
+                codes, scales = data["codes"], data["scales"]
+                fingerprint = data["fingerprint"] if "fingerprint" in data.files else None
+            # A row count match isn't enough: vectors.npy may have been rewritten (e.g. restored from a snapshot)
+            if fingerprint is not None and np.array_equal(fingerprint, self._vectors_fingerprint()) \
+                    and len(codes) == len(self.ids):
+                self.codes, self.scales = codes, (scales if scales.size else None)
+                return
+            logger.info(f"Quantized vectors of {self.name} don't match vectors.npy")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error loading quantized vectors for {self.name}: {str(e)}")
+
+        logger.info(f"Quantizing {len(self.ids)} vectors of {self.name} to {self.quantization}")
+        self.codes, self.scales = quantize(self.vectors, self.quantization)
+        self._persist_codes()
+
+    def _persist(self):
+        write_snapshot(self.directory, self.ids, self.documents, self.metadatas, self.vectors)
+        if self.quantization != "none":
+            self._persist_codes()
+
+    def _persist_codes(self):
+        # np.savez appends .npz to names without it, so the temp file keeps the suffix
+        temp_path = os.path.join(self.directory, f"vectors.{self.quantization}.tmp.npz")
+        np.savez(temp_path, codes=self.codes,
+                 scales=self.scales if self.scales is not None else np.zeros(0, dtype=np.float32),
+                 fingerprint=self._vectors_fingerprint())
+        os.replace(temp_path, self.codes_path)
+
+    def _vectors_fingerprint(self) -> np.ndarray:
+        """Size and modification time of the vectors.npy the quantized codes were computed from."""
+        stat = os.stat(self.vectors_path)
+        return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+    def snapshot(self, path: str) -> int:
+        with self._lock:
+            write_snapshot(path, self.ids, self.documents, self.metadatas, self.vectors)
+            return len(self.ids)
+
+    def _reindex(self):
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self._masks = {}
+        self._extend_masks(0)
+
+    def _extend_masks(self, start: int):
+        """Extends the MASKED_FIELDS masks over rows `start` onwards; other fields' masks are rebuilt on demand."""
+        masks = {}
+        for field in MASKED_FIELDS:
+            values = np.array([str(metadata.get(field)) for metadata in self.metadatas[start:]])
+            known = {key_value for key_field, key_value in self._masks if key_field == field}
+            for value in known | set(values.tolist()):
+                previous = self._masks.get((field, value))
+                if previous is None:
+                    previous = np.zeros(start, dtype=bool)
+                masks[(field, value)] = np.concatenate([previous, values == value])
+        self._masks = masks
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]], embeddings: List[List[float]]):
+        with self._lock:
+            new_rows = [i for i, doc_id in enumerate(ids) if doc_id not in self._rows]
+            if len(new_rows) < len(ids):
+                logger.warning(f"Skipping {len(ids) - len(new_rows)} existing IDs added to {self.name}")
+            if new_rows:
+                self.upsert(
+                    ids=[ids[i] for i in new_rows],
+                    documents=[documents[i] for i in new_rows],
+                    metadatas=[metadatas[i] for i in new_rows],
+                    embeddings=[embeddings[i] for i in new_rows]
+                )
+
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]],
+               embeddings: List[List[float]]):
+        new_vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+
+        with self._lock:
+            # Copy-on-write for the lists and for changed rows, so queries holding the previous snapshot never
+            # see a half-applied batch; appended rows only land past the end of that snapshot
+            all_ids, all_documents, all_metadatas = list(self.ids), list(self.documents), list(self.metadatas)
+            existing_rows = len(self.ids)
+            new_rows: Dict[str, int] = {}
+            appended = []
+            changed = {}
+
+            for doc_id, document, metadata, vector in zip(ids, documents, metadatas, new_vectors):
+                row = self._rows.get(doc_id, new_rows.get(doc_id))
+                if row is None:
+                    new_rows[doc_id] = len(all_ids)
+                    all_ids.append(doc_id)
+                    all_documents.append(document)
+                    all_metadatas.append(dict(metadata))
+                    appended.append(vector)
+                else:
+                    all_documents[row] = document
+                    all_metadatas[row] = dict(metadata)
+                    if row >= existing_rows:
+                        appended[row - existing_rows] = vector
+                    elif not np.array_equal(self.vectors[row], vector):
+                        changed[row] = vector
+
+            if changed:
+                vectors = np.array(self.vectors)
+                for row, vector in changed.items():
+                    vectors[row] = vector
+                if appended:
+                    vectors = np.vstack([vectors, np.stack(appended)])
+                self._replace(all_ids, all_documents, all_metadatas, vectors, unchanged_rows=min(changed))
+            elif appended:
+                self._append(all_ids, all_documents, all_metadatas, np.stack(appended))
+            else:
+                self._replace_metadata(all_documents, all_metadatas)
+
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        with self._lock:
+            all_metadatas = list(self.metadatas)
+            for doc_id, metadata in zip(ids, metadatas):
+                row = self._rows.get(doc_id)
+                if row is not None:
+                    all_metadatas[row] = dict(metadata)
+
+            self._replace_metadata(self.documents, all_metadatas)
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            drop = {self._rows[doc_id] for doc_id in ids if doc_id in self._rows}
+            if not drop:
+                return
+
+            keep = [row for row in range(len(self.ids)) if row not in drop]
+            self._replace(
+                [self.ids[row] for row in keep],
+                [self.documents[row] for row in keep],
+                [self.metadatas[row] for row in keep],
+                self.vectors[keep],
+                unchanged_rows=min(drop)
+            )
+
+    def _replace(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]], vectors: np.ndarray,
+                 unchanged_rows: int = 0):
+        """Swaps in a new snapshot; its first `unchanged_rows` vectors are identical to the current ones."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        codes, scales = quantize(vectors, self.quantization) if self.quantization != "none" else (None, None)
+
+        self.ids, self.documents, self.metadatas = ids, documents, metadatas
+        self.vectors, self.codes, self.scales = vectors, codes, scales
+        self._vector_buffer, self._code_buffer = vectors, codes
+        self._reindex()
+        self._persist()
+
+        if self.memory_mapped and len(ids):
+            # Only the quantized copy stays resident; rescoring reads the few float32 rows it needs from disk
+            self.vectors = np.load(self.vectors_path, mmap_mode="r")
+            self._vector_buffer = None
+
+    def _append(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]], new_vectors: np.ndarray):
+        """Swaps in a snapshot that adds `new_vectors` after the current rows, writing and quantizing only those."""
+        start = len(self.ids)
+        new_vectors = np.ascontiguousarray(new_vectors, dtype=np.float32)
+
+        if self.memory_mapped:
+            vectors = None
+        else:
+            self._vector_buffer = _append_rows(self._vector_buffer, self.vectors, new_vectors)
+            vectors = self._vector_buffer[:start + len(new_vectors)]
+
+        if not (start and append_vectors(self.directory, new_vectors, start)):
+            if vectors is None:
+                vectors = np.vstack([self.vectors, new_vectors]) if start else new_vectors
+            write_vectors(self.directory, vectors)
+        if self.memory_mapped:
+            vectors = np.load(self.vectors_path, mmap_mode="r")
+
+        self.ids, self.documents, self.metadatas, self.vectors = ids, documents, metadatas, vectors
+        self._rows.update({doc_id: row for row, doc_id in enumerate(ids[start:], start)})
+        self._extend_masks(start)
+        write_metadata(self.directory, self.ids, self.documents, self.metadatas)
+
+        if self.quantization != "none":
+            if start and self._fits_scales(new_vectors):
+                new_codes, _ = quantize(new_vectors, self.quantization, self.scales)
+                self._code_buffer = _append_rows(self._code_buffer, self.codes, new_codes)
+                self.codes = self._code_buffer[:len(ids)]
+            else:
+                # A new row outside the int8 range of some dimension changes that dimension's scale for every row
+                self.codes, self.scales = quantize(vectors, self.quantization)
+                self._code_buffer = self.codes
+            self._persist_codes()
+
+    def _fits_scales(self, vectors: np.ndarray) -> bool:
+        return self.scales is None or bool(np.all(np.abs(vectors).max(axis=0) <= self.scales * 127))
+
+    def _replace_metadata(self, documents: List[str], metadatas: List[Dict[str, Any]]):
+        """Swaps in new documents and metadata for the current rows; vectors and quantized codes are not rewritten."""
+        self.documents, self.metadatas = documents, metadatas
+        self._masks = {}
+        self._extend_masks(0)
+        write_metadata(self.directory, self.ids, self.documents, self.metadatas)
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            include: Optional[List[str]] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None) -> Dict[str, Any]:
+        include = ["documents", "metadatas"] if include is None else include
+
+        with self._lock:
+            mask = self._where_mask(where)
+            rows = np.flatnonzero(mask).tolist()
+            if ids is not None:
+                wanted = {self._rows[doc_id] for doc_id in ids if doc_id in self._rows}
+                rows = [row for row in rows if row in wanted]
+
+            start = offset or 0
+            rows = rows[start:start + limit] if limit is not None else rows[start:]
+
+            return {
+                "ids": [self.ids[row] for row in rows],
+                "documents": [self.documents[row] for row in rows] if "documents" in include else None,
+                "metadatas": [self.metadatas[row] for row in rows] if "metadatas" in include else None,
+                "embeddings": [self.vectors[row].tolist() for row in rows] if "embeddings" in include else None
+            }
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None, include: Optional[List[str]] = None) -> Dict[str, Any]:
+        include = ["documents", "metadatas", "distances"] if include is None else include
+
+        with self._lock:
+            # Snapshot under the lock; writers replace these lists and arrays rather than mutating them
+            vectors, ids, documents, metadatas = self.vectors, self.ids, self.documents, self.metadatas
+            codes, scales = self.codes, self.scales
+            candidates = np.flatnonzero(self._where_mask(where))
+
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+
+        if codes is not None:
+            matches = [_rescored_top_k(vectors, codes, scales, candidates, query, n_results, self.rescore_factor)
+                       for query in queries]
+        else:
+            matches = self._search(vectors, candidates, queries, n_results)
+
+        for top_rows, top_similarities in matches:
+            results["ids"].append([ids[row] for row in top_rows])
+            results["documents"].append([documents[row] for row in top_rows])
+            results["metadatas"].append([metadatas[row] for row in top_rows])
+            # Same convention as Chroma's cosine space: distance = 1 - cosine similarity
+            results["distances"].append((1.0 - top_similarities).tolist())
+
+        for key in ("documents", "metadatas", "distances"):
+            if key not in include:
+                results[key] = None
+        return results
+
+    def _search(self, vectors: np.ndarray, candidates: np.ndarray, queries: np.ndarray,
+                k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        return [_top_k(vectors, candidates, query, k) for query in queries]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            resident = self.codes if self.codes is not None else self.vectors
+            return {
+                "rows": len(self.ids),
+                "quantization": self.quantization,
+                "resident_vector_bytes": int(resident.nbytes) + (int(self.scales.nbytes) if self.scales is not None else 0)
+            }
+
+    def _where_mask(self, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        return where_mask(where, self._field_mask, len(self.ids))
+
+    def _field_mask(self, field: str, value: Any) -> np.ndarray:
+        if field in MASKED_FIELDS:
+            mask = self._masks.get((field, str(value)))
+            return mask if mask is not None else np.zeros(len(self.ids), dtype=bool)
+
+        key = (field, value)
+        if key not in self._masks:
+            self._masks[key] = np.array([metadata.get(field) == value for metadata in self.metadatas], dtype=bool)
+        return self._masks[key]
+
+
+class NumpyClient(VectorBackend):
+    """Stands in for chromadb.PersistentClient: one NumpyCollection per subdirectory of `path`."""
+
+    def __init__(self, path: str, quantization: str = "none", rescore_factor: int = 4):
+        self.path = path
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self._collections: Dict[str, NumpyCollection] = {}
+        os.makedirs(path, exist_ok=True)
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> NumpyCollection:
+        if name not in self._collections:
+            self._collections[name] = NumpyCollection(name, os.path.join(self.path, name),
+                                                      quantization=self.quantization,
+                                                      rescore_factor=self.rescore_factor)
+        return self._collections[name]
+
+    def delete_collection(self, name: str):
+        collection = self._collections.pop(name, None) or NumpyCollection(name, os.path.join(self.path, name))
+        paths = [collection.vectors_path, collection.metadata_path]
+        paths += [os.path.join(collection.directory, f"vectors.{mode}.npz") for mode in QUANTIZATION_MODES[1:]]
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def where_mask(where: Optional[Dict[str, Any]], field_mask: Callable[[str, Any], np.ndarray], rows: int) -> np.ndarray:
+    """Evaluates a Chroma-style `where` clause to a boolean row mask, given the mask of one field value."""
+    if not where:
+        return np.ones(rows, dtype=bool)
+
+    if "$and" in where:
+        masks = [where_mask(clause, field_mask, rows) for clause in where["$and"]]
+        return np.logical_and.reduce(masks) if masks else np.ones(rows, dtype=bool)
+    if "$or" in where:
+        masks = [where_mask(clause, field_mask, rows) for clause in where["$or"]]
+        return np.logical_or.reduce(masks) if masks else np.zeros(rows, dtype=bool)
+
+    mask = np.ones(rows, dtype=bool)
+    for field, condition in where.items():
+        if isinstance(condition, dict) and "$in" in condition:
+            values = condition["$in"]
+            mask &= np.logical_or.reduce([field_mask(field, value) for value in values]) if values \
+                else np.zeros(rows, dtype=bool)
+        elif isinstance(condition, dict) and "$eq" in condition:
+            mask &= field_mask(field, condition["$eq"])
+        elif isinstance(condition, dict) and "$ne" in condition:
+            mask &= ~field_mask(field, condition["$ne"])
+        elif isinstance(condition, dict):
+            raise ValueError(f"Unsupported where operator for {field}: {list(condition)}")
+        else:
+            mask &= field_mask(field, condition)
+    return mask
+
+
+def _top_k(vectors: np.ndarray, candidates: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if not len(candidates) or k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    unfiltered = len(candidates) == len(vectors)
+    # Skip the gather when nothing is filtered out, so the common case is one matrix-vector product
+    similarities = vectors @ query if unfiltered else vectors[candidates] @ query
+
+    k = min(k, len(similarities))
+    top = np.argpartition(-similarities, k - 1)[:k]
+    top = top[np.argsort(-similarities[top], kind="stable")]
+
+    rows = top if unfiltered else candidates[top]
+    return rows, similarities[top]
+
+
+def _append_rows(buffer: Optional[np.ndarray], current: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Writes `rows` after `current`, a prefix of `buffer`, into spare capacity; reallocates only when it runs out."""
+    used = len(current)
+    if buffer is None or buffer.dtype != rows.dtype or buffer.shape[1:] != rows.shape[1:] \
+            or len(buffer) < used + len(rows):
+        capacity = max(used + len(rows), int(used * BUFFER_GROWTH), MIN_BUFFER_ROWS)
+        grown = np.empty((capacity, rows.shape[1]), dtype=rows.dtype)
+        if used:
+            grown[:used] = current
+        buffer = grown
+    buffer[used:used + len(rows)] = rows
+    return buffer
+
+
+def quantize(vectors: np.ndarray, mode: str,
+             scales: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Returns (codes, per-dimension scales); scales is None for float16, where codes @ q needs no rescaling.
+
+    Given int8 `scales`, rows are encoded with them instead of scales fitted to `vectors`.
+    """
+    if mode == "float16":
+        return vectors.astype(np.float16), None
+
+    if scales is not None:
+        return np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8), scales
+
+    if not len(vectors):
+        return np.zeros(vectors.shape, dtype=np.int8), np.ones(vectors.shape[1], dtype=np.float32)
+
+    scales = np.abs(vectors).max(axis=0).astype(np.float32) / 127
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def _quantized_similarities(codes: np.ndarray, scales: Optional[np.ndarray], rows: Optional[np.ndarray],
+                            query: np.ndarray) -> np.ndarray:
+    # Folding the scales into the query keeps the scan to one product per block: codes @ (q * s)
+    scaled_query = query * scales if scales is not None else query
+    total = len(rows) if rows is not None else len(codes)
+    similarities = np.empty(total, dtype=np.float32)
+
+    for start in range(0, total, QUANTIZED_BLOCK_ROWS):
+        end = min(start + QUANTIZED_BLOCK_ROWS, total)
+        block = codes[rows[start:end]] if rows is not None else codes[start:end]
+        similarities[start:end] = block.astype(np.float32) @ scaled_query
+    return similarities
+
+
+def _rescored_top_k(vectors: np.ndarray, codes: np.ndarray, scales: Optional[np.ndarray], candidates: np.ndarray,
+                    query: np.ndarray, k: int, rescore_factor: int) -> Tuple[np.ndarray, np.ndarray]:
+    if not len(candidates) or k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    unfiltered = len(candidates) == len(codes)
+    approximate = _quantized_similarities(codes, scales, None if unfiltered else candidates, query)
+
+    pool = min(k * rescore_factor, len(approximate))
+    shortlist = np.argpartition(-approximate, pool - 1)[:pool]
+    shortlist_rows = np.sort(shortlist if unfiltered else candidates[shortlist])
+
+    # Exact float32 scores for the shortlist only; sorted rows keep the memory-mapped reads sequential
+    exact = np.asarray(vectors[shortlist_rows], dtype=np.float32) @ query
+    k = min(k, len(exact))
+    top = np.argpartition(-exact, k - 1)[:k]
+    top = top[np.lexsort((shortlist_rows[top], -exact[top]))]
+    return shortlist_rows[top], exact[top]
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
@@ -0,0 +1,62 @@
+from typing import Callable, Dict, List
+from app.core.config import settings
+from app.tools.vector_backends.base import VectorBackend
+import os
+
+# Factories import their engine lazily, so an optional backend only fails when it is selected
+BackendFactory = Callable[[str], VectorBackend]
+
+_BACKENDS: Dict[str, BackendFactory] = {}
+
+
+def register_backend(name: str, factory: BackendFactory):
+    _BACKENDS[name] = factory
+
+
+def available_backends() -> List[str]:
+    return sorted(_BACKENDS)
+
+
+def create_backend(name: str, persist_directory: str) -> VectorBackend:
+    factory = _BACKENDS.get(name)
+    if factory is None:
+        raise ValueError(f"Unknown vector backend '{name}', expected one of {available_backends()}")
+    return factory(persist_directory)
+
+
+def _chroma(persist_directory: str) -> VectorBackend:
+    from app.tools.vector_backends.chroma_backend import ChromaBackend
+    return ChromaBackend(persist_directory)
+
+
+def _numpy(persist_directory: str) -> VectorBackend:
+    from app.tools.vector_backends.numpy_backend import NumpyClient
+    return NumpyClient(
+        os.path.join(persist_directory, "numpy"),
+        quantization=settings.VECTOR_QUANTIZATION,
+        rescore_factor=settings.VECTOR_RESCORE_FACTOR
+    )
+
+
+def _faiss(persist_directory: str) -> VectorBackend:
+    from app.tools.vector_backends.faiss_backend import FaissClient
+    return FaissClient(os.path.join(persist_directory, "faiss"))
+
+
+def _ivfpq(persist_directory: str) -> VectorBackend:
+    from app.tools.vector_backends.ivfpq_backend import IvfPqClient
+    return IvfPqClient(
+        os.path.join(persist_directory, "ivfpq"),
+        nlist=settings.IVFPQ_NLIST,
+        subquantizers=settings.IVFPQ_SUBQUANTIZERS,
+        nprobe=settings.IVFPQ_NPROBE,
+        rescore_factor=settings.IVFPQ_RESCORE_FACTOR,
+        min_train_rows=settings.IVFPQ_MIN_TRAIN_ROWS,
+        background_training=settings.IVFPQ_BACKGROUND_TRAINING
+    )
+
+
+register_backend("chroma", _chroma)
+register_backend("numpy", _numpy)
+register_backend("faiss", _faiss)
+register_backend("ivfpq", _ivfpq)
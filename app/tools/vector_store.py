@@ -1,29 +1,55 @@
-import chromadb
-from chromadb.config import Settings as ChromaSettings
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any, Optional, Tuple
+from sentence_transformers import SentenceTransformer, CrossEncoder
+from typing import List, Dict, Any, Optional, Set, Tuple
+import asyncio
+import hashlib
+import math
 import os
 import logging
+import time
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import asdict
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.tools.embedding_service import EmbeddingService
+from app.tools.embedding_cache import QueryEmbeddingCache, ChunkEmbeddingCache
+from app.tools.lexical_index import BM25Index
+from app.tools.reranker import CrossEncoderReranker
+from app.tools.vector_backends.registry import create_backend
+from app.utils.metrics import Histogram
 
 logger = logging.getLogger(__name__)
 
+VECTOR_STORE_LAYOUTS = ("split", "unified")
+MIGRATION_PAGE_SIZE = 500
+LEXICAL_INDEX_FILE = "bm25_index.npz"
+UNIFIED_COUNTS_FILE = "unified_counts.json"
+COLLECTION_TYPES = ("text", "pricing", "structured")
+
+
+def make_chunk_id(url: str, collection_type: str, content: str) -> str:
+    # Content-addressed, so the same chunk gets the same ID in every process and on every rebuild
+    return hashlib.sha256(f"{url}\x00{collection_type}\x00{content}".encode("utf-8")).hexdigest()[:32]
+
 
 class VectorStore:
     def __init__(self, persist_directory: str, embedding_model: str):
         self.persist_directory = persist_directory
         self.embedding_model_name = embedding_model
         self.embedding_model = SentenceTransformer(embedding_model)
+        self.embedding_service = EmbeddingService(
+            self.embedding_model.encode,
+            max_batch_size=settings.EMBEDDING_MAX_BATCH_SIZE,
+            max_wait_ms=settings.EMBEDDING_MAX_WAIT_MS,
+            workers=settings.EMBEDDING_WORKERS
+        )
 
         os.makedirs(persist_directory, exist_ok=True)
 
-        self.client = chromadb.PersistentClient(
-            path=persist_directory,
-            settings=ChromaSettings(anonymized_telemetry=False)
-        )
+        self.backend = settings.VECTOR_BACKEND
+        self.client = create_backend(self.backend, persist_directory)
 
         self.text_collection = self.client.get_or_create_collection(
             name="infinitepay_text",
@@ -40,152 +66,644 @@ class VectorStore:
             metadata={"hnsw:space": "cosine"}
         )
 
-    async def add_documents_enhanced(self, documents: List[Dict[str, Any]]):
-        try:
-            text_docs = []
-            pricing_docs = []
-            structured_docs = []
-
-            for doc_idx, doc in enumerate(documents):
-                if "chunks" in doc and doc["chunks"]:
-                    for chunk_idx, chunk in enumerate(doc["chunks"]):
-                        doc_id = f"doc_{doc_idx}_chunk_{chunk_idx}_{hash(doc['url'])}"
-
-                        metadata = {
-                            "url": doc["url"],
-                            "title": doc.get("title", ""),
-                            "chunk_type": chunk.chunk_type,
-                            "chunk_index": chunk_idx,
-                            **chunk.metadata
-                        }
-
-                        if chunk.chunk_type == "pricing_table":
-                            pricing_docs.append({
-                                "id": doc_id,
-                                "content": chunk.content,
-                                "metadata": metadata,
-                                "pricing_data": chunk.pricing_data
-                            })
-                        elif chunk.chunk_type in ["feature_list", "header"]:
-                            structured_docs.append({
-                                "id": doc_id,
-                                "content": chunk.content,
-                                "metadata": metadata
-                            })
-                        else:
-                            text_docs.append({
-                                "id": doc_id,
-                                "content": chunk.content,
-                                "metadata": metadata
-                            })
-                else:
-                    doc_id = f"doc_{doc_idx}_{hash(doc['url'])}"
-                    text_content = f"{doc.get('title', '')} {doc.get('text', '')}"
+        self.layout = settings.VECTOR_STORE_LAYOUT if settings.VECTOR_STORE_LAYOUT in VECTOR_STORE_LAYOUTS else "split"
+        self.unified_overfetch = settings.VECTOR_STORE_UNIFIED_OVERFETCH
+        self.unified_collection = self.client.get_or_create_collection(
+            name="infinitepay_unified",
+            metadata={"hnsw:space": "cosine"}
+        )
+        # Per-type chunk counts of the unified collection, kept up to date at write time
+        self.unified_counts_path = os.path.join(persist_directory, UNIFIED_COUNTS_FILE)
+        self._unified_counts: Optional[Dict[str, int]] = None
+
+        self.query_embedding_cache = None
+        if settings.QUERY_EMBEDDING_CACHE_ENABLED:
+            self.query_embedding_cache = QueryEmbeddingCache(
+                embedding_model,
+                max_bytes=settings.QUERY_EMBEDDING_CACHE_MAX_BYTES,
+                persist_path=settings.QUERY_EMBEDDING_CACHE_PATH
+            )
+
+        self.chunk_embedding_cache = None
+        if settings.CHUNK_EMBEDDING_CACHE_PATH:
+            self.chunk_embedding_cache = ChunkEmbeddingCache(
+                settings.CHUNK_EMBEDDING_CACHE_PATH,
+                embedding_model,
+                max_bytes=settings.CHUNK_EMBEDDING_CACHE_MAX_BYTES
+            )
+
+        self.lexical_index = None
+        if settings.HYBRID_SEARCH_ENABLED:
+            self.lexical_index = BM25Index(os.path.join(persist_directory, LEXICAL_INDEX_FILE))
+            if not len(self.lexical_index):
+                self.rebuild_lexical_index()
+        self.lexical_candidates = settings.HYBRID_LEXICAL_CANDIDATES
+        self.rrf_k = settings.HYBRID_RRF_K
+
+        self.hybrid_stats = {"fused_searches": 0, "lexical_only_results": 0}
+
+        self.reranker = self._create_reranker() if settings.RERANKER_ENABLED else None
+
+        self.index_version = 0
+        self.embedding_flight = SingleFlight("query_embedding")
+        self.search_flight = SingleFlight("retrieval")
+
+        self.query_executor = ThreadPoolExecutor(max_workers=settings.VECTOR_QUERY_WORKERS, thread_name_prefix="vector-query")
+        self.query_timeout_ms = settings.VECTOR_QUERY_TIMEOUT_MS
+        self.query_stats = {
+            collection_type: {"latency_ms": Histogram([1, 2, 5, 10, 25, 50, 100, 250, 500]), "timeouts": 0, "errors": 0}
+            for collection_type in ("pricing", "structured", "text", "unified")
+        }
+
+    async def embed_query(self, query: str) -> np.ndarray:
+        if self.query_embedding_cache is not None:
+            cached = self.query_embedding_cache.get(query)
+            if cached is not None:
+                return cached
+
+        embedding = await self.embedding_flight.do(query, lambda: self._encode_query(query))
+
+        if self.query_embedding_cache is not None:
+            self.query_embedding_cache.set(query, embedding)
+        return embedding
 
+    async def _encode_query(self, query: str) -> np.ndarray:
+        embedding = await self.embedding_service.embed(query)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+
+    def _prepare_documents(self, documents: List[Dict[str, Any]]) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+        text_docs = []
+        pricing_docs = []
+        structured_docs = []
+        seen_ids = set()
+
+        for doc in documents:
+            if "chunks" in doc and doc["chunks"]:
+                for chunk_idx, chunk in enumerate(doc["chunks"]):
                     metadata = {
                         "url": doc["url"],
                         "title": doc.get("title", ""),
-                        "chunk_type": "full_document",
-                        "meta_description": doc.get("meta_description", ""),
-                        "headings": str(doc.get("headings", [])),
+                        "chunk_type": chunk.chunk_type,
+                        "chunk_index": chunk_idx,
+                        **chunk.metadata
                     }
 
-                    text_docs.append({
-                        "id": doc_id,
-                        "content": text_content,
-                        "metadata": metadata
-                    })
+                    if chunk.chunk_type == "pricing_table":
+                        collection_type, target = "pricing", pricing_docs
+                    elif chunk.chunk_type in ["feature_list", "header"]:
+                        collection_type, target = "structured", structured_docs
+                    else:
+                        collection_type, target = "text", text_docs
+
+                    doc_id = make_chunk_id(doc["url"], collection_type, chunk.content)
+                    if doc_id in seen_ids:
+                        continue
+                    seen_ids.add(doc_id)
+
+                    metadata["collection_type"] = collection_type
+                    prepared = {"id": doc_id, "content": chunk.content, "metadata": metadata}
+                    if collection_type == "pricing":
+                        prepared["pricing_data"] = chunk.pricing_data
+                    target.append(prepared)
+            else:
+                text_content = f"{doc.get('title', '')} {doc.get('text', '')}"
+                doc_id = make_chunk_id(doc["url"], "text", text_content)
+                if doc_id in seen_ids:
+                    continue
+                seen_ids.add(doc_id)
+
+                metadata = {
+                    "url": doc["url"],
+                    "title": doc.get("title", ""),
+                    "chunk_type": "full_document",
+                    "meta_description": doc.get("meta_description", ""),
+                    "headings": str(doc.get("headings", [])),
+                    "collection_type": "text"
+                }
+
+                text_docs.append({
+                    "id": doc_id,
+                    "content": text_content,
+                    "metadata": metadata
+                })
+
+        return text_docs, pricing_docs, structured_docs
+
+    def _index_targets(self, text_docs: List[Dict], pricing_docs: List[Dict],
+                       structured_docs: List[Dict]) -> List[Tuple[Any, List[Dict], bool]]:
+        if self.layout == "unified":
+            return [(self.unified_collection, pricing_docs + structured_docs + text_docs, True)]
+
+        return [
+            (self.text_collection, text_docs, False),
+            (self.pricing_collection, pricing_docs, True),
+            (self.structured_collection, structured_docs, False)
+        ]
 
-            if text_docs:
-                await self._add_to_collection(self.text_collection, text_docs)
-                logger.info(f"Added {len(text_docs)} text documents")
+    async def add_documents_enhanced(self, documents: List[Dict[str, Any]]):
+        try:
+            text_docs, pricing_docs, structured_docs = self._prepare_documents(documents)
 
-            if pricing_docs:
-                await self._add_to_collection(self.pricing_collection, pricing_docs, include_pricing=True)
-                logger.info(f"Added {len(pricing_docs)} pricing documents")
+            for collection, docs, include_pricing in self._index_targets(text_docs, pricing_docs, structured_docs):
+                if docs:
+                    await self._add_to_collection(collection, docs, include_pricing=include_pricing)
+                    logger.info(f"Added {len(docs)} documents to {collection.name}")
 
-            if structured_docs:
-                await self._add_to_collection(self.structured_collection, structured_docs)
-                logger.info(f"Added {len(structured_docs)} structured documents")
+            if text_docs or pricing_docs or structured_docs:
+                self.index_version += 1
+                self._save_lexical_index()
 
         except Exception as e:
             logger.error(f"Error adding enhanced documents: {str(e)}")
             raise
 
-    async def _add_to_collection(self, collection, docs: List[Dict], include_pricing: bool = False):
-        if not docs:
-            return
+    async def add_documents_incremental(self, documents: List[Dict[str, Any]],
+                                        known_urls: Optional[List[str]] = None) -> Dict[str, int]:
+        """Diffs the scraped URLs against the stored chunks, embedding only chunks whose content is new.
 
-        doc_ids = []
-        doc_texts = []
-        doc_metadatas = []
+        When `known_urls` is given, chunks of any other URL (e.g. a page dropped from the crawl list) are purged.
+        """
+        counts = {"added": 0, "updated": 0, "removed": 0, "skipped": 0}
 
-        for doc in docs:
-            doc_ids.append(doc["id"])
-            doc_texts.append(doc["content"])
+        try:
+            text_docs, pricing_docs, structured_docs = self._prepare_documents(documents)
+            urls = sorted({doc["url"] for doc in documents})
+
+            for collection, docs, include_pricing in self._index_targets(text_docs, pricing_docs, structured_docs):
+                await self._sync_collection(collection, docs, urls, include_pricing, counts)
+                if known_urls is not None:
+                    await self._purge_unknown_urls(collection, set(known_urls), counts)
 
-            metadata = doc["metadata"].copy()
+            if counts["added"] or counts["updated"] or counts["removed"]:
+                self.index_version += 1
+                self._save_lexical_index()
 
-            if include_pricing and "pricing_data" in doc and doc["pricing_data"]:
-                metadata["has_pricing_data"] = True
-                metadata["pricing_count"] = len(doc["pricing_data"])
-                metadata["pricing_json"] = json.dumps([asdict(p) for p in doc["pricing_data"]])
+            logger.info(f"Incremental indexing finished: {counts}")
+            return counts
 
-            doc_metadatas.append(metadata)
+        except Exception as e:
+            logger.error(f"Error indexing documents incrementally: {str(e)}")
+            raise
 
-        embeddings = self.embedding_model.encode(doc_texts)
+    async def _sync_collection(self, collection, docs: List[Dict], urls: List[str], include_pricing: bool,
+                               counts: Dict[str, int]):
+        # Every scraped URL is diffed in every collection, so chunks that moved to another
+        # collection (or disappeared from the page) are removed here
+        loop = asyncio.get_running_loop()
+        stored = {}
+        for url in urls:
+            page = await loop.run_in_executor(
+                self.query_executor, lambda url=url: collection.get(where={"url": url}, include=["metadatas"])
+            )
+            stored.update(zip(page["ids"], page["metadatas"]))
+
+        to_add = []
+        to_update = []
+        for doc in docs:
+            if doc["id"] not in stored:
+                to_add.append(doc)
+            elif stored[doc["id"]] != self._build_metadata(doc, include_pricing):
+                to_update.append(doc)
+            else:
+                counts["skipped"] += 1
+
+        current_ids = {doc["id"] for doc in docs}
+        removed_ids = [doc_id for doc_id in stored if doc_id not in current_ids]
+
+        if to_add:
+            await self._add_to_collection(collection, to_add, include_pricing=include_pricing)
+            counts["added"] += len(to_add)
+
+        if to_update:
+            # Same content means the same ID and embedding; only metadata such as chunk_index changed
+            ids = [doc["id"] for doc in to_update]
+            metadatas = [self._build_metadata(doc, include_pricing) for doc in to_update]
+            await loop.run_in_executor(self.query_executor, lambda: collection.update(ids=ids, metadatas=metadatas))
+            counts["updated"] += len(to_update)
+
+        if removed_ids:
+            await self._delete_chunks(collection, removed_ids, [stored[doc_id] for doc_id in removed_ids])
+            counts["removed"] += len(removed_ids)
+
+    async def _purge_unknown_urls(self, collection, known_urls: Set[str], counts: Dict[str, int]):
+        loop = asyncio.get_running_loop()
+        stale_ids = []
+        stale_metadatas = []
+        offset = 0
+        while True:
+            page = await loop.run_in_executor(
+                self.query_executor,
+                lambda offset=offset: collection.get(include=["metadatas"], limit=MIGRATION_PAGE_SIZE, offset=offset)
+            )
+            if not page["ids"]:
+                break
+            for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+                if metadata.get("url") not in known_urls:
+                    stale_ids.append(doc_id)
+                    stale_metadatas.append(metadata)
+            offset += len(page["ids"])
+
+        if stale_ids:
+            await self._delete_chunks(collection, stale_ids, stale_metadatas)
+            counts["removed"] += len(stale_ids)
+            logger.info(f"Purged {len(stale_ids)} chunks of URLs no longer crawled from {collection.name}")
+
+    async def _delete_chunks(self, collection, doc_ids: List[str], metadatas: List[Dict[str, Any]]):
+        loop = asyncio.get_running_loop()
+        if collection is self.unified_collection:
+            # Loading the counts may recount the collection, so it runs on the pool like the delete
+            await loop.run_in_executor(self.query_executor, self._unified_type_counts)
+        await loop.run_in_executor(self.query_executor, lambda: collection.delete(ids=doc_ids))
+        if collection is self.unified_collection:
+            self._adjust_unified_counts([metadata.get("collection_type", "text") for metadata in metadatas], -1)
+        if self.lexical_index is not None:
+            self.lexical_index.remove(doc_ids)
+
+    def _build_metadata(self, doc: Dict[str, Any], include_pricing: bool) -> Dict[str, Any]:
+        metadata = doc["metadata"].copy()
+
+        if include_pricing and "pricing_data" in doc and doc["pricing_data"]:
+            metadata["has_pricing_data"] = True
+            metadata["pricing_count"] = len(doc["pricing_data"])
+            metadata["pricing_json"] = json.dumps([asdict(p) for p in doc["pricing_data"]])
+
+        return metadata
 
-        collection.add(
+    async def _add_to_collection(self, collection, docs: List[Dict], include_pricing: bool = False):
+        if not docs:
+            return
+
+        doc_ids = [doc["id"] for doc in docs]
+        doc_texts = [doc["content"] for doc in docs]
+        doc_metadatas = [self._build_metadata(doc, include_pricing) for doc in docs]
+
+        embeddings = await self._embed_documents(doc_texts)
+
+        new_types = self._new_unified_types(collection, doc_ids, doc_metadatas)
+        collection.upsert(
             ids=doc_ids,
             documents=doc_texts,
             metadatas=doc_metadatas,
             embeddings=embeddings.tolist()
         )
+        if new_types:
+            self._adjust_unified_counts(new_types, 1)
+
+        if self.lexical_index is not None:
+            self.lexical_index.upsert(doc_ids, doc_texts, [metadata["collection_type"] for metadata in doc_metadatas])
+
+    async def _embed_documents(self, texts: List[str]) -> np.ndarray:
+        if self.chunk_embedding_cache is None:
+            return await self.embedding_service.embed_many(texts)
+
+        # SQLite work stays off the event loop, which keeps serving queries during a rebuild
+        loop = asyncio.get_running_loop()
+        embeddings = await loop.run_in_executor(self.query_executor, self.chunk_embedding_cache.get_many, texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+
+        if missing:
+            encoded = await self.embedding_service.embed_many([texts[i] for i in missing])
+            await loop.run_in_executor(
+                self.query_executor, self.chunk_embedding_cache.set_many, [texts[i] for i in missing], encoded
+            )
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = embedding
+
+        logger.info(f"Embedded {len(missing)} of {len(texts)} chunks ({len(texts) - len(missing)} from cache)")
+        return np.stack(embeddings)
 
     async def search_enhanced(self, query: str, k: int = 5, search_type: str = "all") -> List[Dict[str, Any]]:
-        try:
-            query_lower = query.lower()
-            is_pricing_query = any(keyword in query_lower for keyword in [
-                'fee', 'rate', 'cost', 'price', 'charge', '%', 'percent', 'how much'
-            ])
+        results = await self.search_flight.do(
+            (query, k, search_type, self.index_version),
+            lambda: self._search_enhanced(query, k, search_type)
+        )
+        return list(results)
 
-            query_embedding = self.embedding_model.encode([query])
+    def _create_reranker(self) -> Optional[CrossEncoderReranker]:
+        try:
+            model = CrossEncoder(settings.RERANKER_MODEL, max_length=settings.RERANKER_MAX_LENGTH)
+        except Exception as e:
+            logger.error(f"Error loading reranker model {settings.RERANKER_MODEL}, reranking disabled: {str(e)}")
+            return None
+
+        return CrossEncoderReranker(
+            lambda pairs: model.predict(pairs, batch_size=len(pairs), show_progress_bar=False),
+            candidates=settings.RERANKER_CANDIDATES,
+            batch_size=settings.RERANKER_BATCH_SIZE,
+            cache_entries=settings.RERANKER_CACHE_ENTRIES,
+            min_score=settings.RERANKER_MIN_SCORE
+        )
 
-            all_results = []
+    async def _search_enhanced(self, query: str, k: int, search_type: str) -> List[Dict[str, Any]]:
+        if self.reranker is None or k <= 0:
+            return await self._retrieve(query, k, search_type)
+
+        # Retrieval fills a wider candidate pool, and the cross-encoder picks the final k from it
+        candidates = await self._retrieve(query, k, search_type, budget=max(k, self.reranker.candidates))
+        reserved = {}
+        if self._is_pricing_query(query) or search_type == "pricing":
+            # Pricing chunks that retrieval alone would have returned, up to the pricing quota, survive reranking
+            reserved["pricing"] = min(self._quotas(query, k, search_type)["pricing"],
+                                      sum(result["collection_type"] == "pricing" for result in candidates[:k]))
+        return await self.reranker.rerank(query, candidates, k, reserved=reserved)
+
+    @staticmethod
+    def _is_pricing_query(query: str) -> bool:
+        query_lower = query.lower()
+        return any(keyword in query_lower for keyword in [
+            'fee', 'rate', 'cost', 'price', 'charge', '%', 'percent', 'how much'
+        ])
+
+    def _quotas(self, query: str, k: int, search_type: str) -> Dict[str, int]:
+        quotas = {}
+        if self._is_pricing_query(query) or search_type in ["all", "pricing"]:
+            quotas["pricing"] = min(k, 3)
+        if search_type in ["all", "structured"]:
+            quotas["structured"] = min(k, 2)
+        if search_type in ["all", "text"]:
+            quotas["text"] = k
+        return quotas
+
+    async def _retrieve(self, query: str, k: int, search_type: str, budget: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Returns up to `budget` results (k by default), with every per-type quota scaled from k to the budget."""
+        try:
+            quotas = self._quotas(query, k, search_type)
+            if budget is not None and budget > k:
+                quotas = {collection_type: math.ceil(quota * budget / k) for collection_type, quota in quotas.items()}
+                k = budget
 
-            if is_pricing_query or search_type in ["all", "pricing"]:
-                pricing_results = self.pricing_collection.query(
-                    query_embeddings=query_embedding.tolist(),
-                    n_results=min(k, 3),
-                    include=["documents", "metadatas", "distances"]
-                )
-                all_results.extend(self._format_results(pricing_results, "pricing"))
+            # BM25 runs on the query pool while the query is embedded and the collections are searched
+            lexical_search = None
+            if self.lexical_index is not None:
+                lexical_search = asyncio.ensure_future(self._search_lexical(query, list(quotas)))
 
-            if search_type in ["all", "structured"]:
-                structured_results = self.structured_collection.query(
-                    query_embeddings=query_embedding.tolist(),
-                    n_results=min(k, 2),
-                    include=["documents", "metadatas", "distances"]
-                )
-                all_results.extend(self._format_results(structured_results, "structured"))
+            query_embedding = (await self.embed_query(query)).reshape(1, -1)
 
-            if search_type in ["all", "text"]:
-                text_results = self.text_collection.query(
-                    query_embeddings=query_embedding.tolist(),
-                    n_results=k,
-                    include=["documents", "metadatas", "distances"]
-                )
-                all_results.extend(self._format_results(text_results, "text"))
+            if self.layout == "unified":
+                all_results = await self._query_unified(query_embedding, quotas)
+            else:
+                all_results = await self._query_split(query_embedding, quotas)
 
             unique_results = self._deduplicate_results(all_results)
             unique_results.sort(key=lambda x: x["similarity"], reverse=True)
 
+            if lexical_search is not None:
+                return await self._fuse_lexical(unique_results, await lexical_search, query_embedding, quotas, k)
+
             return unique_results[:k]
 
         except Exception as e:
             logger.error(f"Error in enhanced search: {str(e)}")
             return []
 
+    async def _search_lexical(self, query: str, collection_types: List[str]) -> List[Tuple[str, str, float]]:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.query_executor,
+                lambda: self.lexical_index.search(query, k=self.lexical_candidates, collection_types=collection_types)
+            )
+        except Exception as e:
+            logger.error(f"Error in BM25 search: {str(e)}")
+            return []
+
+    async def _fuse_lexical(self, dense_results: List[Dict[str, Any]], lexical_hits: List[Tuple[str, str, float]],
+                            query_embedding: np.ndarray, quotas: Dict[str, int], k: int) -> List[Dict[str, Any]]:
+        """Reciprocal rank fusion of the dense and BM25 rankings, keeping the per-type quotas."""
+        if not lexical_hits:
+            return dense_results[:k]
+
+        scores = {}
+        by_id = {}
+        for rank, result in enumerate(dense_results):
+            by_id[result["id"]] = result
+            scores[result["id"]] = 1 / (self.rrf_k + rank + 1)
+
+        missing = {}
+        for rank, (chunk_id, collection_type, _) in enumerate(lexical_hits):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1 / (self.rrf_k + rank + 1)
+            if chunk_id not in by_id:
+                missing.setdefault(collection_type, []).append(chunk_id)
+
+        # Lexical-only hits weren't among the dense neighbours, so load them with their stored embeddings
+        fetched = await asyncio.gather(*(
+            self._get_chunks(collection_type, chunk_ids, query_embedding)
+            for collection_type, chunk_ids in missing.items()
+        ))
+        for results in fetched:
+            for result in results:
+                by_id[result["id"]] = result
+
+        fused = [by_id[chunk_id] for chunk_id in sorted(scores, key=scores.get, reverse=True) if chunk_id in by_id]
+
+        remaining = dict(quotas)
+        selected = []
+        for result in self._deduplicate_results(fused):
+            if remaining.get(result["collection_type"], 0) <= 0:
+                continue
+            remaining[result["collection_type"]] -= 1
+            # Dense results can be shared with coalesced searches, so the score goes on a copy
+            selected.append({**result, "rrf_score": scores[result["id"]]})
+            if len(selected) == k:
+                break
+
+        self.hybrid_stats["fused_searches"] += 1
+        self.hybrid_stats["lexical_only_results"] += sum(result["id"] not in {r["id"] for r in dense_results}
+                                                         for result in selected)
+        return selected
+
+    async def _get_chunks(self, collection_type: str, chunk_ids: List[str],
+                          query_embedding: np.ndarray) -> List[Dict[str, Any]]:
+        collection = self.unified_collection if self.layout == "unified" else self._split_collections()[collection_type]
+
+        lookup = asyncio.get_running_loop().run_in_executor(
+            self.query_executor,
+            lambda: collection.get(ids=chunk_ids, include=["documents", "metadatas", "embeddings"])
+        )
+
+        try:
+            if self.query_timeout_ms:
+                page = await asyncio.wait_for(lookup, self.query_timeout_ms / 1000)
+            else:
+                page = await lookup
+            if not page["ids"]:
+                return []
+
+            embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+            norms = np.maximum(np.linalg.norm(embeddings, axis=1), 1e-12)
+            similarities = embeddings @ query_embedding.ravel() / norms
+
+            # Shaped like a one-query result so the formatting matches the dense hits
+            return self._format_results({
+                "ids": [page["ids"]],
+                "documents": [page["documents"]],
+                "metadatas": [page["metadatas"]],
+                "distances": [(1 - similarities).tolist()]
+            }, collection_type)
+        except asyncio.TimeoutError:
+            logger.warning(f"Loading {collection_type} chunks timed out after {self.query_timeout_ms}ms")
+            return []
+        except Exception as e:
+            logger.error(f"Error loading {collection_type} chunks: {str(e)}")
+            return []
+
+    def rebuild_lexical_index(self) -> int:
+        """Re-tokenises every stored chunk, e.g. for a store indexed before hybrid search existed."""
+        if self.lexical_index is None:
+            return 0
+
+        self.lexical_index.clear()
+        if self.layout == "unified":
+            collections = {"text": self.unified_collection}
+        else:
+            collections = self._split_collections()
+
+        for collection_type, collection in collections.items():
+            offset = 0
+            while True:
+                page = collection.get(include=["documents", "metadatas"], limit=MIGRATION_PAGE_SIZE, offset=offset)
+                if not page["ids"]:
+                    break
+                self.lexical_index.upsert(
+                    page["ids"],
+                    page["documents"],
+                    [metadata.get("collection_type", collection_type) for metadata in page["metadatas"]]
+                )
+                offset += len(page["ids"])
+
+        if len(self.lexical_index):
+            logger.info(f"Rebuilt the BM25 index from {len(self.lexical_index)} stored chunks")
+            self._save_lexical_index()
+        return len(self.lexical_index)
+
+    def _save_lexical_index(self):
+        if self.lexical_index is not None and self.lexical_index.dirty:
+            self.lexical_index.save()
+
+    def _split_collections(self) -> Dict[str, Any]:
+        return {
+            "pricing": self.pricing_collection,
+            "structured": self.structured_collection,
+            "text": self.text_collection
+        }
+
+    async def _query_split(self, query_embedding: np.ndarray, quotas: Dict[str, int]) -> List[Dict[str, Any]]:
+        collections = self._split_collections()
+        responses = await asyncio.gather(*(
+            self._query_collection(collection_type, collections[collection_type], query_embedding, n_results=n_results)
+            for collection_type, n_results in quotas.items()
+        ))
+
+        all_results = []
+        for collection_type, results in zip(quotas, responses):
+            if results is not None:
+                all_results.extend(self._format_results(results, collection_type))
+
+        return all_results
+
+    async def _query_collection(self, collection_type: str, collection, query_embedding: np.ndarray,
+                                **query_kwargs) -> Optional[Dict[str, Any]]:
+        """Runs one Chroma query on the query pool; returns None on timeout or error so the others still count."""
+        stats = self.query_stats[collection_type]
+        started = time.perf_counter()
+
+        query = asyncio.get_running_loop().run_in_executor(
+            self.query_executor,
+            lambda: collection.query(
+                query_embeddings=query_embedding.tolist(),
+                include=["documents", "metadatas", "distances"],
+                **query_kwargs
+            )
+        )
+
+        try:
+            if self.query_timeout_ms:
+                return await asyncio.wait_for(query, self.query_timeout_ms / 1000)
+            return await query
+        except asyncio.TimeoutError:
+            # The worker thread can't be interrupted; its result is simply dropped
+            stats["timeouts"] += 1
+            logger.warning(f"{collection_type} collection query timed out after {self.query_timeout_ms}ms")
+            return None
+        except Exception as e:
+            stats["errors"] += 1
+            logger.error(f"Error querying {collection_type} collection: {str(e)}")
+            return None
+        finally:
+            stats["latency_ms"].observe((time.perf_counter() - started) * 1000)
+
+    async def _query_unified(self, query_embedding: np.ndarray, quotas: Dict[str, int]) -> List[Dict[str, Any]]:
+        # One HNSW query over-fetches enough neighbours to fill every type's quota, then the
+        # quotas are applied in similarity order
+        query_kwargs = {}
+        if len(quotas) < 3:
+            query_kwargs["where"] = {"collection_type": {"$in": list(quotas)}}
+
+        results = await self._query_collection(
+            "unified",
+            self.unified_collection,
+            query_embedding,
+            n_results=sum(quotas.values()) * self.unified_overfetch,
+            **query_kwargs
+        )
+        if results is None:
+            return []
+
+        remaining = dict(quotas)
+        selected = []
+        for result in self._format_results(results, "unified"):
+            collection_type = result["metadata"].get("collection_type", "text")
+            if remaining.get(collection_type, 0) <= 0:
+                continue
+            remaining[collection_type] -= 1
+            result["collection_type"] = collection_type
+            selected.append(result)
+
+        return selected
+
+    def migrate_to_unified(self, drop_old: bool = False) -> Dict[str, int]:
+        """Copy chunks (with their stored embeddings) from the three split collections into the unified one."""
+        migrated = {}
+
+        for collection_type, collection in self._split_collections().items():
+            migrated[collection_type] = 0
+            offset = 0
+
+            while True:
+                page = collection.get(
+                    include=["documents", "metadatas", "embeddings"],
+                    limit=MIGRATION_PAGE_SIZE,
+                    offset=offset
+                )
+                if not page["ids"]:
+                    break
+
+                metadatas = [{**metadata, "collection_type": collection_type} for metadata in page["metadatas"]]
+                new_types = self._new_unified_types(self.unified_collection, page["ids"], metadatas)
+                self.unified_collection.upsert(
+                    ids=page["ids"],
+                    documents=page["documents"],
+                    metadatas=metadatas,
+                    embeddings=page["embeddings"]
+                )
+                if new_types:
+                    self._adjust_unified_counts(new_types, 1)
+
+                migrated[collection_type] += len(page["ids"])
+                offset += len(page["ids"])
+
+            logger.info(f"Migrated {migrated[collection_type]} {collection_type} chunks to the unified collection")
+
+        if drop_old:
+            for collection in self._split_collections().values():
+                all_ids = collection.get(include=[])["ids"]
+                if all_ids:
+                    collection.delete(ids=all_ids)
+            logger.info("Emptied the split collections")
+
+        self.index_version += 1
+        return migrated
+
     def _format_results(self, results, collection_type: str) -> List[Dict[str, Any]]:
         formatted_results = []
 
@@ -196,6 +714,7 @@ class VectorStore:
             metadata = results['metadatas'][0][i]
 
             result = {
+                "id": results['ids'][0][i],
                 "document": results['documents'][0][i],
                 "metadata": metadata,
                 "similarity": 1 - results['distances'][0][i],
@@ -271,7 +790,69 @@ class VectorStore:
 
         return pricing_insights
 
+    def get_singleflight_stats(self) -> Dict[str, Any]:
+        return {
+            "query_embedding": self.embedding_flight.get_stats(),
+            "retrieval": self.search_flight.get_stats()
+        }
+
+    def get_query_stats(self) -> Dict[str, Any]:
+        return {
+            collection_type: {
+                "latency_ms": stats["latency_ms"].get_stats(),
+                "timeouts": stats["timeouts"],
+                "errors": stats["errors"]
+            }
+            for collection_type, stats in self.query_stats.items()
+            if stats["latency_ms"].count
+        }
+
+    def get_hybrid_stats(self) -> Dict[str, Any]:
+        if self.lexical_index is None:
+            return {"enabled": False}
+
+        return {
+            "enabled": True,
+            "rrf_k": self.rrf_k,
+            "lexical_candidates": self.lexical_candidates,
+            **self.hybrid_stats,
+            "bm25": self.lexical_index.get_stats()
+        }
+
+    def get_reranker_stats(self) -> Dict[str, Any]:
+        if self.reranker is None:
+            return {"enabled": False}
+        return {"model": settings.RERANKER_MODEL, **self.reranker.get_stats()}
+
+    def get_embedding_stats(self) -> Dict[str, Any]:
+        return {
+            **self.embedding_service.get_stats(),
+            "query_cache": self.query_embedding_cache.get_stats() if self.query_embedding_cache else {"enabled": False},
+            "chunk_cache": self.chunk_embedding_cache.get_stats() if self.chunk_embedding_cache else {"enabled": False}
+        }
+
+    async def aclose(self):
+        await self.embedding_service.aclose()
+        self._close_stores()
+
+    def close(self):
+        self.embedding_service.close()
+        self._close_stores()
+
+    def _close_stores(self):
+        self.query_executor.shutdown(wait=False)
+        if self.reranker is not None:
+            self.reranker.close()
+        if self.query_embedding_cache is not None:
+            self.query_embedding_cache.save()
+        if self.chunk_embedding_cache is not None:
+            self.chunk_embedding_cache.close()
+        self._save_lexical_index()
+
     def get_collection_info(self) -> Dict[str, Any]:
+        if self.layout == "unified":
+            return self._get_unified_collection_info()
+
         try:
             return {
                 "text_documents": self.text_collection.count(),
@@ -286,4 +867,78 @@ class VectorStore:
             }
         except Exception as e:
             logger.error(f"Error getting collection info: {str(e)}")
-            return {"document_count": 0, "collections": [], "error": str(e)}
\ No newline at end of file
+            return {"document_count": 0, "collections": [], "error": str(e)}
+
+    def _get_unified_collection_info(self) -> Dict[str, Any]:
+        try:
+            counts = self._unified_type_counts()
+            return {
+                "text_documents": counts["text"],
+                "pricing_documents": counts["pricing"],
+                "structured_documents": counts["structured"],
+                "document_count": self.unified_collection.count(),
+                "collections": ["unified"],
+                "layout": "unified"
+            }
+        except Exception as e:
+            logger.error(f"Error getting collection info: {str(e)}")
+            return {"document_count": 0, "collections": [], "error": str(e)}
+
+    def document_count(self) -> int:
+        if self.layout == "unified":
+            return self.unified_collection.count()
+        return sum(collection.count() for collection in self._split_collections().values())
+
+    def _unified_type_counts(self) -> Dict[str, int]:
+        if self._unified_counts is None:
+            self._unified_counts = self._load_unified_counts()
+        return self._unified_counts
+
+    def _load_unified_counts(self) -> Dict[str, int]:
+        try:
+            with open(self.unified_counts_path) as f:
+                counts = json.load(f)
+            if sum(counts.values()) == self.unified_collection.count():
+                return {collection_type: counts.get(collection_type, 0) for collection_type in COLLECTION_TYPES}
+            logger.info("Unified collection counts are stale, recounting")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            logger.error(f"Error loading unified collection counts, recounting: {str(e)}")
+
+        # One scan per type, only when the counts file is missing or out of date
+        counts = {
+            collection_type: len(self.unified_collection.get(
+                where={"collection_type": collection_type},
+                include=[]
+            )["ids"])
+            for collection_type in COLLECTION_TYPES
+        }
+        self._save_unified_counts(counts)
+        return counts
+
+    def _new_unified_types(self, collection, doc_ids: List[str], metadatas: List[Dict[str, Any]]) -> List[str]:
+        """Collection types of the chunks an upsert into the unified collection is about to add."""
+        if collection is not self.unified_collection:
+            return []
+
+        # Loaded before the write, so a recount can't already include the new chunks
+        self._unified_type_counts()
+        existing = set(collection.get(ids=doc_ids, include=[])["ids"])
+        return [
+            metadata.get("collection_type", "text")
+            for doc_id, metadata in zip(doc_ids, metadatas) if doc_id not in existing
+        ]
+
+    def _adjust_unified_counts(self, collection_types: List[str], delta: int):
+        counts = self._unified_type_counts()
+        for collection_type in collection_types:
+            counts[collection_type] = max(counts.get(collection_type, 0) + delta, 0)
+        self._save_unified_counts(counts)
+
+    def _save_unified_counts(self, counts: Dict[str, int]):
+        try:
+            with open(self.unified_counts_path, "w") as f:
+                json.dump(counts, f)
+        except OSError as e:
+            logger.error(f"Error saving unified collection counts: {str(e)}")
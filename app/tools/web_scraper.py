@@ -1,14 +1,29 @@
 import aiofiles
 import httpx
 from bs4 import BeautifulSoup, Tag
+from collections import Counter
 from typing import List, Dict, Any, Optional
+from app.core.config import settings
+from app.tools.http_cache import HttpCache, CachedPage
+from app.utils.metrics import Histogram
+import importlib.util
 import logging
 import asyncio
+import random
 import re
+import time
 from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
 
+# Transient failures worth another attempt; anything else (404, invalid URL, TLS errors) fails at once
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+RETRYABLE_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+# httpx only decodes brotli when the brotli package is installed, so only advertise it then
+ACCEPT_ENCODING = "gzip, deflate, br" if importlib.util.find_spec("brotli") else "gzip, deflate"
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
 
 @dataclass
 class PricingInfo:
@@ -29,21 +44,89 @@ class DocumentChunk:
 
 
 class WebScraper:
-    def __init__(self):
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
         self.session = None
+        self.transport = transport
         self.pricing_patterns = [
             r'(\d+\.?\d*)\%',
             r'R\$\s*(\d+[,.]?\d*)',
             r'(\d+)x\s*(?:de\s*)?R\$\s*(\d+[,.]?\d*)',
         ]
 
+        self.max_concurrency = max(1, settings.SCRAPER_MAX_CONCURRENCY)
+        self.per_host_concurrency = max(1, settings.SCRAPER_PER_HOST_CONCURRENCY)
+        self.retries = max(0, settings.SCRAPER_RETRIES)
+        self.backoff_base_ms = settings.SCRAPER_BACKOFF_BASE_MS
+        self.backoff_max_ms = settings.SCRAPER_BACKOFF_MAX_MS
+        self.http2 = settings.SCRAPER_HTTP2 and HTTP2_AVAILABLE
+        if settings.SCRAPER_HTTP2 and not HTTP2_AVAILABLE:
+            logger.warning("SCRAPER_HTTP2 is set but the h2 package is missing, scraping over HTTP/1.1")
+
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+        self.http_cache_path = settings.SCRAPER_HTTP_CACHE_PATH or None
+        self.http_cache: Optional[HttpCache] = None
+        self.http_cache_totals: Dict[str, Any] = {}
+        self.staged_pages: Dict[str, CachedPage] = {}
+
+        self.pages = 0
+        self.failed_pages = 0
+        self.requests = 0
+        self.retried = 0
+        self.errors = Counter()
+        self.http_versions = Counter()
+        self.bytes_downloaded = 0
+        self.bytes_decoded = 0
+        self.request_ms = Histogram([50, 100, 250, 500, 1000, 2500, 5000, 10000])
+        self.duration_ms = 0.0
+        self.unchanged_pages = 0
+        self.conditional_requests = 0
+        self.not_modified = 0
+        self.cached_pages = 0
+
     async def __aenter__(self):
-        self.session = httpx.AsyncClient(timeout=30.0)
+        self.session = httpx.AsyncClient(
+            timeout=settings.SCRAPER_TIMEOUT_SECONDS,
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=settings.SCRAPER_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.SCRAPER_KEEPALIVE_EXPIRY_SECONDS
+            ),
+            headers={"Accept-Encoding": ACCEPT_ENCODING},
+            transport=self.transport
+        )
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._host_slots = {}
+        if self.http_cache_path and self.http_cache is None:
+            self.http_cache = HttpCache(self.http_cache_path)
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.session:
             await self.session.aclose()
+        if self.http_cache is not None:
+            self.http_cache_totals = self.http_cache.get_stats()
+            self.http_cache.close()
+            self.http_cache = None
+
+    async def commit_cached_pages(self):
+        """Stores the validators of the pages scraped so far. Call it only once they are indexed: a stored page
+        gets a 304 on the next incremental scrape and is skipped."""
+        if not self.http_cache_path or not self.staged_pages:
+            return
+        pages = list(self.staged_pages.values())
+        self.staged_pages = {}
+        await asyncio.get_running_loop().run_in_executor(None, self._store_pages, pages)
+        self.cached_pages += len(pages)
+
+    def _store_pages(self, pages: List[CachedPage]):
+        http_cache = self.http_cache or HttpCache(self.http_cache_path)
+        http_cache.set_many(pages)
+        if http_cache is not self.http_cache:
+            self.http_cache_totals = http_cache.get_stats()
+            http_cache.close()
 
     def extract_pricing_tables(self, soup: BeautifulSoup) -> List[PricingInfo]:
         pricing_data = []
@@ -233,12 +316,84 @@ class WebScraper:
 
         return "\n".join(formatted_lines)
 
-    async def scrape_url(self, url: str) -> Dict[str, Any]:
+    async def _fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """GETs `url` within the global and per-host limits, retrying transient failures with jittered backoff."""
+        host = httpx.URL(url).host
+        host_slots = self._host_slots.setdefault(host, asyncio.Semaphore(self.per_host_concurrency))
+
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            # Slots are held per attempt, so a request backing off does not block the host for others. The host
+            # slot comes first, so requests queued behind a busy host never sit on a global slot
+            async with host_slots, self._slots:
+                self.requests += 1
+                started = time.perf_counter()
+                try:
+                    response = await self.session.get(url, headers=headers)
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.retries:
+                        self.errors[type(e).__name__] += 1
+                        raise
+                    error = type(e).__name__
+                else:
+                    self.request_ms.observe((time.perf_counter() - started) * 1000)
+                    self.http_versions[response.http_version] += 1
+                    self.bytes_downloaded += response.num_bytes_downloaded
+                    self.bytes_decoded += len(response.content)
+
+                    if response.status_code not in RETRYABLE_STATUS_CODES or attempt == self.retries:
+                        if response.is_error:
+                            self.errors[str(response.status_code)] += 1
+                        return response
+                    error = str(response.status_code)
+                    retry_after = self._retry_after(response)
+
+            self.retried += 1
+            delay_ms = self._backoff_ms(attempt, retry_after)
+            logger.warning(f"Retrying {url} after {error} in {delay_ms:.0f} ms (retry {attempt + 1}/{self.retries})")
+            await asyncio.sleep(delay_ms / 1000)
+
+    def _backoff_ms(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return min(retry_after * 1000, self.backoff_max_ms)
+        # Full jitter keeps retries from many pages on one host from arriving in lockstep
+        return random.uniform(0, min(self.backoff_max_ms, self.backoff_base_ms * 2 ** attempt))
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
         try:
-            response = await self.session.get(url)
-            response.raise_for_status()
+            return max(0.0, float(response.headers.get("Retry-After", "")))
+        except ValueError:
+            return None
+
+    async def scrape_url(self, url: str, skip_unchanged: bool = False) -> Dict[str, Any]:
+        """Scrapes and chunks `url`, revalidating any cached copy with a conditional GET.
 
-            soup = BeautifulSoup(response.content, 'html.parser')
+        When the server answers 304, `skip_unchanged` returns `{"url", "not_modified": True}` without parsing,
+        for callers whose index already holds the page; otherwise the cached body is parsed.
+        """
+        try:
+            cached = None
+            if self.http_cache is not None:
+                cached = await asyncio.get_running_loop().run_in_executor(None, self.http_cache.get, url)
+            if cached is not None:
+                self.conditional_requests += 1
+
+            response = await self._fetch(url, cached.conditional_headers() if cached is not None else None)
+
+            downloaded = None
+            if response.status_code == 304 and cached is not None:
+                self.not_modified += 1
+                if skip_unchanged:
+                    self.unchanged_pages += 1
+                    return {"url": url, "not_modified": True}
+                body = cached.body
+            else:
+                response.raise_for_status()
+                body = response.content
+                downloaded = response
+
+            soup = BeautifulSoup(body, 'html.parser')
 
             for script in soup(["script", "style"]):
                 script.decompose()
@@ -268,20 +423,74 @@ class WebScraper:
                         "href": href
                     })
 
+            if downloaded is not None:
+                self._stage_page(url, downloaded)
+            self.pages += 1
             return content
 
         except Exception as e:
+            self.failed_pages += 1
             logger.error(f"Error scraping {url}: {str(e)}")
             return {"url": url, "error": str(e)}
 
-    async def scrape_multiple_urls(self, urls: List[str]) -> List[Dict[str, Any]]:
+    def _stage_page(self, url: str, response: httpx.Response):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        # Without a validator the page can never be revalidated, so there is nothing worth keeping
+        if not self.http_cache_path or not (etag or last_modified) or \
+                "no-store" in response.headers.get("Cache-Control", "").lower():
+            return
+        self.staged_pages[url] = CachedPage(url, etag, last_modified, response.content)
+
+    async def scrape_multiple_urls(self, urls: List[str], skip_unchanged: bool = False) -> List[Dict[str, Any]]:
+        """Returns the scraped pages. With `skip_unchanged`, pages the server reports as not modified are left out."""
+        started = time.perf_counter()
         async with self:
-            tasks = [self.scrape_url(url) for url in urls]
+            tasks = [self.scrape_url(url, skip_unchanged=skip_unchanged) for url in urls]
             results = await asyncio.gather(*tasks, return_exceptions=True)
 
             valid_results = []
             for result in results:
-                if isinstance(result, dict) and "error" not in result:
+                if isinstance(result, dict) and "error" not in result and not result.get("not_modified"):
                     valid_results.append(result)
 
-            return valid_results
\ No newline at end of file
+        self.duration_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Scraped {len(valid_results)} of {len(urls)} URLs in {self.duration_ms:.0f} ms "
+                    f"({self.unchanged_pages} unchanged, {self.requests} requests, {self.retried} retries)")
+        return valid_results
+
+    def get_stats(self) -> Dict[str, Any]:
+        seconds = self.duration_ms / 1000
+        return {
+            "pages": self.pages,
+            "failed_pages": self.failed_pages,
+            "requests": self.requests,
+            "retries": self.retried,
+            "errors": dict(self.errors),
+            "http_versions": dict(self.http_versions),
+            "bytes_downloaded": self.bytes_downloaded,
+            "bytes_decoded": self.bytes_decoded,
+            "compression_ratio": round(self.bytes_decoded / self.bytes_downloaded, 2) if self.bytes_downloaded else None,
+            "request_ms": self.request_ms.get_stats(),
+            "duration_ms": round(self.duration_ms, 1),
+            "pages_per_second": round((self.pages + self.unchanged_pages) / seconds, 2) if seconds else None,
+            "max_concurrency": self.max_concurrency,
+            "per_host_concurrency": self.per_host_concurrency,
+            "http_cache": self._get_http_cache_stats()
+        }
+
+    def _get_http_cache_stats(self) -> Dict[str, Any]:
+        if not self.http_cache_path:
+            return {"enabled": False}
+
+        attempted = self.pages + self.failed_pages + self.unchanged_pages
+        return {
+            "enabled": True,
+            "conditional_requests": self.conditional_requests,
+            "hits": self.not_modified,
+            "unchanged_pages": self.unchanged_pages,
+            "stored": self.cached_pages,
+            "staged": len(self.staged_pages),
+            "hit_rate": round(self.not_modified / attempted, 3) if attempted else 0.0,
+            **(self.http_cache.get_stats() if self.http_cache is not None else self.http_cache_totals)
+        }
\ No newline at end of file
@@ -0,0 +1,208 @@
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Set
+from app.tools.lexical_index import tokenize
+import logging
+import math
+import re
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;])\s+|\s*\n+\s*")
+RETRIEVED_HEADER = "\n=== RETRIEVED CONTENT ==="
+# Conservative for PT/EN prose, so the fallback counter overestimates rather than overflows the budget
+CHARS_PER_TOKEN = 3.0
+# A sentence is a duplicate when this share of its tokens already appears in one kept sentence
+DUPLICATE_OVERLAP = 0.8
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.error(f"Error loading tiktoken encoding for {model}, estimating tokens: {str(e)}")
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def token_budget(model: str, budgets: Dict[str, int]) -> int:
+    return budgets.get(model, budgets.get("default", 0))
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text.strip()) if sentence]
+
+
+@dataclass
+class BuiltContext:
+    text: str
+    budget: int
+    tokens_used: int
+    tokens_dropped: int
+    sources_used: int
+    sources_dropped: int
+    duplicate_sentences: int
+    tokenizer: str
+
+    def to_tool_output(self) -> Dict[str, Any]:
+        return {
+            "budget": self.budget,
+            "tokens_used": self.tokens_used,
+            "tokens_dropped": self.tokens_dropped,
+            "sources_used": self.sources_used,
+            "sources_dropped": self.sources_dropped,
+            "duplicate_sentences": self.duplicate_sentences,
+            "tokenizer": self.tokenizer
+        }
+
+
+@dataclass
+class _Candidate:
+    rank: int
+    result: Dict[str, Any]
+    relevance: float
+    sentences: List[str] = field(default_factory=list)
+    sentence_terms: List[Set[str]] = field(default_factory=list)
+    sentence_tokens: List[int] = field(default_factory=list)
+
+
+class ContextBuilder:
+    """Packs a pricing summary and retrieved chunks into a prompt section of at most `budget` tokens.
+
+    The pricing summary goes first, and chunk sentences it covers are dropped. The remaining chunks are packed
+    by relevance per token, with the last one that does not fit trimmed to its leading sentences. Sentences
+    covered by one already packed are skipped while packing, so a fact repeated in a chunk that gets trimmed
+    or dropped still makes it in. Chosen chunks are listed in retrieval order.
+    """
+
+    def __init__(self, model: str, budget: int):
+        self.model = model
+        self.budget = budget
+
+    def build(self, results: List[Dict[str, Any]], pricing_lines: Optional[List[str]] = None) -> BuiltContext:
+        parts = []
+        used = 0
+        dropped = 0
+        seen: List[Set[str]] = []
+
+        # Parts are counted with the separator that joins them, so the assembled text stays within the budget
+        for line in pricing_lines or []:
+            tokens = count_tokens(f"\n{line}", self.model)
+            if used + tokens > self.budget:
+                dropped += tokens
+                continue
+            parts.append(line)
+            used += tokens
+            seen.append(set(tokenize(line)))
+
+        candidates = []
+        duplicates = 0
+        for rank, result in enumerate(results):
+            candidate = _Candidate(rank, result, self._relevance(result))
+            for sentence in split_sentences(result.get("document", "")):
+                terms = set(tokenize(sentence))
+                tokens = count_tokens(f" {sentence}", self.model)
+                if not terms or self._is_duplicate(terms, seen):
+                    duplicates += 1
+                    dropped += tokens
+                    continue
+                candidate.sentences.append(sentence)
+                candidate.sentence_terms.append(terms)
+                candidate.sentence_tokens.append(tokens)
+            if candidate.sentences:
+                candidates.append(candidate)
+
+        if results:
+            used += count_tokens(f"\n{RETRIEVED_HEADER}", self.model)
+
+        chosen = {}
+        by_density = sorted(
+            candidates,
+            key=lambda c: (-c.relevance / (self._header_tokens(c) + sum(c.sentence_tokens)), c.rank)
+        )
+        for candidate in by_density:
+            if candidate.relevance <= 0:
+                dropped += sum(candidate.sentence_tokens)
+                continue
+
+            remaining = self.budget - used - self._header_tokens(candidate)
+            kept = []
+            kept_terms = []
+            for i, terms in enumerate(candidate.sentence_terms):
+                tokens = candidate.sentence_tokens[i]
+                if self._is_duplicate(terms, seen + kept_terms):
+                    duplicates += 1
+                    dropped += tokens
+                    continue
+                if tokens > remaining:
+                    dropped += sum(candidate.sentence_tokens[i:])
+                    break
+                remaining -= tokens
+                kept.append(candidate.sentences[i])
+                kept_terms.append(terms)
+
+            if not kept:
+                continue
+
+            chosen[candidate.rank] = kept
+            seen.extend(kept_terms)
+            used = self.budget - remaining
+
+        if results:
+            parts.append(RETRIEVED_HEADER)
+        for source, rank in enumerate(sorted(chosen)):
+            parts.append(self._format_source(source + 1, results[rank], chosen[rank]))
+
+        text = "\n".join(parts)
+        return BuiltContext(
+            text=text,
+            budget=self.budget,
+            tokens_used=count_tokens(text, self.model),
+            tokens_dropped=dropped,
+            sources_used=len(chosen),
+            sources_dropped=len(results) - len(chosen),
+            duplicate_sentences=duplicates,
+            tokenizer="tiktoken" if _encoding(self.model) is not None else "estimate"
+        )
+
+    @staticmethod
+    def _relevance(result: Dict[str, Any]) -> float:
+        # Cross-encoder scores are logits, so squash them onto the same 0..1 scale as cosine similarity
+        if result.get("rerank_score") is not None:
+            return 1 / (1 + math.exp(-result["rerank_score"]))
+        return max(result.get("similarity", 0.0), 0.0)
+
+    @staticmethod
+    def _is_duplicate(terms: Set[str], seen: List[Set[str]]) -> bool:
+        return any(len(terms & kept) >= DUPLICATE_OVERLAP * len(terms) for kept in seen)
+
+    def _header_tokens(self, candidate: _Candidate) -> int:
+        return count_tokens("\n" + self._format_source(candidate.rank + 1, candidate.result, []), self.model)
+
+    @staticmethod
+    def _format_source(number: int, result: Dict[str, Any], sentences: List[str]) -> str:
+        lines = [
+            f"\nSource {number} (Similarity: {result.get('similarity', 0.0):.2f}):",
+            f"URL: {result.get('metadata', {}).get('url', '')}",
+            "Content:" + "".join(f" {sentence}" for sentence in sentences)
+        ]
+        if result.get("chunk_type"):
+            lines.append(f"Content Type: {result['chunk_type']}")
+        return "\n".join(lines)
@@ -0,0 +1,109 @@
+from typing import List, Dict, Any
+from app.utils.keyword_router import RoutingDecision
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingRouter:
+    """Nearest-centroid / kNN routing over pre-computed, L2-normalised message embeddings."""
+
+    def __init__(self, vectors: np.ndarray, labels: List[str], mode: str = "centroid", k: int = 7,
+                 min_similarity: float = 0.35, temperature: float = 0.05):
+        if mode not in ("centroid", "knn"):
+            raise ValueError(f"Unknown embedding router mode: {mode}")
+
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.labels = np.asarray(labels)
+        self.mode = mode
+        self.k = k
+        self.min_similarity = min_similarity
+        self.temperature = temperature
+        self.classes = sorted(set(self.labels.tolist()))
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, labels: List[str], mode: str = "centroid", **kwargs) -> "EmbeddingRouter":
+        embeddings = _normalize(np.asarray(embeddings, dtype=np.float32))
+        labels = np.asarray(labels)
+
+        if mode == "knn":
+            return cls(embeddings, labels.tolist(), mode=mode, **kwargs)
+
+        classes = sorted(set(labels.tolist()))
+        centroids = np.stack([embeddings[labels == label].mean(axis=0) for label in classes])
+        return cls(_normalize(centroids), classes, mode=mode, **kwargs)
+
+    def classify(self, embedding: np.ndarray) -> RoutingDecision:
+        similarities = self.vectors @ np.asarray(embedding, dtype=np.float32)
+
+        if self.mode == "knn":
+            k = min(self.k, len(similarities))
+            neighbours = np.argpartition(-similarities, k - 1)[:k]
+            scores = {label: 0.0 for label in self.classes}
+            for idx in neighbours:
+                scores[self.labels[idx]] += float(np.exp(similarities[idx] / self.temperature))
+            best_similarity = float(similarities[neighbours].max())
+        else:
+            scores = {
+                label: float(np.exp(similarity / self.temperature))
+                for label, similarity in zip(self.labels, similarities)
+            }
+            best_similarity = float(similarities.max())
+
+        agent = max(scores, key=scores.get)
+        confidence = scores[agent] / sum(scores.values())
+
+        if best_similarity < self.min_similarity:
+            confidence = 0.0
+
+        return RoutingDecision(
+            agent=agent,
+            confidence=confidence,
+            reasoning=f"Embedding {self.mode} match (similarity {best_similarity:.2f})",
+            priority="high" if agent == "SUPPORT" else "medium",
+            query_type="account_issue" if agent == "SUPPORT" else "product_info"
+        )
+
+    def save(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        np.savez(
+            path,
+            vectors=self.vectors,
+            labels=self.labels.astype(str),
+            mode=np.array(self.mode),
+            k=np.array(self.k),
+            min_similarity=np.array(self.min_similarity),
+            temperature=np.array(self.temperature)
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "EmbeddingRouter":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["vectors"],
+                data["labels"].tolist(),
+                mode=str(data["mode"]),
+                k=int(data["k"]),
+                min_similarity=float(data["min_similarity"]),
+                temperature=float(data["temperature"])
+            )
+
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "vectors": int(self.vectors.shape[0]),
+            "dimensions": int(self.vectors.shape[1]),
+            "classes": self.classes
+        }
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
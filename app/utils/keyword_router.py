@@ -0,0 +1,112 @@
+from dataclasses import dataclass, field
+from typing import List, Dict, Any
+from app.utils.keywords import INFINITEPAY_KEYWORDS, SUPPORT_INTENT_PATTERNS, KNOWLEDGE_QUESTION_PATTERNS
+from app.tools.lexical_index import fold_accents
+import re
+
+
+@dataclass
+class RoutingDecision:
+    agent: str
+    confidence: float
+    reasoning: str
+    priority: str = "medium"
+    query_type: str = "general"
+    matched: List[str] = field(default_factory=list)
+
+    def to_metadata(self, routing_path: str) -> Dict[str, Any]:
+        return {
+            "agent": self.agent,
+            "reasoning": self.reasoning,
+            "priority": self.priority,
+            "context": {"user_intent": self.query_type, "query_type": self.query_type},
+            "confidence": round(self.confidence, 3),
+            "routing_path": routing_path,
+            "matched": self.matched
+        }
+
+
+class KeywordRouter:
+    """Scores a message against compiled keyword sets and support-intent patterns without calling the LLM.
+
+    Messages, keywords and patterns are all accent-folded, so Portuguese words match with or without accents.
+    """
+
+    def __init__(self):
+        self.keyword_patterns = {
+            category: re.compile("|".join(self._keyword_pattern(fold_accents(keyword)) for keyword in keywords),
+                                 re.IGNORECASE)
+            for category, keywords in INFINITEPAY_KEYWORDS.items()
+        }
+        self.support_patterns = [re.compile(fold_accents(pattern), re.IGNORECASE) for pattern in SUPPORT_INTENT_PATTERNS]
+        self.question_patterns = [re.compile(fold_accents(pattern), re.IGNORECASE)
+                                  for pattern in KNOWLEDGE_QUESTION_PATTERNS]
+
+    @staticmethod
+    def _keyword_pattern(keyword: str) -> str:
+        # Word boundaries only apply at word characters, so symbols like "%" still match right after "2,69"
+        pattern = re.escape(keyword)
+        if re.match(r"\w", keyword):
+            pattern = r"(?<!\w)" + pattern
+        if re.search(r"\w$", keyword):
+            pattern += r"(?:s|es)?(?!\w)"
+        return pattern
+
+    def classify(self, message: str) -> RoutingDecision:
+        message = fold_accents(message)
+        knowledge_matches = []
+        for category, pattern in self.keyword_patterns.items():
+            match = pattern.search(message)
+            if match:
+                knowledge_matches.append(f"{category}:{match.group(0).lower()}")
+
+        for pattern in self.question_patterns:
+            match = pattern.search(message)
+            if match:
+                knowledge_matches.append(f"question:{match.group(0).lower()}")
+                break
+
+        support_matches = []
+        for pattern in self.support_patterns:
+            match = pattern.search(message)
+            if match:
+                support_matches.append(f"support:{match.group(0).lower()}")
+
+        knowledge_score = len(knowledge_matches)
+        support_score = len(support_matches)
+
+        if not knowledge_score and not support_score:
+            return RoutingDecision(
+                agent="KNOWLEDGE",
+                confidence=0.0,
+                reasoning="No routing keywords matched"
+            )
+
+        if support_score and not knowledge_score:
+            confidence = 0.6 + 0.15 * support_score
+        elif knowledge_score and not support_score:
+            confidence = 0.55 + 0.15 * knowledge_score
+        else:
+            # Mixed signals ("why can't I receive PIX?") only clear the bar with a wide margin
+            confidence = 0.5 + 0.1 * abs(support_score - knowledge_score)
+
+        confidence = min(confidence, 0.95)
+
+        if support_score >= knowledge_score:
+            return RoutingDecision(
+                agent="SUPPORT",
+                confidence=confidence,
+                reasoning=f"Support intent matched: {', '.join(support_matches)}",
+                priority="high",
+                query_type="account_issue",
+                matched=support_matches + knowledge_matches
+            )
+
+        return RoutingDecision(
+            agent="KNOWLEDGE",
+            confidence=confidence,
+            reasoning=f"Product keywords matched: {', '.join(knowledge_matches)}",
+            priority="medium",
+            query_type="pricing" if any(m.startswith("pricing_terms") for m in knowledge_matches) else "product_info",
+            matched=knowledge_matches + support_matches
+        )
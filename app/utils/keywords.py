@@ -20,4 +20,33 @@ INFINITEPAY_KEYWORDS = {
         'fee', 'rate', 'cost', 'price', 'charge', '%', 'percent',
         'taxa', 'preço', 'valor', 'quanto custa', 'how much'
     ]
-}
\ No newline at end of file
+}
+
+SUPPORT_INTENT_PATTERNS = [
+    r"\b(can'?t|cannot|unable to|not able to)\b.*\b(sign in|log ?in|login|access|transfer|pay|receive|withdraw|use)s?\b",
+    r"\bn[aã]o (consigo|estou conseguindo|posso)\b",
+    r"\b(my|minha|meu) (account|conta|card|cart[aã]o|balance|saldo|transfer|transfer[eê]ncia|payment|pagamento)s?\b",
+    r"\b(blocked|locked|suspended|bloquead[ao]|suspens[ao])\b",
+    r"\b(forgot|reset|esqueci|redefinir)\b.*\b(password|senha|pin)\b",
+    r"\b(not working|doesn'?t work|n[aã]o funciona|parou de funcionar)\b",
+    r"\b(error|erro|failed|falhou|declined|recusad[ao])\b",
+    r"\b(refund|reembolso|estorno|charged twice|cobrado duas vezes)\b",
+    r"\b(where is|cad[eê]) (my|minha|meu)\b",
+]
+
+KNOWLEDGE_QUESTION_PATTERNS = [
+    r"\b(what is|what are|what's|o que [eé]|quais s[aã]o)\b",
+    # "how much" and "quanto custa" are pricing_terms keywords already; repeating them here counted them twice
+    r"\bquanto [eé]\b",
+    r"\b(how does|how do|como funciona)\b",
+    r"\b(difference|compare|diferen[cç]a|comparar)\b",
+]
+
+
+ROUTER_EXAMPLES = [
+    ("What are the fees for Maquininha Smart?", "KNOWLEDGE", "product pricing info"),
+    ("How can I use my phone as a card machine?", "KNOWLEDGE", "product features"),
+    ("I can't sign in to my account", "SUPPORT", "account access issue"),
+    ("Why can't I make transfers?", "SUPPORT", "account functionality issue"),
+    ("What is PIX?", "KNOWLEDGE", "product/service information"),
+]
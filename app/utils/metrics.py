@@ -0,0 +1,44 @@
+from typing import List, Dict, Any
+import bisect
+
+
+class Histogram:
+    """Fixed-bucket histogram; each observation is counted in exactly one bucket."""
+
+    def __init__(self, buckets: List[float]):
+        self.bounds = sorted(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of observations."""
+        if not self.count:
+            return 0.0
+
+        target = fraction * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return bound
+        return self.max
+
+    def get_stats(self) -> Dict[str, Any]:
+        buckets = {f"<={bound:g}": count for bound, count in zip(self.bounds, self.counts)}
+        buckets["+inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "max": self.max,
+            "buckets": buckets
+        }
@@ -72,6 +72,48 @@ class TestRouterAgent:
         assert response.metadata["agent"] == "KNOWLEDGE"
         assert response.metadata["reasoning"] == "Default routing due to parsing error"
 
+    @pytest.mark.asyncio
+    async def test_router_agent_fast_path_skips_llm(self, mock_llm_client):
+        router = RouterAgent(mock_llm_client)
+        response = await router.process("What is PIX?")
+
+        assert response.metadata["agent"] == "KNOWLEDGE"
+        assert response.metadata["routing_path"] == "keyword"
+        assert response.tool_calls[0].tool_name == "route_analysis"
+        mock_llm_client.generate_response_with_system_prompt.assert_not_called()
+        assert router.get_routing_stats()["paths"]["keyword"] == 1
+
+    @pytest.mark.asyncio
+    async def test_router_agent_low_confidence_uses_llm(self, mock_llm_client):
+        mock_llm_client.generate_response_with_system_prompt.return_value = '''
+        {"agent": "SUPPORT", "reasoning": "Payment issue", "priority": "high", "context": {}}
+        '''
+
+        router = RouterAgent(mock_llm_client)
+        response = await router.process("Why can't I receive PIX payments?")
+
+        assert response.metadata["routing_path"] == "llm"
+        mock_llm_client.generate_response_with_system_prompt.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_router_agent_uses_embedding_router_before_llm(self, mock_llm_client, tmp_path):
+        from app.utils.embedding_router import EmbeddingRouter
+        import numpy as np
+
+        index_path = str(tmp_path / "router_index.npz")
+        EmbeddingRouter.build(
+            np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32), ["KNOWLEDGE", "SUPPORT"]
+        ).save(index_path)
+
+        router = RouterAgent(mock_llm_client, embedder=AsyncMock(return_value=np.array([0.0, 1.0], dtype=np.float32)))
+        router.index_path = index_path
+
+        response = await router.process("Something odd happened with my last sale")
+
+        assert response.metadata["agent"] == "SUPPORT"
+        assert response.metadata["routing_path"] == "embedding"
+        mock_llm_client.generate_response_with_system_prompt.assert_not_called()
+
 
 class TestKnowledgeAgent:
     @pytest.mark.asyncio
@@ -102,6 +144,29 @@ class TestKnowledgeAgent:
         assert any(tc.tool_name == "enhanced_rag_retrieval" for tc in response.tool_calls)
         mock_vector_store.search_enhanced.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_knowledge_agent_uses_prefetched_retrieval(self, mock_llm_client, mock_vector_store):
+        mock_vector_store.search_enhanced = AsyncMock()
+        mock_vector_store.extract_pricing_insights.return_value = {
+            "has_pricing_data": False,
+            "payment_methods": [],
+            "rate_ranges": {},
+            "volume_tiers": [],
+            "specific_rates": []
+        }
+        mock_llm_client.generate_response_with_system_prompt.return_value = "PIX is an instant payment system."
+
+        knowledge_agent = KnowledgeAgent(mock_llm_client, mock_vector_store)
+        response = await knowledge_agent.process("What is PIX?", context={
+            "prefetched_retrieval": {
+                "search_type": "all",
+                "results": [{"document": "PIX is instant", "metadata": {"url": "https://infinitepay.io/pix"}, "similarity": 0.8}]
+            }
+        })
+
+        assert any(tc.tool_name == "enhanced_rag_retrieval" for tc in response.tool_calls)
+        mock_vector_store.search_enhanced.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_knowledge_agent_uses_web_search_for_general_query(self, mock_llm_client, mock_vector_store):
         mock_llm_client.generate_response_with_system_prompt.return_value = "Palmeiras last game was yesterday."
@@ -149,6 +214,24 @@ class TestSupportAgent:
                 assert any(tc.tool_name == "check_account_status" for tc in response.tool_calls)
                 assert response.metadata["customer_found"] is True
 
+    @pytest.mark.asyncio
+    async def test_support_agent_uses_prefetched_customer_info(self, mock_llm_client):
+        mock_llm_client.generate_response_with_system_prompt.return_value = "Your account looks fine."
+
+        support_agent = SupportAgent(mock_llm_client)
+        support_agent.tools["get_customer_info"] = AsyncMock()
+
+        response = await support_agent.process(
+            "Is my account ok?",
+            context={
+                "user_id": "client789",
+                "prefetched_customer_info": {"success": True, "data": {"name": "João Silva", "account_status": "active"}}
+            }
+        )
+
+        support_agent.tools["get_customer_info"].assert_not_called()
+        assert response.metadata["customer_found"] is True
+
 
 class TestPersonalityAgent:
     @pytest.mark.asyncio
@@ -169,4 +252,26 @@ class TestPersonalityAgent:
         assert response.agent_type == AgentType.PERSONALITY
         assert len(response.tool_calls) == 1
         assert response.tool_calls[0].tool_name == "personality_enhancement"
-        assert len(response.response) > len(context["source_response"])
\ No newline at end of file
+        assert len(response.response) > len(context["source_response"])
+
+    def test_personality_single_pass_response_keeps_source_answer(self, mock_llm_client):
+        personality_agent = PersonalityAgent(mock_llm_client)
+
+        response = personality_agent.build_single_pass_response("Happy to help! PIX is free.", "Knowledge")
+
+        assert response.response == "Happy to help! PIX is free."
+        assert response.tool_calls[0].tool_name == "personality_enhancement"
+        assert response.tool_calls[0].tool_output["mode"] == "single_pass"
+
+    @pytest.mark.asyncio
+    async def test_support_agent_single_pass_merges_personality_guidelines(self, mock_llm_client):
+        from app.agents.personality_agent import PERSONALITY_GUIDELINES
+
+        mock_llm_client.generate_response_with_system_prompt.return_value = "I'm sorry to hear that!"
+
+        support_agent = SupportAgent(mock_llm_client)
+        await support_agent.process("My card was declined", context={"personality_guidelines": PERSONALITY_GUIDELINES})
+
+        system_prompt = mock_llm_client.generate_response_with_system_prompt.call_args.args[0]
+        assert system_prompt.startswith(support_agent.system_prompt)
+        assert PERSONALITY_GUIDELINES in system_prompt
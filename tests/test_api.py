@@ -1,8 +1,9 @@
 import pytest
 import asyncio
+import json
 from httpx import AsyncClient
-from unittest.mock import patch, AsyncMock
-from app.main import app
+from unittest.mock import patch, AsyncMock, Mock
+from app.main import app, orchestrator
 
 
 @pytest.mark.asyncio
@@ -68,4 +69,116 @@ async def test_chat_endpoint_support_query():
         assert response.status_code == 200
         data = response.json()
         assert "response" in data
-        assert "I understand your concern" in data["response"]
\ No newline at end of file
+        assert "I understand your concern" in data["response"]
+
+@pytest.mark.asyncio
+async def test_chat_stream_endpoint_emits_events():
+    async def fake_stream(message, user_id):
+        yield {"event": "routing", "data": {"agent_name": "Router", "tool_calls": {}}}
+        yield {"event": "token", "data": {"token": "Hello"}}
+        yield {"event": "complete", "data": {
+            "response": "Hello",
+            "source_agent_response": "Hi",
+            "agent_workflow": []
+        }}
+
+    with patch('app.main.orchestrator') as mock_orchestrator:
+        mock_orchestrator.is_initialized = True
+        mock_orchestrator.process_message_stream = fake_stream
+
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.post(
+                "/api/v1/chat/stream",
+                json={"message": "What is PIX?", "user_id": "client789"}
+            )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line for line in response.text.split("\n") if line.startswith("event: ")]
+    assert events == ["event: routing", "event: token", "event: complete"]
+
+
+
+@pytest.mark.asyncio
+async def test_speculative_routing_keeps_selected_branch():
+    retrieval = {"search_type": "all", "results": []}
+
+    async def slow_customer_lookup(user_id):
+        await asyncio.sleep(1)
+        return {"success": True}
+
+    with patch.object(orchestrator, "speculative_execution", True), \
+            patch.object(orchestrator, "speculative_cancel_policy", "cancel"), \
+            patch.object(orchestrator.router_agent, "process",
+                         AsyncMock(return_value=Mock(metadata={"agent": "KNOWLEDGE"}))), \
+            patch.object(orchestrator.knowledge_agent, "retrieve", AsyncMock(return_value=retrieval)), \
+            patch.object(orchestrator.support_agent, "prefetch_customer_info", slow_customer_lookup):
+        cancelled_before = orchestrator.speculation_stats["cancelled"]
+
+        routing_response, prefetched = await orchestrator._route("What is PIX?", "client789")
+
+    assert prefetched == {"prefetched_retrieval": retrieval}
+    assert orchestrator.speculation_stats["cancelled"] == cancelled_before + 1
+
+
+
+@pytest.mark.asyncio
+async def test_chat_endpoint_passes_response_mode():
+    with patch('app.main.orchestrator') as mock_orchestrator:
+        mock_orchestrator.is_initialized = True
+        mock_orchestrator.process_message = AsyncMock(return_value={
+            "response": "Happy to help! PIX is free for individuals.",
+            "source_agent_response": "Happy to help! PIX is free for individuals.",
+            "agent_workflow": []
+        })
+
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.post(
+                "/api/v1/chat?mode=single_pass",
+                json={"message": "What is PIX?", "user_id": "client789"}
+            )
+            invalid = await ac.post(
+                "/api/v1/chat?mode=three_pass",
+                json={"message": "What is PIX?", "user_id": "client789"}
+            )
+
+    assert response.status_code == 200
+    assert mock_orchestrator.process_message.call_args.kwargs["response_mode"] == "single_pass"
+    assert invalid.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_chat_batch_endpoint_streams_ndjson():
+    with patch('app.main.orchestrator') as mock_orchestrator:
+        mock_orchestrator.is_initialized = True
+        mock_orchestrator.knowledge_agent.retrieve = AsyncMock(return_value={"search_type": "product", "results": []})
+        mock_orchestrator.process_message = AsyncMock(return_value={
+            "response": "PIX is free for individuals.",
+            "source_agent_response": "PIX is free for individuals.",
+            "agent_workflow": []
+        })
+
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.post(
+                "/api/v1/chat/batch?concurrency=2",
+                json=[
+                    {"message": "What is PIX?", "user_id": "client789"},
+                    {"message": "What is PIX?", "user_id": "client790"},
+                    {"user_id": "client791"}
+                ]
+            )
+            ndjson = await ac.post(
+                "/api/v1/chat/batch",
+                content=b'{"message": "What is PIX?", "user_id": "client789"}\n',
+                headers={"Content-Type": "application/x-ndjson"}
+            )
+            invalid = await ac.post("/api/v1/chat/batch", json={"message": "What is PIX?"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda r: r["index"])
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[0]["response"]["response"] == "PIX is free for individuals."
+    assert "error" in results[2]
+    assert len(ndjson.text.splitlines()) == 1
+    assert invalid.status_code == 400
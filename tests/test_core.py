@@ -0,0 +1,421 @@
+import pytest
+import asyncio
+from unittest.mock import Mock, AsyncMock, patch
+from app.core.cache import ResponseCache
+from app.core.llm_client import LLMClient
+from app.core.context import request_scope, get_request_context
+from app.core.communication import AgentCommunicationHub
+from app.core.semantic_cache import SemanticCache
+from app.core.singleflight import SingleFlight
+from app.core.batch import BatchProcessor, iter_json_array, iter_ndjson
+import numpy as np
+
+
+@pytest.fixture
+def llm_client():
+    with patch("app.core.llm_client.openai.AsyncOpenAI") as mock_openai:
+        client = LLMClient(cache=ResponseCache(max_entries=10, ttl_seconds=60))
+        client.client = mock_openai.return_value
+        yield client
+
+
+def _completion(content: str):
+    response = Mock()
+    response.choices = [Mock(message=Mock(content=content))]
+    return response
+
+
+class TestResponseCache:
+    def test_lru_eviction(self):
+        cache = ResponseCache(max_entries=2, ttl_seconds=60)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+
+        assert cache.get("a") == "1"
+        assert cache.get("b") is None
+        assert cache.get("c") == "3"
+
+    def test_ttl_expiry(self):
+        cache = ResponseCache(max_entries=10, ttl_seconds=1)
+        cache.set("a", "1")
+        cache._entries["a"] = (0.0, "1")
+
+        assert cache.get("a") is None
+        assert cache.get_stats()["misses"] == 1
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        path = str(tmp_path / "llm_cache.sqlite")
+        ResponseCache(max_entries=10, ttl_seconds=60, disk_path=path).set("a", "1")
+
+        cache = ResponseCache(max_entries=10, ttl_seconds=60, disk_path=path)
+
+        assert cache.get("a") == "1"
+        assert cache.get_stats()["disk_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_async_disk_tier_writes_behind_and_reads_off_loop(self, tmp_path):
+        path = str(tmp_path / "llm_cache.sqlite")
+        writer = ResponseCache(max_entries=10, ttl_seconds=60, disk_path=path)
+        await writer.aset("a", "1")
+
+        assert await writer.aget("a") == "1"
+        writer.close()
+
+        cache = ResponseCache(max_entries=10, ttl_seconds=60, disk_path=path)
+
+        assert await cache.aget("a") == "1"
+        assert await cache.aget("b") is None
+        assert cache.get_stats()["disk_hits"] == 1
+        assert cache.get_stats()["misses"] == 1
+
+    def test_key_depends_on_all_parameters(self):
+        messages = [{"role": "user", "content": "What is PIX?"}]
+
+        base = ResponseCache.make_key("gpt-3.5-turbo", messages, 0.1, None)
+
+        assert base == ResponseCache.make_key("gpt-3.5-turbo", messages, 0.1, None)
+        assert base != ResponseCache.make_key("gpt-4", messages, 0.1, None)
+        assert base != ResponseCache.make_key("gpt-3.5-turbo", messages, 0.8, None)
+        assert base != ResponseCache.make_key("gpt-3.5-turbo", messages, 0.1, 100)
+
+
+class TestLLMClientCache:
+    @pytest.mark.asyncio
+    async def test_repeat_call_served_from_cache(self, llm_client):
+        llm_client.client.chat.completions.create = AsyncMock(return_value=_completion("PIX is instant"))
+
+        first = await llm_client.generate_response_with_system_prompt("system", "What is PIX?")
+        second = await llm_client.generate_response_with_system_prompt("system", "What is PIX?")
+
+        assert first == second == "PIX is instant"
+        assert llm_client.client.chat.completions.create.call_count == 1
+        assert llm_client.get_cache_stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_opt_out_bypasses_cache(self, llm_client):
+        llm_client.client.chat.completions.create = AsyncMock(return_value=_completion("ok"))
+
+        await llm_client.generate_response_with_system_prompt("system", "hi", use_cache=False)
+        await llm_client.generate_response_with_system_prompt("system", "hi", use_cache=False)
+
+        assert llm_client.client.chat.completions.create.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_stream_populates_cache(self, llm_client):
+        async def fake_stream():
+            for token in ["PIX ", "is ", "instant"]:
+                yield Mock(choices=[Mock(delta=Mock(content=token))])
+
+        llm_client.client.chat.completions.create = AsyncMock(return_value=fake_stream())
+
+        streamed = [t async for t in llm_client.stream_response_with_system_prompt("system", "What is PIX?")]
+        cached = await llm_client.generate_response_with_system_prompt("system", "What is PIX?")
+
+        assert streamed == ["PIX ", "is ", "instant"]
+        assert cached == "PIX is instant"
+        assert llm_client.client.chat.completions.create.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_usage_tracked_per_context(self, llm_client):
+        completion = _completion("ok")
+        completion.usage = Mock(prompt_tokens=120, completion_tokens=30, total_tokens=150)
+        llm_client.client.chat.completions.create = AsyncMock(return_value=completion)
+
+        with request_scope("client789") as request_context:
+            await llm_client.generate_response_with_system_prompt("system", "hi", use_cache=False)
+            await llm_client.generate_response_with_system_prompt("system", "hello", use_cache=False)
+
+        assert request_context.llm_usage == {
+            "calls": 2, "shared_calls": 0, "prompt_tokens": 240, "completion_tokens": 60, "total_tokens": 300
+        }
+
+
+def _unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class TestSemanticCache:
+    def test_hit_above_threshold(self):
+        cache = SemanticCache(similarity_threshold=0.9)
+        cache.store(_unit(1, 0, 0), {"response": "PIX is instant"}, "KNOWLEDGE", "a", index_version=1)
+
+        hit = cache.lookup(_unit(1, 0.1, 0), "b", index_version=1)
+        miss = cache.lookup(_unit(0, 1, 0), "b", index_version=1)
+
+        assert hit[0] == {"response": "PIX is instant"}
+        assert miss is None
+        assert cache.get_stats()["hits"] == 1
+        assert cache.get_stats()["misses"] == 1
+
+    def test_support_answers_scoped_to_user(self):
+        cache = SemanticCache(similarity_threshold=0.9)
+        cache.store(_unit(1, 0, 0), {"response": "Your account is blocked"}, "SUPPORT", "client789", index_version=1)
+
+        assert cache.lookup(_unit(1, 0, 0), "other_user", index_version=1) is None
+        assert cache.lookup(_unit(1, 0, 0), "client789", index_version=1) is not None
+
+    def test_support_answers_expire(self):
+        cache = SemanticCache(similarity_threshold=0.9, user_scoped_ttl_seconds=60)
+        uncached = SemanticCache(similarity_threshold=0.9, user_scoped_ttl_seconds=0)
+        with patch("app.core.semantic_cache.time.monotonic", return_value=1000.0):
+            cache.store(_unit(1, 0, 0), {"response": "Your account is blocked"}, "SUPPORT", "client789", index_version=1)
+            cache.store(_unit(0, 1, 0), {"response": "PIX is instant"}, "KNOWLEDGE", "client789", index_version=1)
+            uncached.store(_unit(1, 0, 0), {"response": "Your account is blocked"}, "SUPPORT", "client789", index_version=1)
+        with patch("app.core.semantic_cache.time.monotonic", return_value=1061.0):
+            expired = cache.lookup(_unit(1, 0, 0), "client789", index_version=1)
+            knowledge = cache.lookup(_unit(0, 1, 0), "client789", index_version=1)
+
+        assert expired is None
+        assert knowledge is not None
+        assert cache.get_stats()["expirations"] == 1
+        assert cache.get_stats()["entries"] == 1
+        assert uncached.get_stats()["entries"] == 0
+
+    def test_index_version_change_drops_entries(self):
+        cache = SemanticCache(similarity_threshold=0.9)
+        cache.store(_unit(1, 0, 0), {"response": "old"}, "KNOWLEDGE", "a", index_version=1)
+
+        assert cache.lookup(_unit(1, 0, 0), "a", index_version=2) is None
+        assert cache.get_stats()["entries"] == 0
+        assert cache.get_stats()["invalidations"] == 1
+
+    def test_lru_bound_on_entries(self):
+        cache = SemanticCache(similarity_threshold=0.9, max_entries=2)
+        cache.store(_unit(1, 0, 0), {"response": "x"}, "KNOWLEDGE", "a", index_version=1)
+        cache.store(_unit(0, 1, 0), {"response": "y"}, "KNOWLEDGE", "a", index_version=1)
+        cache.lookup(_unit(1, 0, 0), "a", index_version=1)
+        cache.store(_unit(0, 0, 1), {"response": "z"}, "KNOWLEDGE", "a", index_version=1)
+
+        assert cache.lookup(_unit(1, 0, 0), "a", index_version=1) is not None
+        assert cache.lookup(_unit(0, 1, 0), "a", index_version=1) is None
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_response_mode_must_match(self):
+        cache = SemanticCache(similarity_threshold=0.9)
+        cache.store(_unit(1, 0, 0), {"response": "rewritten"}, "KNOWLEDGE", "a", index_version=1,
+                    response_mode="two_pass")
+
+        assert cache.lookup(_unit(1, 0, 0), "a", index_version=1, response_mode="single_pass") is None
+        assert cache.lookup(_unit(1, 0, 0), "a", index_version=1, response_mode="two_pass") is not None
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight("test")
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*[flight.do("key", work) for _ in range(5)])
+
+        assert results == ["result"] * 5
+        assert calls == 1
+        assert flight.get_stats() == {"calls": 5, "deduplicated": 4, "cancelled": 0, "in_flight": 0}
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate_to_all_waiters(self):
+        flight = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(flight.do("key", work), flight.do("key", work), return_exceptions=True)
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_cancel_others(self):
+        flight = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "done"
+
+    @pytest.mark.asyncio
+    async def test_last_waiter_leaving_cancels_shared_task(self):
+        flight = SingleFlight("test")
+        finished = False
+
+        async def work():
+            nonlocal finished
+            await asyncio.sleep(0.02)
+            finished = True
+
+        waiter = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0.05)
+
+        assert not finished
+        assert flight.get_stats()["cancelled"] == 1
+        assert flight.get_stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_llm_client_coalesces_identical_requests(self, llm_client):
+        async def slow_completion(**kwargs):
+            await asyncio.sleep(0.01)
+            return _completion("PIX is instant")
+
+        llm_client.client.chat.completions.create = AsyncMock(side_effect=slow_completion)
+
+        results = await asyncio.gather(*[
+            llm_client.generate_response_with_system_prompt("system", "What is PIX?", use_cache=False)
+            for _ in range(3)
+        ])
+
+        assert results == ["PIX is instant"] * 3
+        assert llm_client.client.chat.completions.create.call_count == 1
+        assert llm_client.get_singleflight_stats()["deduplicated"] == 2
+
+    @pytest.mark.asyncio
+    async def test_coalesced_requests_each_record_shared_usage(self, llm_client):
+        async def slow_completion(**kwargs):
+            await asyncio.sleep(0.01)
+            completion = _completion("PIX is instant")
+            completion.usage = Mock(prompt_tokens=100, completion_tokens=20, total_tokens=120)
+            return completion
+
+        llm_client.client.chat.completions.create = AsyncMock(side_effect=slow_completion)
+
+        async def handle(user_id: str):
+            with request_scope(user_id) as request_context:
+                await llm_client.generate_response_with_system_prompt("system", "What is PIX?", use_cache=False)
+                return request_context.llm_usage
+
+        usages = await asyncio.gather(*[handle(f"client{i}") for i in range(3)])
+
+        assert llm_client.client.chat.completions.create.call_count == 1
+        assert all(usage["calls"] == 1 and usage["total_tokens"] == 120 for usage in usages)
+        assert sorted(usage["shared_calls"] for usage in usages) == [0, 1, 1]
+
+
+class TestRequestContext:
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_keep_separate_workflows(self):
+        hub = AgentCommunicationHub()
+
+        class EchoAgent:
+            async def process(self, message, context=None):
+                await asyncio.sleep(0.01)
+                return Mock(tool_calls=[Mock(tool_name="echo", tool_output=message)])
+
+        hub.register_agent("echo", EchoAgent())
+
+        async def handle(user_id: str):
+            with request_scope(user_id):
+                await hub.send_message("router", "echo", f"hello from {user_id}")
+                await hub.send_message("router", "echo", f"bye from {user_id}")
+                return hub.get_workflow_log(), get_request_context().message_history
+
+        (log_a, history_a), (log_b, history_b) = await asyncio.gather(handle("a"), handle("b"))
+
+        assert [step["tool_calls"]["echo"] for step in log_a] == ["hello from a", "bye from a"]
+        assert [step["tool_calls"]["echo"] for step in log_b] == ["hello from b", "bye from b"]
+        assert len(history_a) == len(history_b) == 2
+
+    def test_hub_holds_no_request_state_outside_a_scope(self):
+        hub = AgentCommunicationHub()
+
+        assert hub.get_workflow_log() == []
+        assert get_request_context() is None
+
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class TestBatchProcessor:
+    def _orchestrator(self, delays):
+        orchestrator = Mock()
+        orchestrator.knowledge_agent.retrieve = AsyncMock(return_value={"search_type": "product", "results": []})
+
+        async def process_message(message, user_id, response_mode=None, shared_retrieval=None):
+            await shared_retrieval()
+            await asyncio.sleep(delays.get(message, 0))
+            return {"response": f"answer to {message}"}
+
+        orchestrator.process_message = process_message
+        return orchestrator
+
+    @pytest.mark.asyncio
+    async def test_results_stream_in_completion_order_with_index(self):
+        orchestrator = self._orchestrator({"slow": 0.05, "fast": 0})
+        processor = BatchProcessor(orchestrator, concurrency=2)
+        items = iter_json_array([{"message": "slow", "user_id": "u1"}, {"message": "fast", "user_id": "u2"}])
+
+        results = [result async for result in processor.run(items)]
+
+        assert [result["index"] for result in results] == [1, 0]
+        assert results[1]["response"] == {"response": "answer to slow"}
+
+    @pytest.mark.asyncio
+    async def test_concurrency_limit_is_respected(self):
+        running = 0
+        peak = 0
+
+        async def process_message(message, user_id, response_mode=None, shared_retrieval=None):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {"response": message}
+
+        orchestrator = Mock()
+        orchestrator.process_message = process_message
+        processor = BatchProcessor(orchestrator, concurrency=3)
+        items = iter_json_array([{"message": f"q{i}", "user_id": "u"} for i in range(10)])
+
+        results = [result async for result in processor.run(items)]
+
+        assert len(results) == 10
+        assert peak == 3
+
+    @pytest.mark.asyncio
+    async def test_duplicates_share_one_retrieval(self):
+        orchestrator = self._orchestrator({})
+        processor = BatchProcessor(orchestrator, concurrency=4)
+        items = iter_json_array([
+            {"message": "What is PIX?", "user_id": "u1"},
+            {"message": "what is  pix?", "user_id": "u2"},
+            {"message": "Card fees", "user_id": "u3"}
+        ])
+
+        results = [result async for result in processor.run(items)]
+
+        assert len(results) == 3
+        assert orchestrator.knowledge_agent.retrieve.await_count == 2
+        assert processor.get_stats()["shared_retrievals"] == 1
+
+    @pytest.mark.asyncio
+    async def test_ndjson_lines_split_across_chunks_and_invalid_entries(self):
+        orchestrator = self._orchestrator({})
+        processor = BatchProcessor(orchestrator, concurrency=1)
+        items = iter_ndjson(_chunks(
+            b'{"message": "What is PIX?", "us', b'er_id": "u1"}\n\nnot json\n',
+            b'{"message": "no user"}'
+        ))
+
+        results = {result["index"]: result async for result in processor.run(items)}
+
+        assert results[0]["response"] == {"response": "answer to What is PIX?"}
+        assert results[1]["error"].startswith("Invalid JSON")
+        assert results[2]["error"] == "Field 'user_id' is required"
+        assert processor.get_stats()["invalid"] == 2
@@ -1,13 +1,31 @@
 import pytest
+import pytest_asyncio
 import asyncio
 from unittest.mock import Mock, AsyncMock, patch
 import httpx
-from app.tools.web_scraper import WebScraper
-from app.tools.vector_store import VectorStore
+from app.tools.web_scraper import WebScraper, DocumentChunk, PricingInfo
+from app.tools.http_cache import HttpCache
+from app.tools.vector_store import VectorStore, make_chunk_id
+from app.tools.vector_backends.numpy_backend import NumpyCollection
 from app.tools.customer_tools import CustomerDataTool, TransactionTool
+from app.tools.embedding_service import EmbeddingService
+from app.tools.embedding_cache import QueryEmbeddingCache, ChunkEmbeddingCache
+from app.tools.lexical_index import BM25Index, tokenize
+from app.tools.reranker import CrossEncoderReranker
+from app.core.config import settings
+import numpy as np
+import threading
+from collections import Counter
+import time
 
 
 class TestWebScraper:
+    @pytest.fixture(autouse=True)
+    def http_cache_path(self, tmp_path):
+        path = str(tmp_path / "http_cache.sqlite")
+        with patch.object(settings, "SCRAPER_HTTP_CACHE_PATH", path):
+            yield path
+
     @pytest.mark.asyncio
     async def test_scrape_url_success(self):
         scraper = WebScraper()
@@ -20,6 +38,145 @@ class TestWebScraper:
 
         assert isinstance(result["error"], str)
 
+    @pytest.mark.asyncio
+    async def test_retries_transient_errors_then_succeeds(self):
+        attempts = []
+
+        def handler(request):
+            attempts.append(request.headers["Accept-Encoding"])
+            if len(attempts) == 1:
+                return httpx.Response(503, headers={"Retry-After": "0"})
+            if len(attempts) == 2:
+                raise httpx.ConnectError("connection reset", request=request)
+            return httpx.Response(200, html="<html><title>Pix</title><p>PIX transfers are free</p></html>")
+
+        with patch.object(settings, "SCRAPER_BACKOFF_BASE_MS", 0):
+            scraper = WebScraper(transport=httpx.MockTransport(handler))
+        documents = await scraper.scrape_multiple_urls(["https://www.infinitepay.io/pix"])
+        stats = scraper.get_stats()
+
+        assert [d["title"] for d in documents] == ["Pix"]
+        assert "gzip" in attempts[0]
+        assert stats["requests"] == 3
+        assert stats["retries"] == 2
+        assert stats["pages"] == 1
+        assert stats["errors"] == {}
+
+    @pytest.mark.asyncio
+    async def test_client_errors_fail_without_retrying(self):
+        scraper = WebScraper(transport=httpx.MockTransport(lambda request: httpx.Response(404)))
+
+        documents = await scraper.scrape_multiple_urls(["https://www.infinitepay.io/missing"])
+
+        assert documents == []
+        assert scraper.get_stats()["requests"] == 1
+        assert scraper.get_stats()["errors"] == {"404": 1}
+        assert scraper.get_stats()["failed_pages"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded_globally_and_per_host(self):
+        in_flight = Counter()
+        peaks = Counter()
+        completed_before_first_start = {}
+
+        async def handler(request):
+            completed_before_first_start.setdefault(request.url.host, in_flight["completed"])
+            in_flight[request.url.host] += 1
+            in_flight["total"] += 1
+            peaks[request.url.host] = max(peaks[request.url.host], in_flight[request.url.host])
+            peaks["total"] = max(peaks["total"], in_flight["total"])
+            await asyncio.sleep(0.01)
+            in_flight[request.url.host] -= 1
+            in_flight["total"] -= 1
+            in_flight["completed"] += 1
+            return httpx.Response(200, html="<html><p>ok</p></html>")
+
+        urls = [f"https://www.infinitepay.io/page-{i}" for i in range(8)] + \
+               [f"https://ajuda.infinitepay.io/page-{i}" for i in range(4)]
+        with patch.object(settings, "SCRAPER_MAX_CONCURRENCY", 3), \
+                patch.object(settings, "SCRAPER_PER_HOST_CONCURRENCY", 2):
+            scraper = WebScraper(transport=httpx.MockTransport(handler))
+        documents = await scraper.scrape_multiple_urls(urls)
+
+        assert len(documents) == 12
+        assert peaks["total"] == 3
+        assert peaks["www.infinitepay.io"] == 2
+        assert peaks["ajuda.infinitepay.io"] <= 2
+        # Requests queued behind the busy host must not hold the global slot the second host needs
+        assert completed_before_first_start["ajuda.infinitepay.io"] == 0
+
+    @pytest.mark.asyncio
+    async def test_conditional_get_skips_unchanged_pages(self):
+        conditional_headers = []
+
+        def handler(request):
+            conditional_headers.append((request.headers.get("If-None-Match"), request.headers.get("If-Modified-Since")))
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, html="<html><title>Pix</title><p>PIX transfers are free</p></html>",
+                                  headers={"ETag": '"v1"', "Last-Modified": "Tue, 06 Oct 2026 10:00:00 GMT"})
+
+        url = "https://www.infinitepay.io/pix"
+        first = WebScraper(transport=httpx.MockTransport(handler))
+        await first.scrape_multiple_urls([url])
+        await first.commit_cached_pages()
+        unchanged = WebScraper(transport=httpx.MockTransport(handler))
+        skipped = await unchanged.scrape_multiple_urls([url], skip_unchanged=True)
+        from_cache = await WebScraper(transport=httpx.MockTransport(handler)).scrape_multiple_urls([url])
+        stats = unchanged.get_stats()["http_cache"]
+
+        assert conditional_headers[0] == (None, None)
+        assert conditional_headers[1] == ('"v1"', "Tue, 06 Oct 2026 10:00:00 GMT")
+        assert first.get_stats()["http_cache"]["stored"] == 1
+        assert skipped == []
+        assert stats["hits"] == 1
+        assert stats["unchanged_pages"] == 1
+        assert stats["entries"] == 1
+        assert [d["title"] for d in from_cache] == ["Pix"]
+
+    @pytest.mark.asyncio
+    async def test_pages_are_only_cached_once_committed(self):
+        def handler(request):
+            if request.headers.get("If-None-Match"):
+                return httpx.Response(304)
+            return httpx.Response(200, html="<html><p>PIX</p></html>", headers={"ETag": '"v1"'})
+
+        url = "https://www.infinitepay.io/pix"
+        interrupted = WebScraper(transport=httpx.MockTransport(handler))
+        await interrupted.scrape_multiple_urls([url])
+        scraper = WebScraper(transport=httpx.MockTransport(handler))
+        documents = await scraper.scrape_multiple_urls([url], skip_unchanged=True)
+        staged = scraper.get_stats()["http_cache"]["staged"]
+        await scraper.commit_cached_pages()
+        skipped = await WebScraper(transport=httpx.MockTransport(handler)).scrape_multiple_urls([url], skip_unchanged=True)
+
+        assert [d["url"] for d in documents] == [url]
+        assert staged == 1
+        assert scraper.get_stats()["http_cache"]["entries"] == 1
+        assert skipped == []
+
+
+    @pytest.mark.asyncio
+    async def test_commit_writes_pages_in_one_batch_off_the_event_loop(self):
+        def handler(request):
+            return httpx.Response(200, html=f"<html><p>{request.url.path}</p></html>", headers={"ETag": '"v1"'})
+
+        urls = ["https://www.infinitepay.io/pix", "https://www.infinitepay.io/link"]
+        scraper = WebScraper(transport=httpx.MockTransport(handler))
+        await scraper.scrape_multiple_urls(urls)
+        batches = []
+        set_many = HttpCache.set_many
+
+        def recording_set_many(cache, pages):
+            batches.append((sorted(page.url for page in pages), threading.current_thread()))
+            set_many(cache, pages)
+
+        with patch.object(HttpCache, "set_many", recording_set_many):
+            await scraper.commit_cached_pages()
+
+        assert [urls for urls, _ in batches] == [sorted(urls)]
+        assert batches[0][1] is not threading.current_thread()
+        assert scraper.get_stats()["http_cache"]["entries"] == 2
 
 class TestCustomerDataTool:
     @pytest.mark.asyncio
@@ -46,4 +203,590 @@ class TestCustomerDataTool:
 
         assert result["success"] is True
         assert result["account_status"] == "active"
-        assert isinstance(result["issues"], list)
\ No newline at end of file
+        assert isinstance(result["issues"], list)
+
+
+class TestEmbeddingService:
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_are_micro_batched_off_loop(self):
+        calls = []
+
+        def encode(texts):
+            calls.append((list(texts), threading.current_thread().name))
+            return np.array([[len(text), 1.0] for text in texts])
+
+        service = EmbeddingService(encode, max_batch_size=8, max_wait_ms=20)
+        try:
+            embeddings = await asyncio.gather(*(service.embed("q" * i) for i in range(1, 6)))
+        finally:
+            await service.aclose()
+
+        assert [embedding[0] for embedding in embeddings] == [1.0, 2.0, 3.0, 4.0, 5.0]
+        assert embeddings[0].dtype == np.float32
+        assert len(calls) == 1
+        assert calls[0][1].startswith("embedding")
+        assert service.get_stats()["batch_size"]["count"] == 1
+        assert service.get_stats()["queue_wait_ms"]["count"] == 5
+
+    @pytest.mark.asyncio
+    async def test_batch_size_is_capped(self):
+        service = EmbeddingService(lambda texts: np.ones((len(texts), 2)), max_batch_size=2, max_wait_ms=20)
+        try:
+            await asyncio.gather(*(service.embed(f"q{i}") for i in range(5)))
+        finally:
+            await service.aclose()
+
+        assert service.get_stats()["batch_size"]["max"] == 2
+        assert service.get_stats()["batch_size"]["count"] == 3
+
+    @pytest.mark.asyncio
+    async def test_encode_errors_reach_every_waiter(self):
+        def encode(texts):
+            raise RuntimeError("model unavailable")
+
+        service = EmbeddingService(encode, max_wait_ms=10)
+        try:
+            results = await asyncio.gather(service.embed("a"), service.embed("b"), return_exceptions=True)
+        finally:
+            await service.aclose()
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_close_fails_queued_queries(self):
+        release = threading.Event()
+
+        def encode(texts):
+            release.wait(1)
+            return np.ones((len(texts), 2))
+
+        service = EmbeddingService(encode, max_batch_size=1, max_wait_ms=0)
+        running = asyncio.ensure_future(service.embed("a"))
+        queued = [asyncio.ensure_future(service.embed(text)) for text in ("b", "c")]
+        await asyncio.sleep(0.01)
+        batcher = service._batcher
+
+        await service.aclose()
+        release.set()
+        results = await asyncio.gather(*queued, return_exceptions=True)
+
+        assert batcher.done()
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert (await running).shape == (2,)
+
+
+class TestQueryEmbeddingCache:
+    def test_hits_on_normalised_text(self):
+        cache = QueryEmbeddingCache("model-a")
+        cache.set("What is  PIX?", np.array([0.6, 0.8]))
+
+        embedding = cache.get(" what is pix? ")
+
+        assert embedding.dtype == np.float32
+        assert not embedding.flags.writeable
+        assert cache.get("taxas maquininha") is None
+        assert cache.get_stats()["hit_rate"] == 0.5
+
+    def test_evicts_lru_entries_over_byte_cap(self):
+        entry_bytes = np.zeros(4, dtype=np.float32).nbytes + 200
+        cache = QueryEmbeddingCache("model-a", max_bytes=entry_bytes * 2)
+        cache.set("a", np.zeros(4))
+        cache.set("b", np.zeros(4))
+        cache.get("a")
+        cache.set("c", np.zeros(4))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_persists_per_model(self, tmp_path):
+        path = str(tmp_path / "query_embeddings.npz")
+        cache = QueryEmbeddingCache("model-a", persist_path=path)
+        cache.set("what is pix", np.array([1.0, 0.0]))
+        cache.save()
+
+        warm = QueryEmbeddingCache("model-a", persist_path=path)
+        other_model = QueryEmbeddingCache("model-b", persist_path=path)
+
+        assert np.array_equal(warm.get("What is PIX"), [1.0, 0.0])
+        assert other_model.get("what is pix") is None
+
+    def test_periodic_save_runs_off_the_calling_thread(self, tmp_path):
+        path = str(tmp_path / "query_embeddings.npz")
+        cache = QueryEmbeddingCache("model-a", persist_path=path, save_every=2)
+        saving_threads = []
+        save = cache.save
+        cache.save = lambda: (saving_threads.append(threading.current_thread()), save())
+
+        cache.set("what is pix", np.array([1.0, 0.0]))
+        cache.set("taxas maquininha", np.array([0.0, 1.0]))
+        cache._saver.join()
+
+        assert saving_threads and threading.current_thread() not in saving_threads
+        assert QueryEmbeddingCache("model-a", persist_path=path).get_stats()["entries"] == 2
+
+
+def _fake_encode(texts):
+    return np.array([[text.lower().count(char) + 0.1 for char in "aeioupst"] for text in texts], dtype=np.float32)
+
+
+def _sample_documents():
+    return [
+        {
+            "url": "https://www.infinitepay.io/maquininha",
+            "title": "Maquininha",
+            "chunks": [
+                DocumentChunk("Credit card fee 2.5% per transaction", "pricing_table", {}, [
+                    PricingInfo("Maquininha Smart", "credit", "2.5%", 2.5, "per transaction")
+                ]),
+                DocumentChunk("Debit card fee 1.3%", "pricing_table", {}, [
+                    PricingInfo("Maquininha Smart", "debit", "1.3%", 1.3, "per transaction")
+                ]),
+                DocumentChunk("Accepts PIX, contactless and chip cards", "feature_list", {}),
+                DocumentChunk("Maquininha Smart", "header", {}),
+                DocumentChunk("The Maquininha Smart ships in two business days", "text", {})
+            ]
+        },
+        {"url": "https://www.infinitepay.io/pix", "title": "Pix", "text": "PIX transfers are free for individuals"}
+    ]
+
+
+@pytest_asyncio.fixture
+async def build_vector_store(tmp_path):
+    stores = []
+
+    def build(layout: str, directory: str = None, chunk_cache_path: str = "", backend: str = "chroma"):
+        with patch("app.tools.vector_store.SentenceTransformer") as model, \
+                patch.object(settings, "VECTOR_STORE_LAYOUT", layout), \
+                patch.object(settings, "QUERY_EMBEDDING_CACHE_PATH", ""), \
+                patch.object(settings, "CHUNK_EMBEDDING_CACHE_PATH", chunk_cache_path), \
+                patch.object(settings, "VECTOR_BACKEND", backend):
+            model.return_value.encode.side_effect = _fake_encode
+            stores.append(VectorStore(persist_directory=str(tmp_path / (directory or layout)), embedding_model="test-model"))
+            return stores[-1]
+
+    yield build
+
+    for store in stores:
+        await store.aclose()
+
+
+class TestChunkEmbeddingCache:
+    def test_round_trip_scoped_by_model(self, tmp_path):
+        path = str(tmp_path / "chunks.sqlite")
+        cache = ChunkEmbeddingCache(path, "model-a")
+        cache.set_many(["PIX is free", "Card fee 2.5%"], np.array([[1.0, 0.0], [0.0, 1.0]]))
+
+        embeddings = cache.get_many(["Card fee 2.5%", "unknown"])
+        other_model = ChunkEmbeddingCache(path, "model-b").get_many(["PIX is free"])
+
+        assert np.array_equal(embeddings[0], [0.0, 1.0])
+        assert embeddings[1] is None
+        assert other_model == [None]
+        assert cache.get_stats()["hit_rate"] == 0.5
+
+    def test_evicts_least_recently_used_past_size_limit(self, tmp_path):
+        vector_bytes = np.zeros(4, dtype=np.float32).nbytes
+        cache = ChunkEmbeddingCache(str(tmp_path / "chunks.sqlite"), "model-a", max_bytes=vector_bytes * 2)
+        cache.set_many(["a"], np.zeros((1, 4)))
+        cache.set_many(["b"], np.zeros((1, 4)))
+        time.sleep(0.01)
+        cache.get_many(["a"])
+        cache.set_many(["c"], np.zeros((1, 4)))
+
+        assert cache.get_many(["a", "b", "c"])[1] is None
+        assert cache.get_stats()["entries"] == 2
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_size_is_tracked_at_write_time(self, tmp_path):
+        path = str(tmp_path / "chunks.sqlite")
+        cache = ChunkEmbeddingCache(path, "model-a")
+        cache.set_many(["a", "b"], np.zeros((2, 4)))
+        cache.set_many(["b", "c"], np.zeros((2, 8)))
+        stats = cache.get_stats()
+        cache.close()
+
+        assert (stats["entries"], stats["bytes"]) == (3, 16 + 32 + 32)
+        reopened = ChunkEmbeddingCache(path, "model-a").get_stats()
+        assert (reopened["entries"], reopened["bytes"]) == (3, 80)
+
+    @pytest.mark.asyncio
+    async def test_full_rebuild_reuses_cached_embeddings(self, build_vector_store, tmp_path):
+        chunk_cache_path = str(tmp_path / "chunks.sqlite")
+        first = build_vector_store("split", directory="first", chunk_cache_path=chunk_cache_path)
+        await first.add_documents_enhanced(_sample_documents())
+        first.close()
+
+        second = build_vector_store("split", directory="second", chunk_cache_path=chunk_cache_path)
+        await second.add_documents_enhanced(_sample_documents())
+
+        assert second.embedding_service.bulk_calls == 0
+        assert second.get_collection_info()["document_count"] == 6
+        assert second.get_embedding_stats()["chunk_cache"]["hits"] == 6
+
+
+class TestVectorStoreLayouts:
+    @pytest.mark.asyncio
+    async def test_unified_layout_applies_per_type_quotas(self, build_vector_store):
+        split = build_vector_store("split")
+        unified = build_vector_store("unified")
+        await split.add_documents_enhanced(_sample_documents())
+        await unified.add_documents_enhanced(_sample_documents())
+
+        split_results = await split.search_enhanced("What is the card fee?", k=5)
+        unified_results = await unified.search_enhanced("What is the card fee?", k=5)
+
+        assert unified.get_collection_info()["pricing_documents"] == 2
+        assert unified.get_collection_info()["document_count"] == 6
+        assert sorted(r["document"] for r in unified_results) == sorted(r["document"] for r in split_results)
+        assert sum(r["collection_type"] == "structured" for r in unified_results) <= 2
+
+    @pytest.mark.asyncio
+    async def test_unified_layout_filters_by_search_type(self, build_vector_store):
+        unified = build_vector_store("unified")
+        await unified.add_documents_enhanced(_sample_documents())
+
+        results = await unified.search_enhanced("Which cards are accepted", k=5, search_type="structured")
+
+        assert results
+        assert {r["collection_type"] for r in results} == {"structured"}
+
+    @pytest.mark.asyncio
+    async def test_migration_copies_split_collections(self, build_vector_store):
+        split = build_vector_store("split", directory="store")
+        await split.add_documents_enhanced(_sample_documents())
+
+        migrated = split.migrate_to_unified(drop_old=True)
+        unified = build_vector_store("unified", directory="store")
+        results = await unified.search_enhanced("What is the card fee?", k=5)
+
+        assert migrated == {"pricing": 2, "structured": 2, "text": 2}
+        assert split.text_collection.count() == 0
+        assert any("pricing_data" in r for r in results)
+
+    @pytest.mark.asyncio
+    async def test_split_queries_run_concurrently_with_partial_results_on_timeout(self, build_vector_store):
+        store = build_vector_store("split")
+        await store.add_documents_enhanced(_sample_documents())
+        query_structured = store.structured_collection.query
+
+        def slow_structured_query(**kwargs):
+            time.sleep(0.3)
+            return query_structured(**kwargs)
+
+        store.query_timeout_ms = 100
+        store.structured_collection = Mock(query=Mock(side_effect=slow_structured_query))
+
+        started = time.perf_counter()
+        results = await store.search_enhanced("What is the card fee?", k=5)
+        elapsed = time.perf_counter() - started
+
+        stats = store.get_query_stats()
+        assert elapsed < 0.3
+        assert results
+        assert "structured" not in {r["collection_type"] for r in results}
+        assert stats["structured"]["timeouts"] == 1
+        assert stats["pricing"]["latency_ms"]["count"] == 1
+
+
+class TestIncrementalIndexing:
+    def test_chunk_ids_are_content_addressed(self):
+        chunk_id = make_chunk_id("https://www.infinitepay.io/pix", "text", "PIX transfers are free")
+
+        assert chunk_id == make_chunk_id("https://www.infinitepay.io/pix", "text", "PIX transfers are free")
+        assert chunk_id != make_chunk_id("https://www.infinitepay.io/pix", "text", "PIX transfers cost R$ 1")
+        assert chunk_id != make_chunk_id("https://www.infinitepay.io/pix", "structured", "PIX transfers are free")
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("layout", ["split", "unified"])
+    async def test_unchanged_site_costs_no_embeddings(self, build_vector_store, layout):
+        store = build_vector_store(layout)
+        first = await store.add_documents_incremental(_sample_documents())
+        version = store.index_version
+        bulk_calls = store.embedding_service.bulk_calls
+
+        second = await store.add_documents_incremental(_sample_documents())
+
+        assert first == {"added": 6, "updated": 0, "removed": 0, "skipped": 0}
+        assert second == {"added": 0, "updated": 0, "removed": 0, "skipped": 6}
+        assert store.embedding_service.bulk_calls == bulk_calls
+        assert store.index_version == version
+
+    @pytest.mark.asyncio
+    async def test_changed_chunks_are_diffed_per_url(self, build_vector_store):
+        store = build_vector_store("split")
+        await store.add_documents_incremental(_sample_documents())
+
+        documents = _sample_documents()
+        chunks = documents[0]["chunks"]
+        chunks[1] = DocumentChunk("Debit card fee 1.1%", "pricing_table", {}, [
+            PricingInfo("Maquininha Smart", "debit", "1.1%", 1.1, "per transaction")
+        ])
+        chunks.insert(0, chunks.pop(4))
+        del chunks[3]
+        counts = await store.add_documents_incremental(documents[:1])
+
+        assert counts == {"added": 1, "updated": 2, "removed": 2, "skipped": 1}
+        assert store.get_collection_info()["document_count"] == 5
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("layout", ["split", "unified"])
+    async def test_urls_dropped_from_crawl_list_are_purged(self, build_vector_store, layout):
+        store = build_vector_store(layout)
+        await store.add_documents_incremental(_sample_documents())
+        documents = _sample_documents()[:1]
+        lexical_before = len(store.lexical_index) if store.lexical_index is not None else 0
+
+        counts = await store.add_documents_incremental(documents, known_urls=[documents[0]["url"]])
+        results = await store.search_enhanced("Is PIX free?", k=5)
+
+        assert counts["removed"] == 1
+        assert store.document_count() == 5
+        assert all(r["metadata"]["url"] == documents[0]["url"] for r in results)
+        if store.lexical_index is not None:
+            assert len(store.lexical_index) == lexical_before - 1
+
+    @pytest.mark.asyncio
+    async def test_sync_runs_chroma_calls_off_the_event_loop(self, build_vector_store):
+        store = build_vector_store("unified")
+        await store.add_documents_incremental(_sample_documents())
+        collection = store.unified_collection
+        threads = []
+        for name in ("get", "update", "delete"):
+            method = getattr(collection, name)
+            setattr(collection, name, lambda *args, _method=method, _name=name, **kwargs: (
+                threads.append((_name, threading.current_thread())), _method(*args, **kwargs))[1])
+
+        documents = _sample_documents()
+        documents[0]["chunks"].insert(0, documents[0]["chunks"].pop(4))
+        counts = await store.add_documents_incremental(documents[:1], known_urls=[documents[0]["url"]])
+
+        assert counts["updated"] and counts["removed"]
+        assert {name for name, _ in threads} == {"get", "update", "delete"}
+        assert threading.current_thread() not in {thread for _, thread in threads}
+
+    @pytest.mark.asyncio
+    async def test_unified_type_counts_are_kept_at_write_time(self, build_vector_store):
+        store = build_vector_store("unified", directory="store")
+        await store.add_documents_incremental(_sample_documents())
+        documents = _sample_documents()
+        del documents[0]["chunks"][1]
+        await store.add_documents_incremental(documents[:1])
+
+        reopened = build_vector_store("unified", directory="store")
+        reopened.unified_collection.get = Mock(side_effect=AssertionError("counts should not need a scan"))
+        info = reopened.get_collection_info()
+
+        assert (info["text_documents"], info["pricing_documents"], info["structured_documents"]) == (2, 1, 2)
+        assert info["document_count"] == 5
+        assert reopened.document_count() == 5
+
+
+class TestNumpyBackend:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("layout", ["split", "unified"])
+    async def test_search_matches_chroma(self, build_vector_store, layout):
+        chroma = build_vector_store(layout, directory=f"chroma_{layout}")
+        numpy_store = build_vector_store(layout, directory=f"numpy_{layout}", backend="numpy")
+        await chroma.add_documents_enhanced(_sample_documents())
+        await numpy_store.add_documents_enhanced(_sample_documents())
+
+        for query, search_type in [("What is the card fee?", "all"), ("Which cards are accepted", "structured"),
+                                   ("Is PIX free?", "text")]:
+            expected = await chroma.search_enhanced(query, k=5, search_type=search_type)
+            actual = await numpy_store.search_enhanced(query, k=5, search_type=search_type)
+
+            assert [r["document"] for r in actual] == [r["document"] for r in expected]
+            assert [r["similarity"] for r in actual] == pytest.approx([r["similarity"] for r in expected], abs=1e-4)
+
+        assert numpy_store.get_collection_info() == chroma.get_collection_info()
+
+    @pytest.mark.asyncio
+    async def test_incremental_indexing_and_reload_from_disk(self, build_vector_store):
+        store = build_vector_store("split", directory="store", backend="numpy")
+        await store.add_documents_incremental(_sample_documents())
+        counts = await store.add_documents_incremental(_sample_documents())
+
+        reloaded = build_vector_store("split", directory="store", backend="numpy")
+        results = await reloaded.search_enhanced("What is the card fee?", k=5)
+
+        assert counts["skipped"] == 6
+        assert isinstance(reloaded.pricing_collection.vectors, np.memmap)
+        assert any("pricing_data" in r for r in results)
+
+    def test_where_masks(self, tmp_path):
+        collection = NumpyCollection("test", str(tmp_path / "test"))
+        collection.upsert(
+            ids=["a", "b", "c"],
+            documents=["PIX", "Card", "Link"],
+            metadatas=[
+                {"url": "u1", "chunk_type": "text"},
+                {"url": "u1", "chunk_type": "pricing_table"},
+                {"url": "u2", "chunk_type": "text"}
+            ],
+            embeddings=[[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]]
+        )
+
+        by_url = collection.query(query_embeddings=[[1.0, 0.0]], n_results=5, where={"url": "u1"})
+        by_type = collection.get(where={"$and": [{"chunk_type": {"$in": ["text"]}}, {"url": {"$ne": "u1"}}]})
+        collection.delete(ids=["a"])
+
+        assert by_url["ids"] == [["a", "b"]]
+        assert by_url["distances"][0][0] == pytest.approx(0.0, abs=1e-6)
+        assert by_type["ids"] == ["c"]
+        assert collection.query(query_embeddings=[[1.0, 0.0]], n_results=1)["ids"] == [["b"]]
+
+
+class TestHybridSearch:
+    def test_tokenize_folds_accents_plurals_and_decimal_commas(self):
+        tokens = tokenize("Qual a taxa do PIX Parcelado? 2,69% nos cartões de crédito")
+
+        assert tokens == ["taxa", "pix", "parcelado", "2.69", "2.69%", "cartao", "credito"]
+        assert tokenize("Cartão de débito") == ["cartao", "debito"]
+
+    def test_bm25_updates_incrementally_and_round_trips(self, tmp_path):
+        path = str(tmp_path / "bm25.npz")
+        index = BM25Index(path)
+        index.upsert(["credit", "debit", "smart"],
+                     ["Crédito 2,69% na Maquininha", "Débito 1,37%", "Maquininha Smart com PIX"],
+                     ["pricing", "pricing", "structured"])
+        index.upsert(["debit"], ["Débito 1,29%"], ["pricing"])
+        index.remove(["smart"])
+        index.save()
+
+        reloaded = BM25Index(path)
+
+        assert [hit[0] for hit in index.search("taxa de 2.69% no credito")] == ["credit"]
+        assert index.search("1,37%") == []
+        assert [hit[0] for hit in index.search("maquininha smart")] == ["credit"]
+        assert reloaded.search("debito 1,29%") == index.search("debito 1,29%")
+        assert reloaded.get_stats()["tombstoned"] == 0
+        assert index.search("debito", collection_types=["text"]) == []
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("layout", ["split", "unified"])
+    async def test_exact_tokens_are_fused_into_dense_results(self, build_vector_store, layout):
+        store = build_vector_store(layout)
+        await store.add_documents_enhanced(_sample_documents())
+
+        results = await store.search_enhanced("2,5%", k=3)
+
+        assert results[0]["document"] == "Credit card fee 2.5% per transaction"
+        assert results[0]["rrf_score"] > results[1]["rrf_score"]
+        assert all("similarity" in result for result in results)
+        assert store.get_hybrid_stats()["fused_searches"] == 1
+
+    @pytest.mark.asyncio
+    async def test_fusion_leaves_dense_results_untouched(self, build_vector_store):
+        store = build_vector_store("split")
+        dense = [
+            {"id": "fee", "document": "Card fee 2.5%", "metadata": {}, "collection_type": "pricing", "similarity": 0.9},
+            {"id": "pix", "document": "PIX is free", "metadata": {}, "collection_type": "text", "similarity": 0.8}
+        ]
+
+        fused = await store._fuse_lexical(dense, [("pix", "text", 3.0)], np.zeros(4), {"pricing": 1, "text": 1}, k=2)
+
+        assert [result["id"] for result in fused] == ["pix", "fee"]
+        assert all("rrf_score" in result for result in fused)
+        assert all("rrf_score" not in result for result in dense)
+
+    @pytest.mark.asyncio
+    async def test_index_is_persisted_and_rebuilt_from_collections(self, build_vector_store, tmp_path):
+        store = build_vector_store("split", directory="store")
+        await store.add_documents_incremental(_sample_documents())
+        documents = _sample_documents()
+        del documents[0]["chunks"][0]
+        await store.add_documents_incremental(documents[:1])
+        await store.aclose()
+
+        reloaded = build_vector_store("split", directory="store")
+        (tmp_path / "store" / "bm25_index.npz").unlink()
+        rebuilt = build_vector_store("split", directory="store")
+
+        assert len(reloaded.lexical_index) == 5
+        assert reloaded.lexical_index.search("credit") == []
+        assert len(rebuilt.lexical_index) == 5
+
+
+def _fake_cross_encoder(calls):
+    def score(pairs):
+        calls.append(len(pairs))
+        return np.array([document.count("Maquininha") - len(document) / 1000 for _, document in pairs])
+    return score
+
+
+class TestCrossEncoderReranker:
+    @pytest.mark.asyncio
+    async def test_reorders_candidates_in_batches_and_caches_scores(self):
+        calls = []
+        reranker = CrossEncoderReranker(_fake_cross_encoder(calls), candidates=4, batch_size=3)
+        results = [
+            {"id": "fee", "document": "Card fee 2.5%", "similarity": 0.9},
+            {"id": "ships", "document": "The Maquininha ships in two days", "similarity": 0.8},
+            {"id": "smart", "document": "Maquininha Smart", "similarity": 0.7},
+            {"id": "pix", "document": "PIX is free", "similarity": 0.6},
+            {"id": "beyond", "document": "Maquininha Maquininha", "similarity": 0.5}
+        ]
+
+        reranked = await reranker.rerank("Maquininha", results, k=2)
+        again = await reranker.rerank("  maquininha ", results, k=3)
+
+        assert [r["id"] for r in reranked] == ["smart", "ships"]
+        assert reranked[0]["rerank_score"] > reranked[1]["rerank_score"]
+        assert [r["id"] for r in again] == ["smart", "ships", "pix"]
+        assert calls == [3, 1]
+        assert reranker.get_stats()["cache"]["hits"] == 4
+
+    @pytest.mark.asyncio
+    async def test_min_score_drops_weak_results_but_keeps_the_best(self):
+        reranker = CrossEncoderReranker(_fake_cross_encoder([]), min_score=0.5)
+        results = [{"id": "pix", "document": "PIX is free"}, {"id": "fee", "document": "Card fee 2.5%"}]
+
+        reranked = await reranker.rerank("Maquininha", results, k=2)
+
+        assert len(reranked) == 1
+        assert reranker.get_stats()["below_min_score"] == 1
+
+    @pytest.mark.asyncio
+    async def test_reserved_slots_go_to_the_best_results_of_the_type(self):
+        reranker = CrossEncoderReranker(_fake_cross_encoder([]))
+        results = [
+            {"id": "fee", "document": "Card fee 2.5%", "collection_type": "pricing"},
+            {"id": "smart", "document": "Maquininha Smart", "collection_type": "text"},
+            {"id": "pix", "document": "PIX is free", "collection_type": "pricing"},
+            {"id": "beyond", "document": "Maquininha Maquininha", "collection_type": "text"}
+        ]
+
+        reranked = await reranker.rerank("Maquininha", results, k=2, reserved={"pricing": 1, "structured": 1})
+
+        assert [r["id"] for r in reranked] == ["beyond", "pix"]
+
+    @pytest.mark.asyncio
+    async def test_vector_store_reranks_a_wider_candidate_pool(self, build_vector_store):
+        store = build_vector_store("split")
+        await store.add_documents_enhanced(_sample_documents())
+        dense = await store.search_enhanced("Which cards are accepted?", k=2)
+        store.reranker = CrossEncoderReranker(_fake_cross_encoder([]), candidates=20)
+        store.index_version += 1
+
+        results = await store.search_enhanced("Which cards are accepted?", k=2)
+
+        assert len(results) == 2
+        assert "Maquininha" in results[0]["document"]
+        assert "Maquininha" not in dense[0]["document"]
+        assert store.get_reranker_stats()["pairs_scored"] > 2
+
+    @pytest.mark.asyncio
+    async def test_reranking_keeps_the_pricing_chunks_retrieval_returned(self, build_vector_store):
+        store = build_vector_store("split")
+        await store.add_documents_enhanced(_sample_documents())
+        dense = await store.search_enhanced("What is the card fee?", k=3)
+        store.reranker = CrossEncoderReranker(_fake_cross_encoder([]), candidates=20)
+        store.index_version += 1
+
+        results = await store.search_enhanced("What is the card fee?", k=3)
+
+        dense_pricing = {r["id"] for r in dense if r["collection_type"] == "pricing"}
+        assert dense_pricing
+        assert dense_pricing <= {r["id"] for r in results}
+        assert "Maquininha" in results[0]["document"]
@@ -0,0 +1,176 @@
+import pytest
+import json
+import numpy as np
+from app.utils.keyword_router import KeywordRouter
+from app.utils.embedding_router import EmbeddingRouter
+from app.cli.build_router_index import load_decisions
+from app.utils.metrics import Histogram
+from app.utils.context_builder import ContextBuilder, count_tokens, split_sentences, token_budget
+
+
+class TestKeywordRouter:
+    def test_product_question_routes_to_knowledge(self):
+        decision = KeywordRouter().classify("What is PIX?")
+
+        assert decision.agent == "KNOWLEDGE"
+        assert decision.confidence >= 0.8
+
+    def test_account_problem_routes_to_support(self):
+        decision = KeywordRouter().classify("Não consigo acessar minha conta")
+
+        assert decision.agent == "SUPPORT"
+        assert decision.priority == "high"
+        assert decision.confidence >= 0.8
+
+    def test_mixed_signals_have_low_confidence(self):
+        decision = KeywordRouter().classify("Why can't I receive PIX payments?")
+
+        assert decision.confidence < 0.8
+
+    def test_unrelated_message_has_zero_confidence(self):
+        decision = KeywordRouter().classify("Quando foi o último jogo do Palmeiras?")
+
+        assert decision.confidence == 0.0
+
+    def test_metadata_records_routing_path(self):
+        metadata = KeywordRouter().classify("What are the fees for Maquininha Smart?").to_metadata("keyword")
+
+        assert metadata["routing_path"] == "keyword"
+        assert metadata["context"]["query_type"] == "pricing"
+
+    def test_percent_sign_matches_after_a_number(self):
+        decision = KeywordRouter().classify("Is it 2,69% on the Smart?")
+
+        assert "pricing_terms:%" in decision.matched
+
+    def test_accents_are_folded_and_price_questions_counted_once(self):
+        decision = KeywordRouter().classify("Quanto custa o cartão?")
+
+        assert decision.matched == ["financial_services:cartao", "pricing_terms:quanto custa"]
+        assert decision.query_type == "pricing"
+
+
+def _embeddings():
+    knowledge = np.array([[1.0, 0.1, 0.0], [0.9, 0.0, 0.1], [1.0, 0.0, 0.0]], dtype=np.float32)
+    support = np.array([[0.0, 1.0, 0.1], [0.1, 0.9, 0.0], [0.0, 1.0, 0.0]], dtype=np.float32)
+    return np.vstack([knowledge, support]), ["KNOWLEDGE"] * 3 + ["SUPPORT"] * 3
+
+
+class TestEmbeddingRouter:
+    @pytest.mark.parametrize("mode", ["centroid", "knn"])
+    def test_classifies_by_nearest_examples(self, mode):
+        embeddings, labels = _embeddings()
+        router = EmbeddingRouter.build(embeddings, labels, mode=mode, k=3)
+
+        knowledge = router.classify(np.array([1.0, 0.0, 0.0], dtype=np.float32))
+        support = router.classify(np.array([0.0, 1.0, 0.0], dtype=np.float32))
+
+        assert knowledge.agent == "KNOWLEDGE"
+        assert support.agent == "SUPPORT"
+        assert knowledge.confidence > 0.9
+
+    def test_far_from_all_examples_has_zero_confidence(self):
+        embeddings, labels = _embeddings()
+        router = EmbeddingRouter.build(embeddings, labels)
+
+        decision = router.classify(np.array([0.0, 0.0, 1.0], dtype=np.float32))
+
+        assert decision.confidence == 0.0
+
+    def test_save_and_load_roundtrip(self, tmp_path):
+        embeddings, labels = _embeddings()
+        path = str(tmp_path / "router_index.npz")
+        EmbeddingRouter.build(embeddings, labels, mode="knn", k=3).save(path)
+
+        router = EmbeddingRouter.load(path)
+
+        assert router.mode == "knn"
+        assert router.get_info()["vectors"] == 6
+        assert router.classify(np.array([0.0, 1.0, 0.0], dtype=np.float32)).agent == "SUPPORT"
+
+    def test_load_decisions_filters_by_routing_path(self, tmp_path):
+        log_path = tmp_path / "decisions.jsonl"
+        log_path.write_text("\n".join(json.dumps(entry) for entry in [
+            {"message": "What is boleto?", "agent": "KNOWLEDGE", "routing_path": "llm"},
+            {"message": "What is PIX?", "agent": "KNOWLEDGE", "routing_path": "keyword"},
+            {"message": "My card was declined", "agent": "SUPPORT", "routing_path": "llm"},
+        ]))
+
+        decisions = load_decisions(str(log_path), ["llm"])
+
+        assert decisions == [("What is boleto?", "KNOWLEDGE"), ("My card was declined", "SUPPORT")]
+
+
+class TestHistogram:
+    def test_buckets_and_percentiles(self):
+        histogram = Histogram([1, 5, 10])
+        for value in [0.5, 2, 3, 4, 20]:
+            histogram.observe(value)
+
+        stats = histogram.get_stats()
+
+        assert stats["buckets"] == {"<=1": 1, "<=5": 3, "<=10": 0, "+inf": 1}
+        assert stats["p50"] == 5
+        assert stats["p95"] == 20
+        assert stats["avg"] == pytest.approx(5.9)
+
+
+def _result(document, similarity, url="https://www.infinitepay.io/maquininha", **extra):
+    return {"document": document, "similarity": similarity, "metadata": {"url": url}, **extra}
+
+
+class TestContextBuilder:
+    def test_splits_on_sentence_boundaries_without_breaking_decimals(self):
+        assert split_sentences("Crédito 2,69% ou 2.5% à vista. Débito 1,37%!\nPIX grátis") == [
+            "Crédito 2,69% ou 2.5% à vista.", "Débito 1,37%!", "PIX grátis"
+        ]
+
+    def test_drops_sentences_covered_by_pricing_or_better_ranked_chunks(self):
+        results = [
+            _result("Credit card fee 2.5% per transaction. Ships in two business days.", 0.9),
+            _result("Ships in two business days! PIX transfers are free.", 0.8, url="https://www.infinitepay.io/pix")
+        ]
+
+        context = ContextBuilder("test-model", 500).build(results, ["• Credit: 2.5%", "• Credit card fee 2.5% per transaction"])
+
+        assert context.duplicate_sentences == 2
+        assert context.text.count("Ships in two business days") == 1
+        assert "Content: Ships in two business days." in context.text
+        assert "PIX transfers are free." in context.text
+        assert context.tokens_used <= 500
+
+    def test_packs_by_score_per_token_and_trims_on_sentence_boundaries(self):
+        long_text = " ".join(f"Sentence {i} about the Maquininha Smart and its features." for i in range(40))
+        results = [
+            _result(long_text, 0.9),
+            _result("PIX transfers are free for individuals.", 0.6, url="https://www.infinitepay.io/pix"),
+            _result("Unrelated careers page.", 0.0, url="https://www.infinitepay.io/careers")
+        ]
+
+        context = ContextBuilder("test-model", 200).build(results)
+
+        assert context.tokens_used <= 200
+        assert context.sources_used == 2
+        assert context.sources_dropped == 1
+        assert context.tokens_dropped > 0
+        assert context.text.index("Maquininha") < context.text.index("PIX transfers")
+        assert context.text.split("Content: ")[1].split("\n")[0].endswith("features.")
+
+    def test_sentence_repeated_in_a_trimmed_chunk_is_kept_from_the_other(self):
+        long_text = " ".join(f"Step {i} covers topic{i} with detail{i} and example{i}." for i in range(40))
+        results = [
+            _result(f"{long_text} The Smart reader fee is 2.69% on credit.", 0.9),
+            _result("The Smart reader fee is 2.69% on credit.", 0.5, url="https://www.infinitepay.io/taxas")
+        ]
+
+        context = ContextBuilder("test-model", 150).build(results)
+
+        assert context.tokens_used <= 150
+        assert context.text.count("The Smart reader fee is 2.69% on credit.") == 1
+
+    def test_budget_is_looked_up_by_model(self):
+        budgets = {"default": 500, "gpt-4o": 1200}
+
+        assert token_budget("gpt-4o", budgets) == 1200
+        assert token_budget("gpt-3.5-turbo", budgets) == 500
+        assert count_tokens("", "gpt-3.5-turbo") == 0
@@ -0,0 +1,304 @@
+import pytest
+import numpy as np
+from app.tools.vector_backends.base import load_snapshot
+from app.tools.vector_backends.numpy_backend import NumpyClient
+from app.tools.vector_backends.ivfpq_backend import IvfPqCollection
+from app.tools.vector_backends.registry import available_backends, create_backend
+import os
+
+
+@pytest.fixture(params=available_backends())
+def backend(request, tmp_path):
+    if request.param == "faiss":
+        pytest.importorskip("faiss")
+    return create_backend(request.param, str(tmp_path))
+
+
+@pytest.fixture
+def collection(backend):
+    collection = backend.get_or_create_collection("conformance", metadata={"hnsw:space": "cosine"})
+    collection.upsert(
+        ids=["pix", "credit", "debit", "link"],
+        documents=["PIX is free", "Credit fee 2.5%", "Debit fee 1.3%", "Payment link"],
+        metadatas=[
+            {"url": "https://www.infinitepay.io/pix", "chunk_type": "text"},
+            {"url": "https://www.infinitepay.io/maquininha", "chunk_type": "pricing_table"},
+            {"url": "https://www.infinitepay.io/maquininha", "chunk_type": "pricing_table"},
+            {"url": "https://www.infinitepay.io/link", "chunk_type": "feature_list"}
+        ],
+        embeddings=[[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.8, 0.6], [0.0, 0.0, 2.0]]
+    )
+    return collection
+
+
+class TestVectorBackendConformance:
+    def test_upsert_replaces_existing_rows(self, collection):
+        collection.upsert(ids=["pix"], documents=["PIX is free for individuals"],
+                          metadatas=[{"url": "https://www.infinitepay.io/pix", "chunk_type": "text"}],
+                          embeddings=[[1.0, 0.0, 0.0]])
+
+        assert collection.count() == 4
+        assert collection.get(ids=["pix"])["documents"] == ["PIX is free for individuals"]
+
+    def test_add_leaves_existing_ids_untouched(self, collection):
+        collection.add(ids=["pix", "tap"], documents=["changed", "Tap to pay"],
+                       metadatas=[{"url": "x", "chunk_type": "text"}, {"url": "y", "chunk_type": "text"}],
+                       embeddings=[[0.0, 1.0, 0.0], [0.5, 0.5, 0.0]])
+
+        assert collection.count() == 5
+        assert collection.get(ids=["pix"])["documents"] == ["PIX is free"]
+
+    def test_update_and_delete_ignore_unknown_ids(self, collection):
+        collection.update(ids=["link", "missing"], metadatas=[{"url": "https://www.infinitepay.io/link", "chunk_type": "header"},
+                                                          {"chunk_type": "text"}])
+        collection.delete(ids=["debit", "missing"])
+
+        assert collection.count() == 3
+        assert collection.get(ids=["link"])["metadatas"][0]["chunk_type"] == "header"
+        assert collection.get(ids=["debit"])["ids"] == []
+
+    def test_get_filters_and_pages_in_insertion_order(self, collection):
+        by_url = collection.get(where={"url": "https://www.infinitepay.io/maquininha"}, include=[])
+        page = collection.get(include=["documents"], limit=2, offset=1)
+
+        assert by_url["ids"] == ["credit", "debit"]
+        assert page["ids"] == ["credit", "debit"]
+        assert page["documents"] == ["Credit fee 2.5%", "Debit fee 1.3%"]
+
+    def test_query_returns_cosine_distances_in_order(self, collection):
+        query = np.array([0.1, 1.0, 0.0])
+        results = collection.query(query_embeddings=[query.tolist()], n_results=3)
+
+        expected_similarities = np.array([1.0, 0.8, 0.1]) / np.linalg.norm(query)
+        assert results["ids"] == [["credit", "debit", "pix"]]
+        assert results["distances"][0] == pytest.approx((1 - expected_similarities).tolist(), abs=1e-4)
+        assert results["metadatas"][0][0]["chunk_type"] == "pricing_table"
+
+    def test_query_where_filters(self, collection):
+        filtered = collection.query(query_embeddings=[[0.0, 1.0, 0.0]], n_results=5,
+                                    where={"chunk_type": {"$in": ["text", "feature_list"]}})
+        empty = collection.query(query_embeddings=[[0.0, 1.0, 0.0]], n_results=5, where={"url": "nowhere"})
+
+        assert sorted(filtered["ids"][0]) == ["link", "pix"]
+        assert empty["ids"] == [[]]
+
+    def test_snapshot_round_trip(self, collection, tmp_path):
+        written = collection.snapshot(str(tmp_path / "snapshot"))
+        ids, documents, metadatas, vectors = load_snapshot(str(tmp_path / "snapshot"))
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        assert written == 4
+        assert ids == ["pix", "credit", "debit", "link"]
+        assert documents[3] == "Payment link"
+        assert metadatas[1]["chunk_type"] == "pricing_table"
+        assert (vectors / norms)[3] == pytest.approx([0.0, 0.0, 1.0])
+
+    def test_delete_collection(self, backend, collection):
+        backend.delete_collection("conformance")
+
+        assert backend.get_or_create_collection("conformance").count() == 0
+
+
+class TestQuantizedStorage:
+    @pytest.mark.parametrize("quantization", ["float16", "int8"])
+    def test_rescored_results_match_float32(self, tmp_path, quantization):
+        rng = np.random.default_rng(0)
+        centers = rng.standard_normal((20, 32))
+        vectors = centers[rng.integers(0, 20, 2000)] + 0.3 * rng.standard_normal((2000, 32))
+        queries = vectors[:25] + 0.1 * rng.standard_normal((25, 32))
+        rows = {
+            "ids": [f"chunk-{i}" for i in range(2000)],
+            "documents": ["chunk"] * 2000,
+            "metadatas": [{"url": f"https://www.infinitepay.io/{i % 7}"} for i in range(2000)],
+            "embeddings": vectors.tolist()
+        }
+        exact = NumpyClient(str(tmp_path / "exact")).get_or_create_collection("chunks")
+        quantized = NumpyClient(str(tmp_path / quantization), quantization=quantization).get_or_create_collection("chunks")
+        exact.upsert(**rows)
+        quantized.upsert(**rows)
+
+        expected = exact.query(query_embeddings=queries.tolist(), n_results=10, where={"url": "https://www.infinitepay.io/3"})
+        actual = quantized.query(query_embeddings=queries.tolist(), n_results=10, where={"url": "https://www.infinitepay.io/3"})
+        reloaded = NumpyClient(str(tmp_path / quantization), quantization=quantization).get_or_create_collection("chunks")
+
+        recall = np.mean([len(set(a) & set(e)) / 10 for a, e in zip(actual["ids"], expected["ids"])])
+        assert recall >= 0.95
+        assert actual["distances"][0] == pytest.approx(expected["distances"][0][:len(actual["distances"][0])], abs=0.02)
+        assert quantized.get_stats()["resident_vector_bytes"] < exact.get_stats()["resident_vector_bytes"] / 1.9
+        assert isinstance(reloaded.vectors, np.memmap)
+        assert reloaded.codes.dtype == quantized.codes.dtype
+        assert reloaded.query(query_embeddings=queries[:1].tolist(), n_results=3)["ids"] == \
+            quantized.query(query_embeddings=queries[:1].tolist(), n_results=3)["ids"]
+
+    def test_codes_are_requantized_when_vectors_change_on_disk(self, tmp_path):
+        client = NumpyClient(str(tmp_path), quantization="float16")
+        collection = client.get_or_create_collection("chunks")
+        collection.upsert(ids=["a", "b"], documents=["a", "b"], metadatas=[{}, {}],
+                          embeddings=[[1.0, 0.0], [0.0, 1.0]])
+
+        # Same row count, different vectors, as after restoring vectors.npy from another snapshot
+        np.save(collection.vectors_path, np.array([[0.0, 1.0], [1.0, 0.0]], dtype=np.float32))
+        reloaded = NumpyClient(str(tmp_path), quantization="float16").get_or_create_collection("chunks")
+
+        assert reloaded.query(query_embeddings=[[1.0, 0.0]], n_results=1)["ids"] == [["b"]]
+        assert np.array_equal(reloaded.codes, np.array([[0.0, 1.0], [1.0, 0.0]], dtype=np.float16))
+
+
+class TestNumpyCollectionWrites:
+    def test_appends_fill_spare_capacity_and_append_to_disk(self, tmp_path):
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((30, 8)).astype(np.float32)
+        collection = NumpyClient(str(tmp_path)).get_or_create_collection("chunks")
+        for start in range(0, 30, 10):
+            collection.upsert(ids=[f"chunk-{i}" for i in range(start, start + 10)], documents=["chunk"] * 10,
+                              metadatas=[{"url": f"https://www.infinitepay.io/{i % 3}"} for i in range(start, start + 10)],
+                              embeddings=vectors[start:start + 10].tolist())
+            if start == 0:
+                first_snapshot, buffer = np.array(collection.vectors), collection.vectors.base
+
+        reloaded = NumpyClient(str(tmp_path)).get_or_create_collection("chunks")
+        _, _, _, stored = load_snapshot(str(tmp_path / "chunks"))
+
+        assert collection.vectors.base is buffer
+        assert np.array_equal(buffer[:10], first_snapshot)
+        assert np.allclose(stored, vectors / np.linalg.norm(vectors, axis=1, keepdims=True), atol=1e-6)
+        assert reloaded.get(where={"url": "https://www.infinitepay.io/2"}, include=[])["ids"] == \
+            [f"chunk-{i}" for i in range(2, 30, 3)]
+        assert reloaded.query(query_embeddings=vectors[25:26].tolist(), n_results=1)["ids"] == [["chunk-25"]]
+
+    def test_appends_quantize_only_new_rows_and_metadata_updates_skip_vectors(self, tmp_path):
+        client = NumpyClient(str(tmp_path), quantization="int8")
+        collection = client.get_or_create_collection("chunks")
+        collection.upsert(ids=["a", "b"], documents=["a", "b"], metadatas=[{}, {}],
+                          embeddings=[[1.0, 0.0], [0.0, 1.0]])
+        codes, scales = collection.codes, collection.scales
+
+        collection.upsert(ids=["c"], documents=["c"], metadatas=[{}], embeddings=[[1.0, 1.0]])
+        appended_codes = collection.codes
+        written = (os.stat(collection.vectors_path).st_mtime_ns, os.stat(collection.codes_path).st_mtime_ns)
+        collection.update(ids=["a"], metadatas=[{"url": "https://www.infinitepay.io/pix"}])
+        collection.upsert(ids=["b"], documents=["b, reworded"], metadatas=[{}], embeddings=[[0.0, 1.0]])
+        reloaded = NumpyClient(str(tmp_path), quantization="int8").get_or_create_collection("chunks")
+
+        assert collection.scales is scales
+        assert np.array_equal(appended_codes[:2], codes)
+        assert collection.codes is appended_codes
+        assert (os.stat(collection.vectors_path).st_mtime_ns, os.stat(collection.codes_path).st_mtime_ns) == written
+        assert np.array_equal(reloaded.codes, appended_codes)
+        assert reloaded.get(ids=["a", "b"])["metadatas"][0] == {"url": "https://www.infinitepay.io/pix"}
+        assert reloaded.get(ids=["b"])["documents"] == ["b, reworded"]
+
+
+class TestFaissCollection:
+    def test_writes_extend_the_index_before_queries(self, tmp_path):
+        pytest.importorskip("faiss")
+        from app.tools.vector_backends.faiss_backend import FaissCollection
+
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((200, 16))
+        collection = FaissCollection("chunks", str(tmp_path / "faiss"))
+        exact = NumpyClient(str(tmp_path / "exact")).get_or_create_collection("chunks")
+        for target in (collection, exact):
+            target.upsert(ids=[f"chunk-{i}" for i in range(150)], documents=["chunk"] * 150,
+                          metadatas=[{"url": f"https://www.infinitepay.io/{i % 3}"} for i in range(150)],
+                          embeddings=vectors[:150].tolist())
+            target.upsert(ids=[f"chunk-{i}" for i in range(150, 200)], documents=["chunk"] * 50,
+                          metadatas=[{"url": f"https://www.infinitepay.io/{i % 3}"} for i in range(150, 200)],
+                          embeddings=vectors[150:].tolist())
+            target.delete(ids=["chunk-120"])
+        indexed_vectors, index = collection._indexed
+
+        assert indexed_vectors is collection.vectors
+        assert index.ntotal == collection.count() == 199
+        assert collection.query(query_embeddings=vectors[:5].tolist(), n_results=5)["ids"] == \
+            exact.query(query_embeddings=vectors[:5].tolist(), n_results=5)["ids"]
+
+
+class TestIvfPqCollection:
+    def _rows(self, count: int, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        centers = rng.standard_normal((16, 16))
+        vectors = centers[rng.integers(0, 16, count)] + 0.4 * rng.standard_normal((count, 16))
+        return {
+            "ids": [f"chunk-{seed}-{i}" for i in range(count)],
+            "documents": ["chunk"] * count,
+            "metadatas": [{"url": f"https://www.infinitepay.io/{i % 5}"} for i in range(count)],
+            "embeddings": vectors.tolist()
+        }
+
+    def _collection(self, directory, background_training: bool = True):
+        return IvfPqCollection("chunks", str(directory), nlist=8, subquantizers=8, nprobe=3,
+                               rescore_factor=10, min_train_rows=500, background_training=background_training)
+
+    def test_recall_against_exact_search(self, tmp_path):
+        rows = self._rows(3000)
+        collection = self._collection(tmp_path / "ivfpq")
+        exact = NumpyClient(str(tmp_path / "exact")).get_or_create_collection("chunks")
+        collection.upsert(**rows)
+        exact.upsert(**rows)
+        collection.wait_for_training()
+        queries = np.asarray(rows["embeddings"][:40]) + 0.05
+
+        actual = collection.query(query_embeddings=queries.tolist(), n_results=10, include=["distances"])
+        expected = exact.query(query_embeddings=queries.tolist(), n_results=10, include=["distances"])
+        filtered = collection.query(query_embeddings=queries[:5].tolist(), n_results=10,
+                                    where={"url": "https://www.infinitepay.io/2"}, include=["metadatas"])
+
+        recall = np.mean([len(set(a) & set(e)) / 10 for a, e in zip(actual["ids"], expected["ids"])])
+        assert recall >= 0.9
+        assert actual["distances"][0][0] == pytest.approx(expected["distances"][0][0], abs=1e-5)
+        assert collection.get_stats()["ivfpq"]["trained"]
+        assert all(m["url"] == "https://www.infinitepay.io/2" for hits in filtered["metadatas"] for m in hits)
+        assert all(len(hits) == 10 for hits in filtered["ids"])
+
+    def test_writes_append_codes_and_reload_without_training(self, tmp_path):
+        collection = self._collection(tmp_path / "ivfpq", background_training=False)
+        collection.upsert(**self._rows(1000))
+        collection.build_index()
+        trained = collection._state.index
+        vectors_inode = os.stat(collection.vectors_path).st_ino
+        index_mtime = os.stat(collection.index_path).st_mtime_ns
+
+        extra = self._rows(5, seed=1)
+        collection.upsert(**extra)
+        collection.delete(ids=["chunk-0-0", "chunk-0-1"])
+        updated = collection._state.index
+        reloaded = self._collection(tmp_path / "ivfpq", background_training=False)
+        loaded = reloaded._state.index
+
+        assert updated.centroids is trained.centroids
+        assert np.array_equal(updated.codes[:1000], trained.codes)
+        assert len(updated.assignments) == 1005
+        assert collection.count() == reloaded.count() == 1003
+        assert os.stat(collection.vectors_path).st_ino == vectors_inode
+        assert os.stat(collection.index_path).st_mtime_ns == index_mtime
+        assert collection.query(query_embeddings=[extra["embeddings"][3]], n_results=1)["ids"] == [["chunk-1-3"]]
+        assert collection.get(ids=["chunk-0-0"])["ids"] == []
+        assert isinstance(reloaded._state.vectors, np.memmap)
+        assert np.array_equal(loaded.codes, updated.codes)
+        assert reloaded.query(query_embeddings=[extra["embeddings"][3]], n_results=1)["ids"] == [["chunk-1-3"]]
+
+    def test_changed_vectors_leave_dead_rows_until_compacted(self, tmp_path):
+        collection = self._collection(tmp_path / "ivfpq", background_training=False)
+        rows = self._rows(600)
+        collection.upsert(**rows)
+        collection.build_index()
+        moved = {key: values[:1] for key, values in self._rows(1, seed=2).items()}
+        moved["ids"] = ["chunk-0-7"]
+        collection.upsert(**moved)
+
+        assert collection.get_stats()["dead_rows"] == 1
+        assert collection.compact() == 1
+        assert collection.get_stats()["dead_rows"] == 0
+        assert collection.count() == 600
+        assert not collection.get_stats()["ivfpq"]["trained"]
+        assert collection.query(query_embeddings=[moved["embeddings"][0]], n_results=1)["ids"] == [["chunk-0-7"]]
+        assert collection.get(ids=["chunk-0-8"])["documents"] == ["chunk"]
+
+    def test_small_collections_search_exactly(self, tmp_path):
+        collection = self._collection(tmp_path / "ivfpq")
+        collection.upsert(**self._rows(100))
+
+        assert collection._state.index is None
+        assert not collection.get_stats()["ivfpq"]["trained"]
+        assert collection.query(query_embeddings=[self._rows(100)["embeddings"][7]], n_results=1)["ids"] == [["chunk-0-7"]]